@@ -7,21 +7,23 @@ from flask import Flask, request, jsonify, session
 from flask_session import Session
 import os
 import uuid
-import anthropic
-import openai
 import logging
+import threading
+import time
 from datetime import datetime, timedelta
 import requests
 from functools import wraps
 import jwt
 from dotenv import load_dotenv
 import json
+import copy
+import ipaddress
 import pandas as pd
 import re
 import PyPDF2
 from io import BytesIO
 
-from flask import Flask, request, jsonify, session, make_response
+from flask import Flask, request, jsonify, session, make_response, Response
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -33,6 +35,13 @@ from course_finder import CourseFinder
 from query_processor import QueryProcessor
 from context_builder import ContextBuilder
 from course_recommender import CourseRecommender
+from snapshot import compute_content_hash, prune_snapshots, has_snapshot
+from cache import cache_stats
+from llm_stream import stream_chat
+from llm_clients import client_pool
+from pipeline import pipeline_executor
+from metrics import (registry as metrics_registry, observe_timings, estimate_tokens, STAGE_SECONDS,
+                     LLM_SECONDS, LLM_FIRST_TOKEN_SECONDS, CONTEXT_TOKENS, CHAT_REQUESTS)
 
 # Load environment variables
 load_dotenv()
@@ -46,6 +55,10 @@ COURSES_FILE = "courses_rows.csv"
 Q_REPORTS_FILE_1 = "q_reports_rows_1.csv"
 Q_REPORTS_FILE_2 = "q_reports_rows_2.csv"
 
+# Processed database snapshots, keyed by a hash of the data files
+SNAPSHOT_DIR = os.getenv('SNAPSHOT_DIR', 'data/snapshots')
+USE_SNAPSHOTS = os.getenv('USE_SNAPSHOTS', 'true').lower() != 'false'
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -76,10 +89,51 @@ OPENAI_CLIENT_SECRET = os.getenv('OPENAI_CLIENT_SECRET')
 OPENAI_REDIRECT_URI = os.getenv('OPENAI_REDIRECT_URI', 'http://localhost:5000/auth/openai/callback')
 
 JWT_SECRET = os.getenv('JWT_SECRET', 'dev_jwt_secret')
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+# Chat completion settings (the same for the JSON and streaming responses)
+CHAT_MODELS = {
+    'anthropic': "claude-3-7-sonnet-20250219",
+    'openai': "gpt-4-turbo"
+}
+CHAT_MAX_TOKENS = 2000
+
+CHAT_SYSTEM_PROMPT = """You are ChatHarvard, a specialized academic advisor for Harvard University students.
+        Your purpose is to help students with course selection, academic planning, and understanding 
+        degree requirements. Use the provided context about Harvard courses, Q Reports, and degree 
+        requirements to give accurate, helpful, and personalized information.
+        
+        Your responses should be based entirely on the provided context, which contains:
+        1. Query analysis - Understanding of the student's question with confidence scores
+        2. Retrieval reasoning - How courses were found and ranked based on the query
+        3. Course information - Detailed data about relevant courses
+        4. Student profile - The student's concentration and courses taken
+        
+        When answering questions:
+        1. Reference specific course codes and names (e.g., MATH 131, CS 124)
+        2. Consider the student's concentration and courses already taken
+        3. Explain course ratings and workload in context (e.g., 4.5/5.0 is excellent, 8 hours/week is moderate)
+        4. Be honest about prerequisites and potential issues flagged in verification sections
+        5. Format your answers clearly with appropriate structure
+        6. If there are ambiguities or uncertainties noted in the context, acknowledge them
+        
+        Your goal is to provide well-reasoned, accurate academic advice that helps the student make 
+        informed decisions about their course selection and academic path at Harvard.
+        
+        IMPORTANT: Always use the workload data provided in the context when discussing course workload.
+        If there is a workload comparison table, make sure to reference those values explicitly.
+        
+        Format your answers with Markdown formatting for better readability.
+        """
 
 # Global database instance
 harvard_db = None
 
+# Shared per-worker pipeline components (stateless between requests, see initialize_database)
+course_finder = None
+course_recommender = None
+_database_lock = threading.Lock()
+
 # Authentication middleware
 def token_required(f):
     @wraps(f)
@@ -111,12 +165,21 @@ def token_required(f):
     return decorated
 
 # Initialize database
-def initialize_database():
-    global harvard_db
-    if harvard_db is not None:
-        return harvard_db
-        
+def _load_database():
+    """Load the database from a snapshot, or process the data files and snapshot them"""
     try:
+        # Boot from a snapshot of the processed data when the files are unchanged
+        content_hash = None
+        if USE_SNAPSHOTS:
+            try:
+                content_hash = compute_content_hash([SUBJECTS_FILE, COURSES_FILE, Q_REPORTS_FILE_1, Q_REPORTS_FILE_2])
+                snapshot_db = HarvardDatabase.load_snapshot(SNAPSHOT_DIR, content_hash)
+                if snapshot_db is not None:
+                    logger.info("Database loaded from snapshot")
+                    return snapshot_db
+            except Exception as e:
+                logger.warning(f"Could not use database snapshot: {str(e)}")
+        
         logger.info("Loading data files")
         subjects_df = pd.read_csv(SUBJECTS_FILE)
         courses_df = pd.read_csv(COURSES_FILE)
@@ -127,27 +190,71 @@ def initialize_database():
         q_reports_df = pd.concat([q_reports_df1, q_reports_df2], ignore_index=True)
         
         logger.info("Initializing database")
-        harvard_db = HarvardDatabase(subjects_df, courses_df, q_reports_df)
+        db = HarvardDatabase(subjects_df, courses_df, q_reports_df)
         
         # Process the data
         logger.info("Processing courses")
-        harvard_db.process_courses()
+        db.process_courses()
         
         logger.info("Processing Q reports")
-        harvard_db.process_q_reports()
+        db.process_q_reports()
         
         logger.info("Processing concentrations")
-        harvard_db.process_concentrations()
+        db.process_concentrations()
         
         logger.info("Building advanced indexes")
-        harvard_db.build_indexes()
+        db.build_indexes()
+        
+        # Save a snapshot for the next boot
+        if content_hash is not None:
+            if db.save_snapshot(SNAPSHOT_DIR, content_hash):
+                prune_snapshots(SNAPSHOT_DIR, content_hash)
         
         logger.info("Database initialization complete")
-        return harvard_db
+        return db
     except Exception as e:
         logger.error(f"Error initializing database: {str(e)}")
         return None
 
+def prepare_database_snapshot():
+    """Build the snapshot for the current data files if there is none yet
+    
+    Run once before starting several workers (gunicorn.conf.py does this in the
+    master) so the workers all map the same snapshot instead of each processing
+    the data files. Returns True when a snapshot is ready.
+    """
+    if not USE_SNAPSHOTS:
+        return False
+    try:
+        content_hash = compute_content_hash([SUBJECTS_FILE, COURSES_FILE, Q_REPORTS_FILE_1, Q_REPORTS_FILE_2])
+    except Exception as e:
+        logger.warning(f"Could not hash data files: {str(e)}")
+        return False
+    
+    if has_snapshot(SNAPSHOT_DIR, content_hash):
+        logger.info("Database snapshot is up to date")
+        return True
+    
+    logger.info("Building database snapshot for workers")
+    _load_database()
+    return has_snapshot(SNAPSHOT_DIR, content_hash)
+
+def initialize_database():
+    """Create the worker's database and shared course finder/recommender once"""
+    global harvard_db, course_finder, course_recommender
+    if harvard_db is not None:
+        return harvard_db
+    
+    # Concurrent first requests wait for a single load instead of each loading the data
+    with _database_lock:
+        if harvard_db is None:
+            db = _load_database()
+            if db is not None:
+                course_finder = CourseFinder(db)
+                course_recommender = CourseRecommender(db)
+                harvard_db = db
+    return harvard_db
+
 # Routes
 @app.route('/')
 def serve():
@@ -342,13 +449,166 @@ def get_chat_history():
         logger.error(f"Error getting chat history: {str(e)}")
         return jsonify({'error': 'Could not retrieve chat history'}), 500
 
+def _prepare_chat(user_dir: str, message: str):
+    """Run the retrieval pipeline for a chat message; returns (chat_history, query_info, LLM messages)"""
+    start = time.perf_counter()
+    history_path = f"{user_dir}/chat_history.json"
+    last_query_path = f"{user_dir}/last_query.json"
+    
+    # Load chat history
+    chat_history = []
+    if os.path.exists(history_path):
+        with open(history_path, 'r') as f:
+            chat_history = json.load(f)
+    
+    # Add user message to history
+    chat_history.append({"role": "user", "content": message})
+    
+    # Load last query info
+    last_query_info = None
+    if os.path.exists(last_query_path):
+        with open(last_query_path, 'r') as f:
+            last_query_info = json.load(f)
+    
+    # Load user profile
+    profile_path = f"{user_dir}/profile.json"
+    student_profile = {}
+    if os.path.exists(profile_path):
+        with open(profile_path, 'r') as f:
+            student_profile = json.load(f)
+    timings = {"load_user_data": (time.perf_counter() - start) * 1000}
+    
+    # Initialize database if needed
+    if harvard_db is None:
+        initialize_database()
+    
+    # Process the query
+    logger.info(f"Processing query: {message}")
+    start = time.perf_counter()
+    query_processor = QueryProcessor(message, chat_history, last_query_info)
+    query_info = query_processor.process()
+    timings["query_processing"] = (time.perf_counter() - start) * 1000
+    
+    # Run the semantic searches this request will need as one batch, concurrently with finding
+    # courses and getting recommendations (their structured steps overlap the model and index
+    # search, and their semantic steps wait for the batch rather than repeating it).
+    # Each stage gets its own copy of the query info so neither sees the other's changes
+    searches = (course_finder.planned_searches(query_info, student_profile) +
+                course_recommender.planned_searches(query_info, student_profile))
+    finder_query_info = copy.deepcopy(query_info)
+    recommender_query_info = copy.deepcopy(query_info)
+    stage_results, stage_timings = pipeline_executor.run({
+        "batched_searches": lambda: harvard_db.run_searches(searches),
+        "find_courses": lambda: course_finder.find_courses(finder_query_info, student_profile),
+        "recommendations": lambda: course_recommender.get_recommendations(recommender_query_info, student_profile)
+    })
+    course_results = stage_results["find_courses"]
+    recommendations = stage_results["recommendations"]
+    timings.update(stage_timings)
+    
+    # Build context
+    start = time.perf_counter()
+    context_builder = ContextBuilder(
+        query_info, 
+        course_results, 
+        recommendations, 
+        student_profile,
+        harvard_db
+    )
+    context = context_builder.build_context()
+    timings["context_building"] = (time.perf_counter() - start) * 1000
+    
+    CONTEXT_TOKENS.observe(estimate_tokens(context))
+    
+    # Record stage spans for /metrics
+    finder_timings = course_results.get("stage_timings", {})
+    observe_timings(timings)
+    observe_timings(finder_timings, prefix="find_courses.")
+    steps = ", ".join(f"{name} {ms:.1f}" for name, ms in finder_timings.items())
+    logger.info("Pipeline stage timings (ms): " + ", ".join(f"{name} {ms:.1f}" for name, ms in timings.items())
+                + f"; find_courses steps: {steps}")
+    
+    # Prepare messages for the API
+    messages = []
+    for msg in chat_history[-10:]:  # Use last 10 messages for context
+        messages.append({"role": msg["role"], "content": msg["content"]})
+    
+    # Add the current question with context
+    messages.append({
+        "role": "user", 
+        "content": f"Based on the following information about Harvard courses and requirements:\n\n{context}\n\nStudent question: {message}"
+    })
+    return chat_history, query_info, messages
+
+def _write_json(path: str, data) -> None:
+    """Replace a JSON file atomically, so concurrent requests of the same user never read it half-written"""
+    staging = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(staging, 'w') as f:
+        json.dump(data, f)
+    os.replace(staging, path)
+
+def _save_chat(user_dir: str, message: str, chat_history: list, query_info: dict, ai_response: str) -> None:
+    """Append the assistant's response to the chat history and persist it with the query info"""
+    start = time.perf_counter()
+    
+    # Add assistant's response to history
+    chat_history.append({"role": "assistant", "content": ai_response})
+    course_code_match = re.search(r'\b([A-Za-z]{2,4})\s*(\d{1,3}[A-Za-z]*)\b', message)
+    if course_code_match:
+        course_code = f"{course_code_match.group(1).upper()} {course_code_match.group(2)}"
+        course = harvard_db.get_course_by_code(course_code)
+        if course:
+            chat_history[-1]['courseData'] = course.to_dict()
+            
+    # Save updated history
+    _write_json(f"{user_dir}/chat_history.json", chat_history)
+        
+    # Save query info for next time
+    _write_json(f"{user_dir}/last_query.json", query_info)
+    STAGE_SECONDS.observe(time.perf_counter() - start, stage="save_user_data")
+
+def _sse(event: str, data) -> str:
+    """One server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _stream_chat_response(user_dir: str, message: str, chat_history: list, query_info: dict, messages: list,
+                          auth_provider: str, access_token: str) -> Response:
+    """Server-sent events: a 'delta' per chunk of generated text, then 'done' with the saved history"""
+    def generate():
+        # Sent before the model is called so proxies and the browser see the first byte immediately
+        yield ": stream started\n\n"
+        parts = []
+        try:
+            if auth_provider in CHAT_MODELS:
+                start = time.perf_counter()
+                for text in stream_chat(auth_provider, access_token, CHAT_MODELS[auth_provider],
+                                        CHAT_SYSTEM_PROMPT, messages, CHAT_MAX_TOKENS):
+                    if not parts:
+                        LLM_FIRST_TOKEN_SECONDS.observe(time.perf_counter() - start, provider=auth_provider)
+                    parts.append(text)
+                    yield _sse("delta", {"text": text})
+                LLM_SECONDS.observe(time.perf_counter() - start, provider=auth_provider, mode="stream")
+            else:
+                parts.append("Error: Unable to generate response due to authentication issue.")
+                yield _sse("delta", {"text": parts[0]})
+            
+            _save_chat(user_dir, message, chat_history, query_info, "".join(parts))
+            CHAT_REQUESTS.inc(mode="stream", status="ok")
+            yield _sse("done", {"response": "".join(parts), "history": chat_history})
+        except Exception as e:
+            logger.error(f"Error streaming message: {str(e)}")
+            CHAT_REQUESTS.inc(mode="stream", status="error")
+            yield _sse("error", {"error": "Could not process message"})
+    
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/api/chat/message', methods=['POST'])
 @token_required
 def send_message():
+    """Answer a chat message as JSON, or as a server-sent event stream when the client accepts text/event-stream"""
     user_id = session.get('user_id')
     user_dir = f"user_data/{user_id}"
-    history_path = f"{user_dir}/chat_history.json"
-    last_query_path = f"{user_dir}/last_query.json"
     
     # Ensure user directory exists
     os.makedirs(user_dir, exist_ok=True)
@@ -358,136 +618,42 @@ def send_message():
         data = request.json
         message = data.get('message')
         
-        # Load chat history
-        chat_history = []
-        if os.path.exists(history_path):
-            with open(history_path, 'r') as f:
-                chat_history = json.load(f)
-        
-        # Add user message to history
-        chat_history.append({"role": "user", "content": message})
-        
-        # Load last query info
-        last_query_info = None
-        if os.path.exists(last_query_path):
-            with open(last_query_path, 'r') as f:
-                last_query_info = json.load(f)
-        
-        # Load user profile
-        profile_path = f"{user_dir}/profile.json"
-        student_profile = {}
-        if os.path.exists(profile_path):
-            with open(profile_path, 'r') as f:
-                student_profile = json.load(f)
-        
-        # Initialize database if needed
-        if harvard_db is None:
-            initialize_database()
-        
-        # Process the query
-        logger.info(f"Processing query: {message}")
-        query_processor = QueryProcessor(message, chat_history, last_query_info)
-        query_info = query_processor.process()
-        
-        # Find relevant courses
-        course_finder = CourseFinder(harvard_db)
-        course_results = course_finder.find_courses(query_info, student_profile)
-        
-        # Get recommendations
-        recommender = CourseRecommender(harvard_db)
-        recommendations = recommender.get_recommendations(query_info, student_profile)
-        
-        # Build context
-        context_builder = ContextBuilder(
-            query_info, 
-            course_results, 
-            recommendations, 
-            student_profile,
-            harvard_db
-        )
-        context = context_builder.build_context()
+        chat_history, query_info, messages = _prepare_chat(user_dir, message)
         
         # Generate response using appropriate client based on auth provider
         auth_provider = session.get('auth_provider')
         access_token = session.get('access_token')
         
-        system_prompt = """You are ChatHarvard, a specialized academic advisor for Harvard University students.
-        Your purpose is to help students with course selection, academic planning, and understanding 
-        degree requirements. Use the provided context about Harvard courses, Q Reports, and degree 
-        requirements to give accurate, helpful, and personalized information.
-        
-        Your responses should be based entirely on the provided context, which contains:
-        1. Query analysis - Understanding of the student's question with confidence scores
-        2. Retrieval reasoning - How courses were found and ranked based on the query
-        3. Course information - Detailed data about relevant courses
-        4. Student profile - The student's concentration and courses taken
-        
-        When answering questions:
-        1. Reference specific course codes and names (e.g., MATH 131, CS 124)
-        2. Consider the student's concentration and courses already taken
-        3. Explain course ratings and workload in context (e.g., 4.5/5.0 is excellent, 8 hours/week is moderate)
-        4. Be honest about prerequisites and potential issues flagged in verification sections
-        5. Format your answers clearly with appropriate structure
-        6. If there are ambiguities or uncertainties noted in the context, acknowledge them
-        
-        Your goal is to provide well-reasoned, accurate academic advice that helps the student make 
-        informed decisions about their course selection and academic path at Harvard.
-        
-        IMPORTANT: Always use the workload data provided in the context when discussing course workload.
-        If there is a workload comparison table, make sure to reference those values explicitly.
-        
-        Format your answers with Markdown formatting for better readability.
-        """
-        
-        # Prepare messages for the API
-        messages = []
-        for msg in chat_history[-10:]:  # Use last 10 messages for context
-            messages.append({"role": msg["role"], "content": msg["content"]})
-        
-        # Add the current question with context
-        messages.append({
-            "role": "user", 
-            "content": f"Based on the following information about Harvard courses and requirements:\n\n{context}\n\nStudent question: {message}"
-        })
+        if request.accept_mimetypes.best == 'text/event-stream':
+            return _stream_chat_response(user_dir, message, chat_history, query_info, messages,
+                                         auth_provider, access_token)
         
-        # Choose API client based on auth provider
+        # Choose API client based on auth provider (clients are pooled per API key)
         ai_response = None
         if auth_provider == 'anthropic':
-            client = anthropic.Anthropic(api_key=access_token)
-            response = client.messages.create(
-                model="claude-3-7-sonnet-20250219",
-                max_tokens=2000,
-                system=system_prompt,
-                messages=messages
-            )
+            with client_pool.lease('anthropic', access_token) as client, \
+                    LLM_SECONDS.time(provider='anthropic', mode='json'):
+                response = client.messages.create(
+                    model=CHAT_MODELS['anthropic'],
+                    max_tokens=CHAT_MAX_TOKENS,
+                    system=CHAT_SYSTEM_PROMPT,
+                    messages=messages
+                )
             ai_response = response.content[0].text
         elif auth_provider == 'openai':
-            client = openai.Client(api_key=access_token)
-            response = client.chat.completions.create(
-                model="gpt-4-turbo",
-                messages=[{"role": "system", "content": system_prompt}] + messages,
-                max_tokens=2000
-            )
+            with client_pool.lease('openai', access_token) as client, \
+                    LLM_SECONDS.time(provider='openai', mode='json'):
+                response = client.chat.completions.create(
+                    model=CHAT_MODELS['openai'],
+                    messages=[{"role": "system", "content": CHAT_SYSTEM_PROMPT}] + messages,
+                    max_tokens=CHAT_MAX_TOKENS
+                )
             ai_response = response.choices[0].message.content
         else:
             ai_response = "Error: Unable to generate response due to authentication issue."
             
-        # Add assistant's response to history
-        chat_history.append({"role": "assistant", "content": ai_response})
-        course_code_match = re.search(r'\b([A-Za-z]{2,4})\s*(\d{1,3}[A-Za-z]*)\b', message)
-        if course_code_match:
-            course_code = f"{course_code_match.group(1).upper()} {course_code_match.group(2)}"
-            course = harvard_db.get_course_by_code(course_code)
-            if course:
-                chat_history[-1]['courseData'] = course
-                
-        # Save updated history
-        with open(history_path, 'w') as f:
-            json.dump(chat_history, f)
-            
-        # Save query info for next time
-        with open(last_query_path, 'w') as f:
-            json.dump(query_info, f)
+        _save_chat(user_dir, message, chat_history, query_info, ai_response)
+        CHAT_REQUESTS.inc(mode="json", status="ok")
             
         return jsonify({
             "response": ai_response, 
@@ -496,6 +662,7 @@ def send_message():
         
     except Exception as e:
         logger.error(f"Error processing message: {str(e)}")
+        CHAT_REQUESTS.inc(mode="json", status="error")
         return jsonify({'error': 'Could not process message'}), 500
 
 @app.route('/api/chat/clear', methods=['POST'])
@@ -584,6 +751,32 @@ def get_concentrations():
         logger.error(f"Error getting concentrations: {str(e)}")
         return jsonify({'error': 'Could not retrieve concentrations'}), 500
 
+# Cache statistics route (hits, misses, evictions and size of each shared cache)
+@app.route('/api/cache/stats', methods=['GET'])
+@token_required
+def get_cache_stats():
+    return jsonify(cache_stats())
+
+def _is_loopback(address: str) -> bool:
+    try:
+        return ipaddress.ip_address(address).is_loopback
+    except ValueError:
+        return False
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus metrics of all workers
+
+    Requires a bearer METRICS_TOKEN when set; without one only loopback clients
+    are served, so METRICS_TOKEN must be set in production to scrape remotely.
+    """
+    if METRICS_TOKEN:
+        if request.headers.get('Authorization') != f"Bearer {METRICS_TOKEN}":
+            return jsonify({'message': 'Invalid metrics token'}), 401
+    elif not _is_loopback(request.remote_addr or ''):
+        return jsonify({'message': 'Set METRICS_TOKEN to serve metrics to remote clients'}), 403
+    return Response(metrics_registry.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
 
 @app.after_request
 def apply_cors(response):
@@ -797,7 +990,7 @@ def get_course_by_code(course_code):
 
         course = harvard_db.get_course_by_code(course_code)
         if course:
-            return jsonify(course)
+            return jsonify(course.to_dict())
         else:
             return jsonify({'error': 'Course not found'}), 404
     except Exception as e:
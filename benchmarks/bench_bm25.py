@@ -0,0 +1,109 @@
+"""
+bench_bm25.py - Keyword Search Benchmark
+
+Builds the BM25 corpus of a synthetic catalogue and compares the sparse
+BM25Index (postings + partial top-k selection) with the previous path,
+rank_bm25's BM25Okapi.get_scores followed by a full argsort. Reports build
+time, p50/p99 per-query latency and checks that both return the same top-k
+scores.
+
+Usage:
+    python benchmarks/bench_bm25.py --courses 100000 --queries 200 --k 20
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bm25 import BM25Index
+from database import HarvardDatabase
+from synthetic import generate_catalogue, TOPICS, FORMATS, COMMENTS
+
+try:
+    from rank_bm25 import BM25Okapi
+    RANK_BM25_AVAILABLE = True
+except ImportError:
+    RANK_BM25_AVAILABLE = False
+
+
+def synthetic_queries(count: int, seed: int):
+    """Short keyword queries mixing topics, formats and comment words"""
+    rng = np.random.default_rng(seed)
+    words = " ".join(TOPICS + FORMATS + COMMENTS).lower().split()
+    return [" ".join(rng.choice(words, rng.integers(1, 5))) for _ in range(count)]
+
+
+def time_queries(search, queries):
+    """Run search over every query; returns (results, latencies in ms)"""
+    results = []
+    latencies = np.empty(len(queries))
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        results.append(search(query))
+        latencies[i] = (time.perf_counter() - start) * 1000
+    return results, latencies
+
+
+def run(num_courses: int, num_queries: int, k: int, seed: int) -> None:
+    subjects_df, courses_df, q_reports_df = generate_catalogue(num_courses, seed=seed)
+    db = HarvardDatabase(subjects_df, courses_df, q_reports_df)
+    db.process_courses()
+    db.process_q_reports()
+    db._build_bm25_index()
+    corpus = db.tokenized_corpus
+    queries = [db._tokenize_text(query) for query in synthetic_queries(num_queries, seed)]
+    print(f"{len(corpus)} documents, {sum(map(len, corpus))} tokens, {num_queries} queries, k={k}")
+
+    start = time.perf_counter()
+    index = BM25Index.from_corpus(corpus)
+    build_time = time.perf_counter() - start
+    sparse_results, sparse_latencies = time_queries(lambda query: index.top_k(query, k), queries)
+
+    print(f"{'engine':10} {'build s':>9} {'p50 ms':>9} {'p99 ms':>9}")
+    print(f"{'sparse':10} {build_time:9.2f} {np.percentile(sparse_latencies, 50):9.3f} "
+          f"{np.percentile(sparse_latencies, 99):9.3f}")
+
+    if not RANK_BM25_AVAILABLE:
+        print("rank_bm25 not installed, skipping the BM25Okapi comparison")
+        return
+
+    start = time.perf_counter()
+    okapi = BM25Okapi(corpus)
+    build_time = time.perf_counter() - start
+
+    def okapi_top_k(query):
+        scores = okapi.get_scores(query)
+        rows = np.argsort(scores)[::-1][:k]
+        return rows, scores[rows]
+
+    okapi_results, okapi_latencies = time_queries(okapi_top_k, queries)
+    print(f"{'rank_bm25':10} {build_time:9.2f} {np.percentile(okapi_latencies, 50):9.3f} "
+          f"{np.percentile(okapi_latencies, 99):9.3f}")
+    print(f"Speedup at p50: {np.percentile(okapi_latencies, 50) / np.percentile(sparse_latencies, 50):.1f}x")
+
+    # Rows can differ among tied scores, the scores themselves must not
+    mismatches = sum(not np.allclose(sparse_scores, okapi_scores)
+                     for (_, sparse_scores), (_, okapi_scores) in zip(sparse_results, okapi_results))
+    print(f"Queries with different top-{k} scores: {mismatches}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark BM25 keyword search")
+    parser.add_argument("--courses", type=int, default=20000, help="number of synthetic courses")
+    parser.add_argument("--queries", type=int, default=200, help="number of timed queries")
+    parser.add_argument("--k", type=int, default=20, help="results per query")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    run(args.courses, args.queries, args.k, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+bench_ingestion.py - Course Ingestion Benchmark
+
+Times process_courses, process_q_reports and process_concentrations on a
+synthetic catalogue. With --legacy it also times the previous row-by-row
+(iterrows) ingestion on the same data for comparison.
+
+Usage:
+    python benchmarks/bench_ingestion.py --courses 100000 --repeat 3 --legacy
+"""
+
+import argparse
+import logging
+import os
+import re
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import HarvardDatabase
+from synthetic import generate_catalogue
+
+
+def legacy_ingest(courses_df: pd.DataFrame, q_reports_df: pd.DataFrame) -> dict:
+    """The previous row-by-row ingestion, kept only as a benchmark reference"""
+    course_dict, dept_course_dict, course_by_code = {}, {}, {}
+    courses_by_level, course_by_name, courses_by_term = {}, {}, {}
+
+    courses_df = courses_df.dropna(subset=['class_name', 'course_id'])
+    for _, row in courses_df.iterrows():
+        course_id = row['course_id']
+        if course_id in course_dict:
+            continue
+        course_dict[course_id] = row.to_dict()
+
+        class_tag = row.get('class_tag', '')
+        if isinstance(class_tag, str):
+            match = re.search(r'([A-Za-z]+)\s*(\d+)', class_tag)
+            if match:
+                dept, num = match.group(1).upper(), int(match.group(2))
+                dept_course_dict.setdefault((dept, num), []).append(course_id)
+                course_by_code[f"{dept} {num}"] = course_id
+                courses_by_level.setdefault((dept, (num // 10) * 10), []).append(course_id)
+
+        class_name = row.get('class_name', '')
+        if isinstance(class_name, str) and class_name:
+            course_by_name[class_name.lower()] = course_id
+
+        term = row.get('term', '')
+        if isinstance(term, str) and term:
+            courses_by_term.setdefault(term, []).append(course_id)
+
+    q_reports_df = q_reports_df.dropna(subset=['course_id'])
+    working = pd.DataFrame.from_dict(course_dict, orient='index')
+    working['course_id'] = working['course_id'].astype(int)
+    merged = working.merge(
+        q_reports_df[['course_id', 'overall_score_course_mean', 'mean_hours', 'comments']],
+        on='course_id',
+        how='left'
+    )
+    for _, row in merged.iterrows():
+        course_id = row['course_id']
+        if course_id in course_dict:
+            course_dict[course_id].update({
+                'overall_score_course_mean': row.get('overall_score_course_mean'),
+                'mean_hours': row.get('mean_hours'),
+                'comments': row.get('comments')
+            })
+
+    return course_dict
+
+
+def time_call(fn, *args):
+    """Run fn and return (result, seconds)"""
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def run(num_courses: int, repeat: int, legacy: bool, seed: int) -> None:
+    subjects_df, courses_df, q_reports_df = generate_catalogue(num_courses, seed=seed)
+    print(f"Synthetic catalogue: {len(courses_df)} course rows, {len(q_reports_df)} Q report rows")
+
+    for attempt in range(repeat):
+        db = HarvardDatabase(subjects_df.copy(), courses_df.copy(), q_reports_df.copy())
+        _, courses_time = time_call(db.process_courses)
+        _, q_time = time_call(db.process_q_reports)
+        _, subjects_time = time_call(db.process_concentrations)
+        total = courses_time + q_time + subjects_time
+        print(f"[{attempt + 1}] courses {courses_time * 1000:8.1f} ms | "
+              f"q reports {q_time * 1000:8.1f} ms | "
+              f"concentrations {subjects_time * 1000:6.1f} ms | "
+              f"total {total * 1000:8.1f} ms")
+
+    print(f"Course table memory: {db.course_table.memory_usage() / 1e6:.1f} MB for {len(db.course_table)} courses")
+
+    if legacy:
+        _, legacy_time = time_call(legacy_ingest, courses_df.copy(), q_reports_df.copy())
+        print(f"Legacy row-by-row ingestion: {legacy_time * 1000:.1f} ms ({legacy_time / total:.1f}x the vectorized path)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark course and Q report ingestion")
+    parser.add_argument("--courses", type=int, default=100000, help="number of synthetic courses")
+    parser.add_argument("--repeat", type=int, default=3, help="number of timed runs")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for the catalogue")
+    parser.add_argument("--legacy", action="store_true", help="also time the previous iterrows ingestion")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    run(args.courses, args.repeat, args.legacy, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+bench_llm_clients.py - Per-message vs Pooled LLM Client Benchmark
+
+Starts the stub LLM server and sends the same short completions twice per
+provider: once building a new SDK client for every request (what the chat
+endpoint used to do) and once leasing clients from the pool in llm_clients.py.
+Reports per-request latency and how many TCP connections the stub accepted.
+The stub's --connect-ms delay stands in for the TCP and TLS handshakes with a
+remote API, which a kept-alive pooled connection skips.
+
+Usage:
+    python benchmarks/bench_llm_clients.py --requests 200 --concurrency 4 --connect-ms 30
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import anthropic
+import openai
+
+from llm_clients import ClientPool
+from stub_llm import start_stub_server
+
+MESSAGES = [{"role": "user", "content": "Which introductory computer science course should I take?"}]
+
+
+def complete(provider: str, client) -> None:
+    if provider == 'anthropic':
+        client.messages.create(model="stub", max_tokens=2000, system="", messages=MESSAGES)
+    else:
+        client.chat.completions.create(model="stub", max_tokens=2000, messages=MESSAGES)
+
+
+def per_message(provider: str, api_key: str) -> None:
+    client = anthropic.Anthropic(api_key=api_key) if provider == 'anthropic' else openai.Client(api_key=api_key)
+    complete(provider, client)
+
+
+def run(num_requests: int, concurrency: int, num_keys: int, connect_ms: float) -> None:
+    server = start_stub_server(tokens=20, first_token_ms=0, token_ms=0, connect_ms=connect_ms)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    os.environ['ANTHROPIC_BASE_URL'] = base_url
+    os.environ['OPENAI_BASE_URL'] = f"{base_url}/v1"
+    keys = [f"stub-key-{i}" for i in range(num_keys)]
+    print(f"{num_requests} requests, concurrency {concurrency}, {num_keys} API keys, "
+          f"{connect_ms:.0f} ms simulated connection setup")
+
+    print(f"{'path':20} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'connections':>12}")
+    for provider in ('anthropic', 'openai'):
+        pool = ClientPool()
+
+        def pooled(provider, api_key):
+            with pool.lease(provider, api_key) as client:
+                complete(provider, client)
+
+        for label, call in (('per-message', per_message), ('pooled', pooled)):
+            def timed(i):
+                start = time.perf_counter()
+                call(provider, keys[i % num_keys])
+                return (time.perf_counter() - start) * 1000
+
+            connections = server.connections
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                latencies = np.array(list(executor.map(timed, range(num_requests))))
+            print(f"{provider + ' ' + label:20} {np.percentile(latencies, 50):8.2f} {np.percentile(latencies, 95):8.2f} "
+                  f"{np.percentile(latencies, 99):8.2f} {server.connections - connections:12d}")
+        pool.clear()
+    server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-message vs pooled LLM clients")
+    parser.add_argument("--requests", type=int, default=200, help="requests per path")
+    parser.add_argument("--concurrency", type=int, default=4, help="concurrent requests")
+    parser.add_argument("--keys", type=int, default=4, help="distinct API keys the requests cycle through")
+    parser.add_argument("--connect-ms", type=float, default=30, help="stub delay per new connection")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    run(args.requests, args.concurrency, args.keys, args.connect_ms)
+
+
+if __name__ == "__main__":
+    main()
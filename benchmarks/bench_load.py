@@ -0,0 +1,127 @@
+"""
+bench_load.py - Chat Endpoint Load Test with a Stub LLM
+
+Serves a synthetic catalogue through the Flask app and sends concurrent
+/api/chat/message requests from several synthetic students, with the LLM APIs
+replaced by the local stub in stub_llm.py. Each request goes through the whole
+endpoint: user data loading, the retrieval pipeline, context building, the LLM
+call and saving the chat history. Reports throughput, p50/p95/p99 request
+latency (and time to first streamed token with --stream), and the mean time
+of each pipeline stage from the app's metrics.
+
+Use --first-token-ms 0 --token-ms 0 to leave out LLM latency and load only the
+retrieval path.
+
+Usage:
+    python benchmarks/bench_load.py --courses 20000 --requests 400 --concurrency 8 --users 20 --stream
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_pipeline import build_database, print_latency_table
+from stub_llm import start_stub_server
+from synthetic import generate_profiles, generate_queries
+
+
+def run(num_courses: int, num_requests: int, concurrency: int, num_users: int, provider: str, stream: bool,
+        tokens: int, first_token_ms: float, token_ms: float, seed: int) -> None:
+    server = start_stub_server(tokens=tokens, first_token_ms=first_token_ms, token_ms=token_ms)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    os.environ['ANTHROPIC_BASE_URL'] = base_url
+    os.environ['OPENAI_BASE_URL'] = f"{base_url}/v1"
+
+    # User data and sessions are written relative to the working directory
+    os.chdir(tempfile.mkdtemp(prefix="chatharvard-load-"))
+    import app
+    import jwt
+    from course_finder import CourseFinder
+    from course_recommender import CourseRecommender
+    from metrics import STAGE_SECONDS
+
+    start = time.perf_counter()
+    db = build_database(num_courses, seed=seed, cache_dir=os.path.abspath("embeddings_cache"))
+    app.harvard_db, app.course_finder, app.course_recommender = db, CourseFinder(db), CourseRecommender(db)
+    print(f"Built database of {len(db.course_table)} courses in {time.perf_counter() - start:.1f} s")
+
+    tokens_by_user = {}
+    for i, profile in enumerate(generate_profiles(num_users, seed=seed)):
+        user_id = f"load-{i}"
+        os.makedirs(f"user_data/{user_id}")
+        with open(f"user_data/{user_id}/profile.json", 'w') as f:
+            json.dump(profile, f)
+        tokens_by_user[user_id] = jwt.encode({'user_id': user_id, 'auth_provider': provider}, app.JWT_SECRET,
+                                             algorithm='HS256')
+
+    queries = generate_queries(num_requests, seed=seed)
+    users = list(tokens_by_user)
+    headers = {'Accept': 'text/event-stream'} if stream else {}
+    print(f"{num_requests} {'streamed' if stream else 'JSON'} requests, concurrency {concurrency}, "
+          f"{num_users} users, {provider} stub answering {tokens} tokens")
+
+    def send(i):
+        client = app.app.test_client()
+        with client.session_transaction() as sess:
+            sess['access_token'] = "stub"
+        request_headers = dict(headers, Authorization=f"Bearer {tokens_by_user[users[i % len(users)]]}")
+        start = time.perf_counter()
+        response = client.post('/api/chat/message', json={'message': queries[i]}, headers=request_headers,
+                               buffered=not stream)
+        if not stream:
+            return (time.perf_counter() - start) * 1000, None, response.status_code == 200
+
+        first_token, body = None, ""
+        for chunk in response.response:
+            body += chunk.decode()
+            if first_token is None and "event: delta" in body:
+                first_token = (time.perf_counter() - start) * 1000
+        return (time.perf_counter() - start) * 1000, first_token, "event: done" in body
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(send, range(num_requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies = {"request": [total for total, _, ok in results if ok]}
+    if stream:
+        latencies["first token"] = [first for _, first, ok in results if ok and first is not None]
+    print_latency_table(latencies)
+    failed = sum(1 for _, _, ok in results if not ok)
+    print(f"Throughput: {num_requests / elapsed:.1f} requests/s ({num_requests} in {elapsed:.2f} s, {failed} failed)")
+
+    print(f"\n{'pipeline stage':34} {'mean ms':>9} {'count':>9}")
+    for (stage,), counts in sorted(STAGE_SECONDS.values().items()):
+        count = sum(counts[:-1])
+        print(f"{stage:34} {counts[-1] / count * 1000:9.2f} {count:9d}")
+    server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the chat endpoint against a stub LLM")
+    parser.add_argument("--courses", type=int, default=20000, help="number of synthetic courses")
+    parser.add_argument("--requests", type=int, default=400, help="chat messages to send")
+    parser.add_argument("--concurrency", type=int, default=8, help="requests in flight")
+    parser.add_argument("--users", type=int, default=20, help="synthetic students sending messages")
+    parser.add_argument("--provider", choices=("anthropic", "openai"), default="anthropic")
+    parser.add_argument("--stream", action="store_true", help="request server-sent event responses")
+    parser.add_argument("--tokens", type=int, default=100, help="tokens per stub answer")
+    parser.add_argument("--first-token-ms", type=float, default=100, help="stub delay before the first token")
+    parser.add_argument("--token-ms", type=float, default=2, help="stub delay between tokens")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for the catalogue and questions")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    run(args.courses, args.requests, args.concurrency, args.users, args.provider, args.stream,
+        args.tokens, args.first_token_ms, args.token_ms, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+bench_pipeline.py - Chat Pipeline Query Replay Benchmark
+
+Builds a HarvardDatabase from a synthetic catalogue and replays a corpus of
+student questions (the README examples plus generated variants) through
+QueryProcessor, CourseFinder, CourseRecommender and ContextBuilder, the same
+stages a chat message goes through before the LLM call. Reports throughput and
+p50/p95/p99 latency per stage (and per course finder step with --steps).
+
+Repeated questions are answered from the shared result caches; --cold clears
+them before every question to measure the uncached path.
+
+Usage:
+    python benchmarks/bench_pipeline.py --courses 20000 --queries 200 --rounds 2 --concurrency 4
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache import bind_data_version
+from context_builder import ContextBuilder
+from course_finder import CourseFinder
+from course_recommender import CourseRecommender
+from database import HarvardDatabase
+from query_processor import QueryProcessor
+from synthetic import generate_catalogue, generate_profiles, generate_queries
+
+STAGES = ("query_processing", "find_courses", "recommendations", "context_building")
+
+
+def build_database(num_courses: int, seed: int = 0, cache_dir: str = None) -> HarvardDatabase:
+    """Process a synthetic catalogue the way the app processes the data files"""
+    db = HarvardDatabase(*generate_catalogue(num_courses, seed=seed))
+    if cache_dir:
+        db.cache_dir = cache_dir
+    db.process_courses()
+    db.process_q_reports()
+    db.process_concentrations()
+    db.build_indexes()
+    return db
+
+
+def percentile_row(label: str, samples_ms: List[float]) -> str:
+    samples = np.asarray(samples_ms)
+    return (f"{label:34} {samples.mean():9.2f} {np.percentile(samples, 50):9.2f} "
+            f"{np.percentile(samples, 95):9.2f} {np.percentile(samples, 99):9.2f}")
+
+
+def print_latency_table(samples: Dict[str, List[float]]) -> None:
+    print(f"{'stage':34} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for label, values in samples.items():
+        if values:
+            print(percentile_row(label, values))
+
+
+def replay(db: HarvardDatabase, finder: CourseFinder, recommender: CourseRecommender, query: str, profile: Dict,
+           cold: bool) -> Dict[str, float]:
+    """Run one question through the pipeline; returns milliseconds by stage"""
+    if cold:
+        bind_data_version(uuid.uuid4().hex)
+
+    timings = {}
+    chat_history = [{"role": "user", "content": query}]
+    start = time.perf_counter()
+    query_info = QueryProcessor(query, chat_history, None).process()
+    timings["query_processing"] = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    course_results = finder.find_courses(query_info, profile)
+    timings["find_courses"] = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    recommendations = recommender.get_recommendations(query_info, profile)
+    timings["recommendations"] = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    ContextBuilder(query_info, course_results, recommendations, profile, db).build_context()
+    timings["context_building"] = (time.perf_counter() - start) * 1000
+
+    for step, ms in course_results.get("stage_timings", {}).items():
+        timings[f"find_courses.{step}"] = ms
+    return timings
+
+
+def run(num_courses: int, num_queries: int, rounds: int, concurrency: int, cold: bool, steps: bool,
+        seed: int) -> None:
+    start = time.perf_counter()
+    db = build_database(num_courses, seed=seed, cache_dir=tempfile.mkdtemp(prefix="chatharvard-bench-"))
+    print(f"Built database of {len(db.course_table)} courses in {time.perf_counter() - start:.1f} s "
+          f"(vector search {'enabled' if db.embedding_index is not None else 'disabled'})")
+
+    # Shared by all requests, as in app.py
+    finder, recommender = CourseFinder(db), CourseRecommender(db)
+    queries = generate_queries(num_queries, seed=seed)
+    profiles = generate_profiles(max(1, num_queries // 10), seed=seed)
+    jobs = [(queries[i], profiles[i % len(profiles)]) for _ in range(rounds) for i in range(len(queries))]
+    print(f"Replaying {len(queries)} questions x {rounds} rounds, concurrency {concurrency}"
+          f"{', caches cleared before every question' if cold else ''}")
+
+    def timed(job):
+        query, profile = job
+        start = time.perf_counter()
+        timings = replay(db, finder, recommender, query, profile, cold)
+        timings["total"] = (time.perf_counter() - start) * 1000
+        return timings
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(timed, jobs))
+    elapsed = time.perf_counter() - start
+
+    labels = list(STAGES) + ["total"]
+    if steps:
+        labels += sorted({name for timings in results for name in timings if name.startswith("find_courses.")})
+    print_latency_table({label: [timings[label] for timings in results if label in timings] for label in labels})
+    print(f"Throughput: {len(jobs) / elapsed:.1f} questions/s ({len(jobs)} in {elapsed:.2f} s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay student questions through the chat retrieval pipeline")
+    parser.add_argument("--courses", type=int, default=20000, help="number of synthetic courses")
+    parser.add_argument("--queries", type=int, default=200, help="distinct questions (README examples first)")
+    parser.add_argument("--rounds", type=int, default=2, help="times the question corpus is replayed")
+    parser.add_argument("--concurrency", type=int, default=1, help="questions processed at once")
+    parser.add_argument("--cold", action="store_true", help="clear the shared caches before every question")
+    parser.add_argument("--steps", action="store_true", help="also report the course finder's steps")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for the catalogue and questions")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    run(args.courses, args.queries, args.rounds, args.concurrency, args.cold, args.steps, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+bench_streaming.py - Blocking vs Streaming LLM Response Benchmark
+
+Starts the stub LLM server and compares, per provider, the blocking SDK call
+the chat endpoint used to make with the streamed path in llm_stream.py. Reports
+time to first token (for the blocking call that is the whole generation) and
+total time, with several concurrent requests sharing the streaming event loop.
+
+Usage:
+    python benchmarks/bench_streaming.py --requests 20 --concurrency 4 --tokens 400 --first-token-ms 300 --token-ms 5
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_llm import start_stub_server
+
+MESSAGES = [{"role": "user", "content": "Which introductory computer science course should I take?"}]
+
+
+def blocking_call(provider: str):
+    """(seconds to first token, seconds in total) of one non-streamed completion"""
+    import anthropic
+    import openai
+
+    start = time.perf_counter()
+    if provider == 'anthropic':
+        anthropic.Anthropic(api_key="stub").messages.create(model="stub", max_tokens=2000, system="", messages=MESSAGES)
+    else:
+        openai.Client(api_key="stub").chat.completions.create(model="stub", max_tokens=2000, messages=MESSAGES)
+    elapsed = time.perf_counter() - start
+    return elapsed, elapsed
+
+
+def streamed_call(provider: str):
+    """(seconds to first token, seconds in total) of one streamed completion"""
+    from llm_stream import stream_chat
+
+    start = time.perf_counter()
+    first = None
+    for _ in stream_chat(provider, "stub", "stub", "", MESSAGES, 2000):
+        if first is None:
+            first = time.perf_counter() - start
+    return first, time.perf_counter() - start
+
+
+def run(num_requests: int, concurrency: int, tokens: int, first_token_ms: float, token_ms: float) -> None:
+    server = start_stub_server(tokens=tokens, first_token_ms=first_token_ms, token_ms=token_ms)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    os.environ['ANTHROPIC_BASE_URL'] = base_url
+    os.environ['OPENAI_BASE_URL'] = f"{base_url}/v1"
+    print(f"{num_requests} requests, concurrency {concurrency}, {tokens} tokens, "
+          f"first token after {first_token_ms:.0f} ms, {token_ms:.0f} ms per token")
+
+    print(f"{'path':22} {'TTFT p50 ms':>12} {'TTFT p95 ms':>12} {'total p50 ms':>13}")
+    for provider in ('anthropic', 'openai'):
+        for label, call in (('blocking', blocking_call), ('streaming', streamed_call)):
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                timings = np.array(list(pool.map(lambda _: call(provider), range(num_requests)))) * 1000
+            print(f"{provider + ' ' + label:22} {np.percentile(timings[:, 0], 50):12.1f} "
+                  f"{np.percentile(timings[:, 0], 95):12.1f} {np.percentile(timings[:, 1], 50):13.1f}")
+    server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark blocking vs streaming LLM responses")
+    parser.add_argument("--requests", type=int, default=20, help="requests per path")
+    parser.add_argument("--concurrency", type=int, default=4, help="concurrent requests")
+    parser.add_argument("--tokens", type=int, default=400, help="tokens per stub answer")
+    parser.add_argument("--first-token-ms", type=float, default=300, help="stub delay before the first token")
+    parser.add_argument("--token-ms", type=float, default=5, help="stub delay between tokens")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    run(args.requests, args.concurrency, args.tokens, args.first_token_ms, args.token_ms)
+
+
+if __name__ == "__main__":
+    main()
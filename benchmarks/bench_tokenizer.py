@@ -0,0 +1,97 @@
+"""
+bench_tokenizer.py - Tokenizer Throughput Benchmark
+
+Tokenizes the BM25 text of a synthetic catalogue and reports tokens/sec for
+the regex tokenizer (with and without stemming), for repeated queries served
+from the LRU cache, and for the previous NLTK-based tokenization that rebuilt
+the stopword set on every call.
+
+Usage:
+    python benchmarks/bench_tokenizer.py --courses 50000
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tokenizer import Tokenizer
+from synthetic import generate_catalogue
+
+BASIC_STOPWORDS = {'the', 'a', 'an', 'and', 'or', 'but', 'if', 'because', 'as', 'what',
+                   'when', 'where', 'how', 'who', 'which', 'this', 'that', 'these', 'those',
+                   'then', 'just', 'so', 'than', 'such', 'both', 'through', 'about', 'for',
+                   'is', 'of', 'while', 'during', 'to', 'from', 'in', 'on', 'at', 'by'}
+
+
+def legacy_tokenize(text: str):
+    """The previous HarvardDatabase._tokenize_text, kept only as a benchmark reference"""
+    try:
+        from nltk.tokenize import word_tokenize
+        from nltk.corpus import stopwords
+        tokens = word_tokenize(text)
+        stop_words = set(stopwords.words('english'))
+        return [token.lower() for token in tokens
+                if token.lower() not in stop_words and token.isalpha()]
+    except Exception:
+        words = text.lower().split()
+        return [word for word in words if word.isalpha() and word not in BASIC_STOPWORDS]
+
+
+def course_texts(num_courses: int, seed: int):
+    """The fields HarvardDatabase indexes for BM25, joined per course"""
+    _, courses_df, q_reports_df = generate_catalogue(num_courses, seed=seed)
+    comments = q_reports_df.drop_duplicates('course_id').set_index('course_id')['comments']
+    courses_df = courses_df.drop_duplicates('course_id')
+    fields = [courses_df['class_name'], courses_df['class_tag'], courses_df['description'],
+              courses_df['course_requirements'].fillna(''), courses_df['course_id'].map(comments).fillna('')]
+    return [" ".join(parts) for parts in zip(*fields)]
+
+
+def throughput(tokenize, texts):
+    """Returns (tokens per second, total tokens)"""
+    start = time.perf_counter()
+    total = sum(len(tokenize(text)) for text in texts)
+    return total / (time.perf_counter() - start), total
+
+
+def run(num_courses: int, num_queries: int, legacy_sample: int, seed: int) -> None:
+    texts = course_texts(num_courses, seed)
+    rng = np.random.default_rng(seed)
+    distinct_queries = [texts[i][:60] for i in rng.integers(0, len(texts), 200)]
+    queries = [distinct_queries[i] for i in rng.integers(0, len(distinct_queries), num_queries)]
+    print(f"{len(texts)} documents, {num_queries} queries ({len(set(queries))} distinct)")
+
+    print(f"{'path':28} {'tokens/s':>12} {'tokens':>10}")
+    for label, tokenizer in (('regex', Tokenizer()), ('regex + stemming', Tokenizer(stemming=True))):
+        rate, total = throughput(tokenizer.tokenize, texts)
+        print(f"{label:28} {rate:12,.0f} {total:10,}")
+
+    tokenizer = Tokenizer()
+    rate, total = throughput(tokenizer.tokenize_query, queries)
+    info = tokenizer.cache_info()
+    print(f"{'cached queries':28} {rate:12,.0f} {total:10,}  (hits {info.hits}, misses {info.misses})")
+
+    rate, total = throughput(legacy_tokenize, texts[:legacy_sample])
+    print(f"{'legacy (first %d docs)' % legacy_sample:28} {rate:12,.0f} {total:10,}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark BM25 tokenization throughput")
+    parser.add_argument("--courses", type=int, default=50000, help="number of synthetic courses")
+    parser.add_argument("--queries", type=int, default=20000, help="number of queries, drawn from 200 distinct ones")
+    parser.add_argument("--legacy-sample", type=int, default=5000, help="documents tokenized with the legacy path")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    run(args.courses, args.queries, args.legacy_sample, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+bench_vector_index.py - Vector Index Backend Benchmark
+
+Builds each vector index backend over synthetic clustered unit-length
+embeddings and reports build time, index size, recall@k against the exact flat
+index, and p50/p99 single-query latency. Quantized backends (sq8, fp16) are
+reported both as they are and with exact float rescoring of their candidates.
+
+Usage:
+    python benchmarks/bench_vector_index.py --vectors 1000000 --dim 384 --queries 1000 --k 10
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vector_index import INDEX_BACKENDS, QUANTIZED_BACKENDS, build_vector_index, serialize_index, search_index
+
+
+def synthetic_embeddings(count: int, dimension: int, clusters: int, seed: int, sample_seed: int,
+                         latent_dim: int = 48) -> np.ndarray:
+    """Unit-length vectors around shared topic centres, varying along a few latent directions
+
+    Sentence embeddings have a low intrinsic dimension, so within-topic variation
+    comes from a latent_dim-dimensional subspace plus a little isotropic noise.
+    """
+    shared = np.random.default_rng(seed)
+    centres = shared.standard_normal((clusters, dimension)).astype(np.float32)
+    basis = shared.standard_normal((latent_dim, dimension)).astype(np.float32) / np.sqrt(latent_dim)
+
+    rng = np.random.default_rng(sample_seed)
+    vectors = centres[rng.integers(0, clusters, count)]
+    vectors += 0.7 * rng.standard_normal((count, latent_dim)).astype(np.float32) @ basis
+    vectors += 0.05 * rng.standard_normal((count, dimension)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def search_latencies(index, queries: np.ndarray, k: int, vectors=None, rescore_factor=None):
+    """Search one query at a time; returns (result ids, latencies in ms)"""
+    ids = np.empty((len(queries), k), dtype=np.int64)
+    latencies = np.empty(len(queries))
+    for i in range(len(queries)):
+        start = time.perf_counter()
+        _, found = search_index(index, queries[i:i + 1], k, vectors, rescore_factor)
+        latencies[i] = (time.perf_counter() - start) * 1000
+        ids[i] = found[0]
+    return ids, latencies
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    """Fraction of the exact top-k neighbours that were returned"""
+    hits = sum(len(np.intersect1d(f[f >= 0], t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def run(count: int, dimension: int, num_queries: int, k: int, backends, seed: int) -> None:
+    clusters = max(8, count // 500)
+    vectors = synthetic_embeddings(count, dimension, clusters, seed=seed, sample_seed=seed + 1)
+    queries = synthetic_embeddings(num_queries, dimension, clusters, seed=seed, sample_seed=seed + 2)
+    print(f"{count} vectors of dimension {dimension}, {num_queries} queries, k={k}")
+
+    truth = None
+    print(f"float32 vectors: {vectors.nbytes / 1e6:.1f} MB")
+    print(f"{'backend':14} {'build s':>9} {'size MB':>9} {'recall@k':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    for backend in ['flat'] + [b for b in backends if b != 'flat']:
+        start = time.perf_counter()
+        index = build_vector_index(vectors, backend)
+        build_time = time.perf_counter() - start
+        size_mb = len(serialize_index(index)) / 1e6
+
+        # Quantized backends: raw quantized scores, then rescored against the float vectors
+        runs = [(backend, None)]
+        if backend in QUANTIZED_BACKENDS:
+            runs = [(backend, 0), (f"{backend}+rescore", None)]
+        for label, rescore_factor in runs:
+            found, latencies = search_latencies(index, queries, k, vectors, rescore_factor)
+            if truth is None:
+                truth = found
+            print(f"{label:14} {build_time:9.2f} {size_mb:9.1f} {recall_at_k(found, truth):9.3f} "
+                  f"{np.percentile(latencies, 50):8.3f} {np.percentile(latencies, 99):8.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark vector index backends")
+    parser.add_argument("--vectors", type=int, default=200000, help="number of indexed vectors")
+    parser.add_argument("--dim", type=int, default=384, help="embedding dimension")
+    parser.add_argument("--queries", type=int, default=500, help="number of timed queries")
+    parser.add_argument("--k", type=int, default=10, help="neighbours per query")
+    parser.add_argument("--backends", nargs="+", default=list(INDEX_BACKENDS), choices=INDEX_BACKENDS)
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    run(args.vectors, args.dim, args.queries, args.k, args.backends, args.seed)
+
+
+if __name__ == "__main__":
+    main()
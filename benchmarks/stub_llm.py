@@ -0,0 +1,176 @@
+"""
+stub_llm.py - Local Stub LLM Server
+
+Serves the Anthropic Messages API (POST /v1/messages) and the OpenAI Chat
+Completions API (POST /v1/chat/completions), both plain and streamed, with a
+canned answer generated at a fixed pace. Point the SDKs at it to exercise the
+chat endpoints without network access or API keys:
+
+    ANTHROPIC_BASE_URL=http://127.0.0.1:8089
+    OPENAI_BASE_URL=http://127.0.0.1:8089/v1
+
+GET /stats reports how many requests and TCP connections it has served.
+--connect-ms delays every new connection, standing in for the TCP and TLS
+handshakes with a remote API.
+
+Usage:
+    python benchmarks/stub_llm.py --port 8089 --tokens 200 --first-token-ms 300 --token-ms 10 --connect-ms 0
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+
+WORDS = ("Consider", "COMPSCI", "50", "for", "an", "introduction", "to", "programming;", "its", "workload",
+         "is", "about", "12", "hours", "per", "week", "and", "students", "rate", "it", "highly.")
+
+
+class StubLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], tokens: int, first_token_ms: float, token_ms: float,
+                 connect_ms: float = 0):
+        super().__init__(address, StubLLMHandler)
+        self.tokens = tokens
+        self.first_token_ms = first_token_ms
+        self.token_ms = token_ms
+        self.connect_ms = connect_ms
+        self.requests = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+
+    def count(self, field: str) -> None:
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def answer(self):
+        """Tokens of the canned answer, each released at the configured pace"""
+        time.sleep(self.first_token_ms / 1000)
+        for i in range(self.tokens):
+            if i:
+                time.sleep(self.token_ms / 1000)
+            yield WORDS[i % len(WORDS)] + " "
+
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # headers and body are separate writes on kept-alive connections
+
+    def setup(self):
+        super().setup()
+        self.server.count('connections')
+        time.sleep(self.server.connect_ms / 1000)
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.rstrip('/') != '/stats':
+            return self._send_json({"error": "not found"}, status=404)
+        self._send_json({"requests": self.server.requests, "connections": self.server.connections})
+
+    def do_POST(self):
+        self.server.count('requests')
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length) or b'{}')
+        model = body.get('model', 'stub')
+        path = self.path.split('?')[0].rstrip('/')
+
+        if path.endswith('/messages'):
+            if body.get('stream'):
+                return self._stream(self._anthropic_events(model))
+            text = "".join(self.server.answer())
+            return self._send_json({
+                "id": "msg_stub", "type": "message", "role": "assistant", "model": model,
+                "content": [{"type": "text", "text": text}],
+                "stop_reason": "end_turn", "stop_sequence": None,
+                "usage": {"input_tokens": 1, "output_tokens": self.server.tokens}
+            })
+
+        if path.endswith('/chat/completions'):
+            if body.get('stream'):
+                return self._stream(self._openai_events(model))
+            text = "".join(self.server.answer())
+            return self._send_json({
+                "id": "chatcmpl-stub", "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 1, "completion_tokens": self.server.tokens,
+                          "total_tokens": self.server.tokens + 1}
+            })
+
+        self._send_json({"error": "not found"}, status=404)
+
+    def _anthropic_events(self, model: str):
+        yield "message_start", {"type": "message_start", "message": {
+            "id": "msg_stub", "type": "message", "role": "assistant", "model": model, "content": [],
+            "stop_reason": None, "stop_sequence": None, "usage": {"input_tokens": 1, "output_tokens": 0}}}
+        yield "content_block_start", {"type": "content_block_start", "index": 0,
+                                      "content_block": {"type": "text", "text": ""}}
+        for token in self.server.answer():
+            yield "content_block_delta", {"type": "content_block_delta", "index": 0,
+                                          "delta": {"type": "text_delta", "text": token}}
+        yield "content_block_stop", {"type": "content_block_stop", "index": 0}
+        yield "message_delta", {"type": "message_delta", "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                                "usage": {"output_tokens": self.server.tokens}}
+        yield "message_stop", {"type": "message_stop"}
+
+    def _openai_events(self, model: str):
+        chunk = {"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": int(time.time()), "model": model}
+        for token in self.server.answer():
+            yield None, dict(chunk, choices=[{"index": 0, "delta": {"content": token}, "finish_reason": None}])
+        yield None, dict(chunk, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        yield None, "[DONE]"
+
+    def _stream(self, events) -> None:
+        """Send events as server-sent events over a chunked response"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for event, data in events:
+            payload = data if isinstance(data, str) else json.dumps(data)
+            message = (f"event: {event}\n" if event else "") + f"data: {payload}\n\n"
+            self._write_chunk(message.encode())
+        self._write_chunk(b"")
+
+    def _write_chunk(self, data: bytes) -> None:
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, data, status: int = 200) -> None:
+        payload = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def start_stub_server(host: str = "127.0.0.1", port: int = 0, tokens: int = 200, first_token_ms: float = 300,
+                      token_ms: float = 10, connect_ms: float = 0) -> StubLLMServer:
+    """Serve the stub in a background thread; port 0 picks a free port (see server.server_address)"""
+    server = StubLLMServer((host, port), tokens, first_token_ms, token_ms, connect_ms)
+    threading.Thread(target=server.serve_forever, name="stub-llm", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stub of the Anthropic and OpenAI chat APIs")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--tokens", type=int, default=200, help="tokens per answer")
+    parser.add_argument("--first-token-ms", type=float, default=300, help="delay before the first token")
+    parser.add_argument("--token-ms", type=float, default=10, help="delay between tokens")
+    parser.add_argument("--connect-ms", type=float, default=0, help="delay when a new connection is opened")
+    args = parser.parse_args()
+
+    server = StubLLMServer((args.host, args.port), args.tokens, args.first_token_ms, args.token_ms, args.connect_ms)
+    print(f"Stub LLM server on http://{args.host}:{server.server_address[1]}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+synthetic.py - Synthetic Course Catalogue Generator
+
+Builds subjects, courses and Q report dataframes with the same columns as the
+CSV exports the app loads, at any size, so ingestion, filtering and search can
+be benchmarked without the real data. Also generates student questions (the
+README examples plus variants over the synthetic departments and topics) and
+student profiles to replay through the chat pipeline.
+"""
+
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+DEPARTMENTS = [
+    ('MATH', 'Mathematics'), ('COMPSCI', 'Computer Science'), ('ECON', 'Economics'),
+    ('HIST', 'History'), ('APMTH', 'Applied Mathematics'), ('STAT', 'Statistics'),
+    ('GOV', 'Government'), ('PHYSICS', 'Physics'), ('CHEM', 'Chemistry'),
+    ('ENGLISH', 'English'), ('PHIL', 'Philosophy'), ('PSY', 'Psychology'),
+    ('MCB', 'Molecular and Cellular Biology'), ('SOCIOL', 'Sociology'),
+    ('ES', 'Engineering Sciences'), ('MUSIC', 'Music')
+]
+
+TERMS = ['Fall 2023', 'Spring 2024', 'Fall 2024', 'Spring 2025']
+
+TOPICS = [
+    'algebra', 'analysis', 'probability', 'machine learning', 'algorithms', 'markets',
+    'game theory', 'political institutions', 'revolutions', 'quantum mechanics',
+    'organic chemistry', 'poetry', 'ethics', 'cognition', 'genetics', 'networks',
+    'statistics', 'data science', 'climate', 'composition'
+]
+
+FORMATS = ['lecture', 'seminar', 'tutorial', 'workshop', 'lab']
+
+COMMENTS = [
+    'Great course, highly recommend',
+    'Challenging problem sets but worth it',
+    'Lectures were engaging',
+    'Heavy workload',
+    'Easy and interesting'
+]
+
+# The example questions from the README
+EXAMPLE_QUERIES = [
+    "What 130s level Math courses are offered in the Fall?",
+    "I need to take a course with less than 10 hours of work per week. What do you recommend?",
+    "What are the requirements for a Mathematics concentration?",
+    "I'm a CS major. What courses should I take after CS50?",
+    "What's the easiest 100-level Economics course?",
+    "Tell me about Math 136. What are the student comments like?"
+]
+
+QUERY_TEMPLATES = [
+    "What {level}s level {dept} courses are offered in the {season}?",
+    "I need to take a course with less than {hours} hours of work per week. What do you recommend?",
+    "What are the requirements for a {dept} concentration?",
+    "I'm concentrating in {dept}. What courses should I take after {code} {number}?",
+    "What's the easiest {level}-level {dept} course?",
+    "Tell me about {code} {number}. What are the student comments like?",
+    "Are there any {format}s on {topic} this {season}?",
+    "I'm interested in {topic}. Which {dept} courses would you recommend?",
+    "Compare {code} {number} and {code} {other_number}. Which has the lighter workload?",
+    "What is the best rated course on {topic}?"
+]
+
+YEARS = ['Freshman', 'Sophomore', 'Junior', 'Senior']
+
+
+def generate_catalogue(num_courses: int,
+                       seed: int = 0,
+                       duplicate_fraction: float = 0.02,
+                       q_report_fraction: float = 0.8) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """Generate (subjects_df, courses_df, q_reports_df) for a catalogue of num_courses
+
+    A small fraction of course rows are repeated (as in the real export) and
+    roughly q_report_fraction of courses get a Q report, a few of them twice.
+    """
+    rng = np.random.default_rng(seed)
+
+    dept_index = rng.integers(0, len(DEPARTMENTS), num_courses)
+    dept_codes = np.array([code for code, _ in DEPARTMENTS], dtype=object)[dept_index]
+    dept_names = np.array([name for _, name in DEPARTMENTS], dtype=object)[dept_index]
+    numbers = rng.integers(1, 300, num_courses).astype(str)
+    topics = np.array(TOPICS, dtype=object)[rng.integers(0, len(TOPICS), num_courses)]
+    formats = np.array(FORMATS, dtype=object)[rng.integers(0, len(FORMATS), num_courses)]
+    course_ids = np.arange(100000, 100000 + num_courses)
+
+    courses_df = pd.DataFrame({
+        'course_id': course_ids,
+        'class_name': 'Topics in ' + pd.Series(topics).str.title() + ' ' + course_ids.astype(str),
+        'class_tag': dept_codes + ' ' + numbers,
+        'term': np.array(TERMS, dtype=object)[rng.integers(0, len(TERMS), num_courses)],
+        'description': ('A ' + formats + ' on ' + topics + ' offered by the department of ' + dept_names + '.'),
+        'course_requirements': np.where(rng.random(num_courses) < 0.3, 'Prerequisite: MATH 21A', None),
+        'instructors': np.array(['Smith', 'Jones', 'Lee', 'Garcia', 'Chen'], dtype=object)[rng.integers(0, 5, num_courses)],
+        'department': dept_names
+    })
+
+    # The export repeats some course rows
+    duplicates = courses_df.sample(frac=duplicate_fraction, random_state=seed)
+    courses_df = pd.concat([courses_df, duplicates], ignore_index=True)
+
+    reported = course_ids[rng.random(num_courses) < q_report_fraction]
+    repeated = reported[rng.random(len(reported)) < 0.05]
+    report_ids = np.concatenate([reported, repeated])
+    q_reports_df = pd.DataFrame({
+        'course_id': report_ids,
+        'overall_score_course_mean': np.round(rng.uniform(2.5, 5.0, len(report_ids)), 2),
+        'mean_hours': np.round(rng.uniform(1.0, 20.0, len(report_ids)), 1),
+        'comments': np.array([str([comment]) for comment in COMMENTS], dtype=object)[rng.integers(0, len(COMMENTS), len(report_ids))]
+    })
+
+    subjects_df = pd.DataFrame({
+        'subject': [name for _, name in DEPARTMENTS],
+        'department': [name for _, name in DEPARTMENTS],
+        'ab0': [code for code, _ in DEPARTMENTS],
+        'ab1': [code.title() for code, _ in DEPARTMENTS],
+        'ab2': [''] * len(DEPARTMENTS)
+    })
+
+    return subjects_df, courses_df, q_reports_df
+
+
+def generate_queries(num_queries: int, seed: int = 0) -> List[str]:
+    """The README example questions followed by generated variants, num_queries in total"""
+    rng = np.random.default_rng(seed)
+    queries = EXAMPLE_QUERIES[:num_queries]
+    while len(queries) < num_queries:
+        code, dept = DEPARTMENTS[rng.integers(0, len(DEPARTMENTS))]
+        template = QUERY_TEMPLATES[rng.integers(0, len(QUERY_TEMPLATES))]
+        queries.append(template.format(
+            level=int(rng.integers(1, 3)) * 100 if rng.random() < 0.5 else int(rng.integers(1, 30)) * 10,
+            dept=dept,
+            code=code,
+            number=int(rng.integers(1, 300)),
+            other_number=int(rng.integers(1, 300)),
+            season=('Fall', 'Spring')[rng.integers(0, 2)],
+            hours=int(rng.integers(4, 16)),
+            format=FORMATS[rng.integers(0, len(FORMATS))],
+            topic=TOPICS[rng.integers(0, len(TOPICS))]
+        ))
+    return queries
+
+
+def generate_profiles(num_profiles: int, seed: int = 0) -> List[Dict]:
+    """Student profiles with the fields the profile page saves"""
+    rng = np.random.default_rng(seed)
+    profiles = []
+    for _ in range(num_profiles):
+        code, dept = DEPARTMENTS[rng.integers(0, len(DEPARTMENTS))]
+        profiles.append({
+            'concentration': dept,
+            'year': YEARS[rng.integers(0, len(YEARS))],
+            'courses_taken': [f"{code} {int(number)}" for number in rng.integers(1, 300, rng.integers(0, 6))],
+            'interests': [str(topic) for topic in rng.choice(TOPICS, size=2, replace=False)],
+            'learning_preferences': [str(rng.choice(FORMATS))]
+        })
+    return profiles
@@ -0,0 +1,165 @@
+"""
+bm25.py - Sparse BM25 Keyword Index
+
+This module scores course documents against keyword queries with Okapi BM25.
+Term weights are computed once at build time and stored as a sparse
+document-by-term matrix in compressed column form, so each column is the
+posting list of one term. Scoring a query only touches the postings of its
+terms, and the top results are selected without sorting every document.
+
+The postings are plain arrays (to_arrays/from_arrays), so a snapshot can store
+them and every worker process memory-maps the same pages.
+
+Scores match rank_bm25's BM25Okapi (same k1, b and epsilon idf floor).
+"""
+
+import logging
+from typing import Dict, List, Sequence, Tuple, Any
+
+import numpy as np
+
+try:
+    from scipy import sparse
+    SCIPY_AVAILABLE = True
+except ImportError:
+    SCIPY_AVAILABLE = False
+
+logger = logging.getLogger("BM25Index")
+
+
+class BM25Index:
+    """Okapi BM25 over a tokenized corpus, backed by per-term postings"""
+
+    def __init__(self,
+                 vocabulary: Dict[str, int],
+                 token_ids: np.ndarray,
+                 doc_offsets: np.ndarray,
+                 k1: float = 1.5,
+                 b: float = 0.75,
+                 epsilon: float = 0.25):
+        """
+        Build the index from a flat token stream
+
+        Args:
+            vocabulary: Token to term id
+            token_ids: Term ids of all documents, concatenated
+            doc_offsets: Start of each document in token_ids, plus the total length
+            k1, b: BM25 term frequency saturation and length normalization
+            epsilon: Floor for negative idf values, as a fraction of the average idf
+        """
+        self.vocabulary = vocabulary
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+
+        token_ids = np.asarray(token_ids, dtype=np.int64)
+        doc_lengths = np.diff(np.asarray(doc_offsets, dtype=np.int64))
+        self.corpus_size = len(doc_lengths)
+        num_terms = len(vocabulary)
+
+        # Term frequencies: duplicate (doc, term) entries are summed
+        doc_of_token = np.repeat(np.arange(self.corpus_size), doc_lengths)
+        frequencies = sparse.csc_matrix(
+            (np.ones(len(token_ids)), (doc_of_token, token_ids)),
+            shape=(self.corpus_size, num_terms)
+        )
+        frequencies.sum_duplicates()
+
+        # Inverse document frequency with negative values floored at epsilon * average
+        doc_freq = np.diff(frequencies.indptr)
+        idf = np.log(self.corpus_size - doc_freq + 0.5) - np.log(doc_freq + 0.5)
+        self.average_idf = float(idf.mean()) if num_terms else 0.0
+        idf[idf < 0] = self.epsilon * self.average_idf
+        self.idf = idf
+
+        # Length norms are per document, so the final weight of every posting is fixed
+        self.avgdl = doc_lengths.mean() if self.corpus_size else 0.0
+        length_norm = k1 * (1 - b + b * doc_lengths / self.avgdl) if self.avgdl else np.full(self.corpus_size, k1)
+        term_of_posting = np.repeat(np.arange(num_terms), doc_freq)
+        tf = frequencies.data
+        self.indptr = frequencies.indptr
+        self.indices = frequencies.indices
+        self.data = idf[term_of_posting] * tf * (k1 + 1) / (tf + length_norm[frequencies.indices])
+
+        logger.info(f"Built BM25 index with {self.corpus_size} documents and {num_terms} terms")
+
+    @classmethod
+    def from_corpus(cls, tokenized_corpus: Sequence[Sequence[str]], **params) -> "BM25Index":
+        """Build the index from a list of token lists"""
+        vocabulary = {}
+        token_ids = []
+        offsets = [0]
+        for tokens in tokenized_corpus:
+            token_ids.extend(vocabulary.setdefault(token, len(vocabulary)) for token in tokens)
+            offsets.append(len(token_ids))
+        return cls(vocabulary, np.asarray(token_ids, dtype=np.int64), np.asarray(offsets, dtype=np.int64), **params)
+
+    # Arrays that fully describe a built index
+    ARRAYS = ('indptr', 'indices', 'data', 'idf')
+
+    def to_arrays(self) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+        """Split the index into postings arrays and a dict of scalar parameters"""
+        arrays = {name: getattr(self, name) for name in self.ARRAYS}
+        params = {'k1': self.k1, 'b': self.b, 'epsilon': self.epsilon, 'corpus_size': self.corpus_size,
+                  'average_idf': self.average_idf, 'avgdl': float(self.avgdl)}
+        return arrays, params
+
+    @classmethod
+    def from_arrays(cls, vocabulary: Dict[str, int], arrays: Dict[str, np.ndarray],
+                    params: Dict[str, Any]) -> "BM25Index":
+        """Restore an index from to_arrays output without recomputing weights
+
+        The arrays are used as they are, so memory-mapped arrays stay shared
+        between processes.
+        """
+        index = cls.__new__(cls)
+        index.vocabulary = vocabulary
+        for name in cls.ARRAYS:
+            setattr(index, name, arrays[name])
+        for name, value in params.items():
+            setattr(index, name, value)
+        return index
+
+    def _query_terms(self, query_tokens: Sequence[str]) -> Tuple[List[int], List[int]]:
+        """Known term ids of a query and how often each occurs in it"""
+        counts = {}
+        for token in query_tokens:
+            term = self.vocabulary.get(token)
+            if term is not None:
+                counts[term] = counts.get(term, 0) + 1
+        return list(counts), list(counts.values())
+
+    def get_scores(self, query_tokens: Sequence[str]) -> np.ndarray:
+        """BM25 score of every document; repeated query tokens count once per occurrence"""
+        scores = np.zeros(self.corpus_size)
+        indptr, indices, data = self.indptr, self.indices, self.data
+        for term, count in zip(*self._query_terms(query_tokens)):
+            start, end = indptr[term], indptr[term + 1]
+            # Rows within one posting list are unique, so fancy-index += is safe
+            scores[indices[start:end]] += count * data[start:end]
+        return scores
+
+    def top_k(self, query_tokens: Sequence[str], k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        The k best documents for a query
+
+        Returns (rows, scores) ordered by descending score; ties are broken by
+        document order so results are deterministic.
+        """
+        scores = self.get_scores(query_tokens)
+        k = min(k, self.corpus_size)
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        if k < self.corpus_size:
+            # Partition around the k-th best score, then keep the earliest tied rows
+            kth = np.argpartition(-scores, k - 1)[k - 1]
+            threshold = scores[kth]
+            above = np.flatnonzero(scores > threshold)
+            tied = np.flatnonzero(scores == threshold)[:k - len(above)]
+            rows = np.concatenate([above, tied])
+        else:
+            rows = np.arange(self.corpus_size)
+
+        rows = rows[np.lexsort((rows, -scores[rows]))]
+        return rows, scores[rows]
@@ -0,0 +1,245 @@
+"""
+cache.py - Shared Bounded Caches
+
+This module provides the process-wide caches used for search results, course
+finder lookups and recommendations. Each cache is an LRU bounded by entry
+count and (approximate) bytes, with an optional time-to-live, and counts hits,
+misses, evictions and expirations so its size can be tuned.
+
+Caches are shared by name across requests. They are tied to a data version
+(the snapshot content hash): binding a different version clears every cache
+whose entries describe the old data. Caches created with versioned=False
+(e.g. query embeddings, which only depend on the model) are kept.
+
+Bounds can be overridden per cache with <NAME>_CACHE_SIZE, <NAME>_CACHE_MAX_MB
+and <NAME>_CACHE_TTL environment variables (e.g. SEARCH_CACHE_TTL=600).
+"""
+
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger("Cache")
+
+_MISSING = object()
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(text: str) -> str:
+    """Cache key form of query text: lowercase with collapsed whitespace"""
+    if not isinstance(text, str):
+        return text
+    return _WHITESPACE.sub(" ", text).strip().lower()
+
+
+def estimate_size(value: Any, depth: int = 3) -> int:
+    """Approximate memory footprint of a cached value in bytes
+
+    Follows containers a few levels deep; numpy arrays count their buffers.
+    Objects that only reference shared data (e.g. course rows) count their
+    own size, not the data they point to.
+    """
+    if isinstance(value, np.ndarray):
+        # getsizeof includes the buffer only for arrays that own their data
+        return sys.getsizeof(value) if value.base is None else sys.getsizeof(value) + value.nbytes
+    size = sys.getsizeof(value)
+    if depth <= 0:
+        return size
+    if isinstance(value, dict):
+        size += sum(estimate_size(k, depth - 1) + estimate_size(v, depth - 1) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(item, depth - 1) for item in value)
+    return size
+
+
+class BoundedCache:
+    """Thread-safe LRU cache with entry, byte and time-to-live bounds"""
+
+    def __init__(self, name: str, max_entries: int = 1024, max_bytes: Optional[int] = None,
+                 ttl: Optional[float] = None):
+        """
+        Args:
+            name: Cache name used in statistics and logs
+            max_entries: Maximum number of entries
+            max_bytes: Maximum estimated size of all values (None for no limit)
+            ttl: Seconds an entry stays valid (None for no expiry)
+        """
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (value, size, expires_at)
+        self._bytes = 0
+        self._lock = threading.RLock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _live_entry(self, key: Hashable):
+        """Entry for key, dropping it when expired; caller holds the lock"""
+        entry = self._entries.get(key)
+        if entry is not None and entry[2] is not None and entry[2] <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            return None
+        return entry
+
+    def _remove(self, key: Hashable) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Cached value for key (marked most recently used), or default"""
+        with self._lock:
+            entry = self._live_entry(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def __contains__(self, key: Hashable) -> bool:
+        """Whether key has a live entry; does not count as a hit or miss"""
+        with self._lock:
+            return self._live_entry(key) is not None
+
+    def __getitem__(self, key: Hashable) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: Hashable, value: Any) -> None:
+        self.set(key, value)
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store value, evicting least recently used entries to stay within bounds"""
+        size = estimate_size(value) if self.max_bytes is not None else 0
+        if self.max_bytes is not None and size > self.max_bytes:
+            return  # Larger than the whole cache
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, expires_at)
+            self._bytes += size
+
+            while len(self._entries) > self.max_entries or (
+                    self.max_bytes is not None and self._bytes > self.max_bytes):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def items(self) -> List[Tuple[Hashable, Any]]:
+        """Live (key, value) pairs, least recently used first"""
+        with self._lock:
+            now = time.monotonic()
+            return [(key, value) for key, (value, _, expires_at) in self._entries.items()
+                    if expires_at is None or expires_at > now]
+
+    def clear(self) -> None:
+        """Drop all entries (statistics are kept)"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit, miss, eviction and size statistics"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
+
+
+# Process-wide registry of shared caches and the data version they describe
+_caches: Dict[str, BoundedCache] = {}
+_unversioned = set()  # Names of caches kept when the data version changes
+_data_version: Optional[str] = None
+_registry_lock = threading.Lock()
+
+
+def _env_number(name: str, cast, default):
+    value = os.getenv(name)
+    if value is None or value == '':
+        return default
+    try:
+        return cast(value)
+    except ValueError:
+        logger.warning(f"Ignoring invalid {name}={value!r}")
+        return default
+
+
+def shared_cache(name: str, max_entries: int = 1024, max_mb: Optional[float] = None,
+                 ttl: Optional[float] = None, versioned: bool = True) -> BoundedCache:
+    """The process-wide cache called name, created with these bounds on first use
+
+    versioned=False keeps the cache when the data version changes.
+    """
+    cache = _caches.get(name)
+    if cache is not None:
+        return cache
+
+    with _registry_lock:
+        if name not in _caches:
+            prefix = name.upper()
+            max_mb = _env_number(f"{prefix}_CACHE_MAX_MB", float, max_mb)
+            _caches[name] = BoundedCache(
+                name,
+                max_entries=_env_number(f"{prefix}_CACHE_SIZE", int, max_entries),
+                max_bytes=int(max_mb * 1e6) if max_mb else None,
+                ttl=_env_number(f"{prefix}_CACHE_TTL", float, ttl)
+            )
+            if not versioned:
+                _unversioned.add(name)
+        return _caches[name]
+
+
+def bind_data_version(version: str) -> bool:
+    """Tie the shared caches to a data version, clearing them when it changes
+
+    Returns True if the caches were invalidated.
+    """
+    global _data_version
+    if version == _data_version:
+        return False
+
+    with _registry_lock:
+        if version == _data_version:
+            return False
+        versioned = [cache for name, cache in _caches.items() if name not in _unversioned]
+        for cache in versioned:
+            cache.clear()
+        if _data_version is not None:
+            logger.info(f"Data version changed, cleared {len(versioned)} shared caches")
+        _data_version = version
+        return True
+
+
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Statistics of every shared cache by name"""
+    return {name: cache.stats() for name, cache in list(_caches.items())}
@@ -57,20 +57,24 @@ class ContextBuilder:
             "|--------|------------|---------|"
         ]
         
-        # Build table data
+        # Resolve course IDs (by code when a course has none) for one batch lookup
+        lookup_ids = []
         for c in courses:
-            name = c.get("class_tag", "UNKNOWN")
-            
-            # DIRECT DATABASE LOOKUP for workload data to avoid any data issues
             course_id = c.get("course_id")
+            name = c.get("class_tag", "UNKNOWN")
+            if not course_id and name:
+                course = self.db.get_course_by_code(name)
+                course_id = course.get("course_id") if course else None
+            lookup_ids.append(course_id)
+        
+        # DIRECT DATABASE LOOKUP for workload and Q score data to avoid any data issues
+        hours_values, qscore_values = self.db.get_workloads(lookup_ids)
+        
+        # Build table data
+        for i, c in enumerate(courses):
+            name = c.get("class_tag", "UNKNOWN")
+            hours_val = hours_values[i]
             
-            # Try explicit workload retrieval
-            hours_val = None
-            if course_id:
-                hours_val = self.db.get_course_workload(course_id=course_id)
-            elif name:
-                hours_val = self.db.get_course_workload(course_code=name)
-                
             # Format hours
             if hours_val is not None and not pd.isna(hours_val):
                 try:
@@ -81,12 +85,8 @@ class ContextBuilder:
             else:
                 hours_str = "N/A"
                 
-            # Get Q score through similar direct lookup
-            qscore_val = None
-            if course_id and hasattr(self.db, 'q_reports_df'):
-                q_report = self.db.q_reports_df[self.db.q_reports_df['course_id'] == course_id]
-                if not q_report.empty and 'overall_score_course_mean' in q_report.columns:
-                    qscore_val = q_report['overall_score_course_mean'].iloc[0]
+            # Q scores are only reported for courses that carry their own ID
+            qscore_val = qscore_values[i] if c.get("course_id") else None
                     
             # Format Q score
             if qscore_val is not None and not pd.isna(qscore_val):
@@ -6,30 +6,47 @@ using hybrid retrieval techniques that combine structured filtering and
 semantic search capabilities.
 """
 
+import logging
 import re
+import time
 import numpy as np
 from typing import Dict, List, Optional, Tuple, Set, Any, Union
 from collections import defaultdict
 
+from cache import normalize_query
+from pipeline import pipeline_executor
+
+logger = logging.getLogger("CourseFinder")
+
 class CourseFinder:
     """Finds courses based on query criteria with advanced retrieval techniques"""
     
+    # Number of semantic search results considered
+    SEMANTIC_TOP_K = 20
+    
+    # Default bounds of the shared course finder cache
+    CACHE_SIZE = 1024
+    CACHE_MAX_MB = 32
+    CACHE_TTL = 3600
+    
+    # Result sets whose confidence is tracked for each request
+    RESULT_SETS = ("specific_courses", "level_courses", "term_courses",
+                   "filtered_courses", "semantic_matches", "relevant_courses")
+    
     def __init__(self, harvard_db):
-        """Initialize with database interface"""
-        self.db = harvard_db
+        """Initialize with database interface
         
-        # Cache for search results to avoid redundant computations
-        self.search_cache = {}
-        
-        # Track confidence in results
-        self.confidence_scores = {
-            "specific_courses": 0.0,
-            "level_courses": 0.0,
-            "term_courses": 0.0,
-            "filtered_courses": 0.0,
-            "semantic_matches": 0.0,
-            "relevant_courses": 0.0
-        }
+        One instance is shared by all requests of a worker: per-request state
+        lives in the results dict built by find_courses, and the cache is the
+        process-wide, lock-protected 'course_finder' cache.
+        """
+        self.db = harvard_db
+    
+    @property
+    def search_cache(self):
+        """Process-wide cache for search results, shared by every CourseFinder"""
+        return self.db.shared_cache('course_finder', max_entries=self.CACHE_SIZE,
+                                    max_mb=self.CACHE_MAX_MB, ttl=self.CACHE_TTL)
     
     def find_courses(self, query_info: Dict, student_profile: Dict) -> Dict:
         """Find courses based on query information using hybrid retrieval"""
@@ -39,20 +56,31 @@ class CourseFinder:
             "term_courses": [],      # Courses matching term criteria
             "filtered_courses": [],  # Courses matching all filters
             "semantic_matches": [],  # Courses matching semantic search
+            "retrieval_scores": {},  # Fused and per-retriever scores of semantic matches by course ID
             "relevant_courses": [],  # Most relevant courses for the query
-            "confidence_scores": {}, # Confidence in each result set
+            "confidence_scores": dict.fromkeys(self.RESULT_SETS, 0.0), # Confidence in each result set
             "retrieval_explanation": [], # Explanation of retrieval process
-            "verification": []       # Verification of results against requirements
+            "verification": [],      # Verification of results against requirements
+            "stage_timings": {}      # Milliseconds spent in each retrieval step
         }
         
         # Track explanations for retrieval process
         explanations = []
         
+        # Steps 1-5 only read the database, so they run concurrently (see pipeline.py)
+        stage_results, timings = pipeline_executor.run({
+            "specific_courses": lambda: self._find_specific_courses(query_info),
+            "level_courses": lambda: self._find_courses_by_level(query_info, student_profile),
+            "term_courses": lambda: self._find_courses_by_term(query_info),
+            "filtered_courses": lambda: self._apply_all_filters(query_info, student_profile),
+            "semantic_matches": lambda: self._find_semantic_matches(query_info, student_profile)
+        })
+        
         # 1. Start with explicitly mentioned courses (highest precision)
         explanations.append("Step 1: Looking for explicitly mentioned courses...")
-        specific_courses, specific_conf = self._find_specific_courses(query_info)
+        specific_courses, specific_conf = stage_results["specific_courses"]
         results["specific_courses"] = specific_courses
-        self.confidence_scores["specific_courses"] = specific_conf
+        results["confidence_scores"]["specific_courses"] = specific_conf
         
         if specific_courses:
             explanations.append(f"Found {len(specific_courses)} explicitly mentioned courses")
@@ -61,9 +89,9 @@ class CourseFinder:
         
         # 2. Find courses by department and level (structured search)
         explanations.append("Step 2: Searching by department and course level...")
-        level_courses, level_conf = self._find_courses_by_level(query_info, student_profile)
+        level_courses, level_conf = stage_results["level_courses"]
         results["level_courses"] = level_courses
-        self.confidence_scores["level_courses"] = level_conf
+        results["confidence_scores"]["level_courses"] = level_conf
         
         if level_courses:
             explanations.append(f"Found {len(level_courses)} courses matching department and level criteria")
@@ -72,9 +100,9 @@ class CourseFinder:
         
         # 3. Find courses by term
         explanations.append("Step 3: Filtering courses by term...")
-        term_courses, term_conf = self._find_courses_by_term(query_info)
+        term_courses, term_conf = stage_results["term_courses"]
         results["term_courses"] = term_courses
-        self.confidence_scores["term_courses"] = term_conf
+        results["confidence_scores"]["term_courses"] = term_conf
         
         if term_courses:
             explanations.append(f"Found {len(term_courses)} courses matching term criteria")
@@ -83,9 +111,9 @@ class CourseFinder:
         
         # 4. Apply complete filtering with all structured constraints
         explanations.append("Step 4: Applying all structured filters...")
-        filtered_courses, filter_conf = self._apply_all_filters(query_info, student_profile)
+        filtered_courses, filter_conf = stage_results["filtered_courses"]
         results["filtered_courses"] = filtered_courses
-        self.confidence_scores["filtered_courses"] = filter_conf
+        results["confidence_scores"]["filtered_courses"] = filter_conf
         
         if filtered_courses:
             explanations.append(f"Found {len(filtered_courses)} courses matching all structured filters")
@@ -94,9 +122,10 @@ class CourseFinder:
         
         # 5. Apply semantic search for implicit criteria (if available)
         explanations.append("Step 5: Applying semantic search for implicit criteria...")
-        semantic_matches, semantic_conf = self._find_semantic_matches(query_info, student_profile)
+        semantic_matches, retrieval_scores, semantic_conf = stage_results["semantic_matches"]
         results["semantic_matches"] = semantic_matches
-        self.confidence_scores["semantic_matches"] = semantic_conf
+        results["retrieval_scores"] = retrieval_scores
+        results["confidence_scores"]["semantic_matches"] = semantic_conf
         
         if semantic_matches:
             explanations.append(f"Found {len(semantic_matches)} courses matching semantic criteria")
@@ -105,9 +134,11 @@ class CourseFinder:
         
         # 6. Determine the most relevant courses through hybrid ranking
         explanations.append("Step 6: Determining most relevant courses through hybrid ranking...")
+        start = time.perf_counter()
         relevant_courses, relevant_conf = self._determine_most_relevant(results, query_info, student_profile)
+        timings["relevant_courses"] = (time.perf_counter() - start) * 1000
         results["relevant_courses"] = relevant_courses
-        self.confidence_scores["relevant_courses"] = relevant_conf
+        results["confidence_scores"]["relevant_courses"] = relevant_conf
         
         if relevant_courses:
             explanations.append(f"Selected {len(relevant_courses)} most relevant courses")
@@ -116,17 +147,17 @@ class CourseFinder:
         
         # 7. Verify results against requirements (self-reflection)
         explanations.append("Step 7: Verifying results against requirements...")
+        start = time.perf_counter()
         verification = self._verify_results(results, query_info, student_profile)
+        timings["verification"] = (time.perf_counter() - start) * 1000
         results["verification"] = verification
         
         if verification:
             explanations.append(f"Found {len(verification)} verification notes about the results")
         
-        # Store confidence scores
-        results["confidence_scores"] = dict(self.confidence_scores)
-        
         # Store retrieval explanation
         results["retrieval_explanation"] = explanations
+        results["stage_timings"] = timings
         
         return results
     
@@ -149,10 +180,10 @@ class CourseFinder:
                         if 'mean_hours' not in course or course['mean_hours'] is None:
                             # Try getting q_report data directly
                             course_id = course.get('course_id')
-                            if course_id and hasattr(self.db, 'q_reports_df'):
-                                q_report = self.db.q_reports_df[self.db.q_reports_df['course_id'] == course_id]
-                                if not q_report.empty and 'mean_hours' in q_report.columns:
-                                    course['mean_hours'] = q_report['mean_hours'].iloc[0]
+                            if course_id:
+                                rows = self.db.q_report_rows([course_id])
+                                if rows[0] >= 0:
+                                    course['mean_hours'] = self.db.q_report_hours[rows[0]]
                     
                     specific_courses.append(course)
                 else:
@@ -284,71 +315,25 @@ class CourseFinder:
             if dept:
                 departments = [dept]
         
-        # Apply department filter
-        filtered_courses = []
-        if departments:
-            for dept in departments:
-                # Get all courses for this department
-                dept_courses = [
-                    course for course_id, course in self.db.course_dict.items()
-                    if self._course_matches_dept(course, dept)
-                ]
-                filtered_courses.extend(dept_courses)
-        else:
-            # No department filter, use all courses
-            filtered_courses = list(self.db.course_dict.values())
+        # Confidence bookkeeping for each structured criterion
+        if not departments:
             confidence *= 0.8  # Lower confidence when not filtering by department
         
-        # Apply level filter
         if query_info["course_levels"]:
-            level_confidence = query_info["confidence_scores"].get("course_levels", 0.7)
-            confidence = min(confidence, level_confidence)
-            
-            level_filtered = []
-            for course in filtered_courses:
-                if 'class_tag' in course and isinstance(course['class_tag'], str):
-                    match = re.search(r'([A-Za-z]+)\s*(\d+)', course['class_tag'])
-                    if match:
-                        num = int(match.group(2))
-                        for level_range in query_info["course_levels"]:
-                            start_level, end_level = level_range
-                            if start_level <= num <= end_level:
-                                level_filtered.append(course)
-                                break
-            filtered_courses = level_filtered
+            confidence = min(confidence, query_info["confidence_scores"].get("course_levels", 0.7))
         
-        # Apply term filter
         if query_info["terms"]:
-            term_confidence = query_info["confidence_scores"].get("terms", 0.7)
-            confidence = min(confidence, term_confidence)
-            
-            term_filtered = []
-            for course in filtered_courses:
-                for term in query_info["terms"]:
-                    if self._course_matches_term(course, term):
-                        term_filtered.append(course)
-                        break
-            filtered_courses = term_filtered
-        
-        # Apply constraints
-        constraints_confidence = query_info["confidence_scores"].get("constraints", 0.7)
-        
-        max_hours = query_info["constraints"].get("max_hours")
-        min_score = query_info["constraints"].get("min_score")
+            confidence = min(confidence, query_info["confidence_scores"].get("terms", 0.7))
         
-        if max_hours is not None:
+        constraints_confidence = query_info["confidence_scores"].get("constraints", 0.7)
+        if query_info["constraints"].get("max_hours") is not None:
             confidence = min(confidence, constraints_confidence)
-            filtered_courses = [
-                course for course in filtered_courses
-                if self._course_below_max_hours(course, max_hours)
-            ]
-        
-        if min_score is not None:
+        if query_info["constraints"].get("min_score") is not None:
             confidence = min(confidence, constraints_confidence)
-            filtered_courses = [
-                course for course in filtered_courses
-                if self._course_above_min_score(course, min_score)
-            ]
+        
+        # Apply department, level, term and constraint filters in one pass over precomputed bitmaps
+        rows = self.db.filter_engine.match_query_rows(query_info, departments=departments or [])
+        filtered_courses = self.db.course_table.rows(rows)
         
         # Lower confidence if too few or too many results
         if len(filtered_courses) == 0:
@@ -358,16 +343,57 @@ class CourseFinder:
         
         return filtered_courses, confidence
     
-    def _find_semantic_matches(self, query_info: Dict, student_profile: Dict) -> Tuple[List[Dict], float]:
-        """Find courses using semantic search based on query and preferences"""
+    def _find_semantic_matches(self, query_info: Dict, student_profile: Dict) -> Tuple[List[Dict], Dict[int, Dict], float]:
+        """Find courses using hybrid (semantic + keyword) search based on query and preferences
+        
+        Also returns the fused search entries by course ID (fused score plus
+        per-retriever rank and scores) so ranking can reuse them.
+        """
         semantic_matches = []
+        retrieval_scores = {}
         confidence = 0.7  # Base confidence for semantic search
         
-        # Skip if we don't have vector search capabilities
-        if not hasattr(self.db, 'vector_search'):
-            return [], 0.0
+        # Skip if we don't have hybrid search capabilities
+        if not hasattr(self.db, 'hybrid_search_scored'):
+            return [], {}, 0.0
+        
+        semantic_query = self._build_semantic_query(query_info)
+        
+        # Cache key to avoid redundant searches
+        cache_key = ("semantic", normalize_query(semantic_query))
+        cached = self.search_cache.get(cache_key)
+        if cached is not None:
+            return (*cached, confidence)
+        
+        # Perform hybrid search
+        try:
+            fused = self.db.hybrid_search_scored(semantic_query, top_k=self.SEMANTIC_TOP_K)
+            semantic_matches = [self.db.get_course_by_id(entry['course_id']) for entry in fused]
+            retrieval_scores = {entry['course_id']: entry for entry in fused}
+            
+            # Store in cache
+            self.search_cache[cache_key] = (semantic_matches, retrieval_scores)
+            
+            # Adjust confidence based on results
+            if len(semantic_matches) == 0:
+                confidence *= 0.5  # Significant confidence reduction for no results
+            elif len(semantic_matches) < 5:
+                confidence *= 0.8  # Slight confidence reduction for few results
+            
+        except Exception as e:
+            logger.error(f"Error in semantic search: {str(e)}")
+            confidence = 0.0
+            semantic_matches = []
+            retrieval_scores = {}
         
-        # Create a semantic query from the original query and preferences
+        return semantic_matches, retrieval_scores, confidence
+    
+    def planned_searches(self, query_info: Dict, student_profile: Dict) -> List[Tuple[str, int]]:
+        """(query, top_k) vector searches find_courses will issue, so they can be run as one batch"""
+        return [(self._build_semantic_query(query_info), self.SEMANTIC_TOP_K)]
+    
+    def _build_semantic_query(self, query_info: Dict) -> str:
+        """Create a semantic query from the original query and preferences"""
         semantic_query = query_info["original_query"]
         
         # Add explicit preferences to the semantic query
@@ -435,30 +461,7 @@ class CourseFinder:
             if impl_terms:
                 semantic_query += f" {' '.join(impl_terms)}"
         
-        # Cache key to avoid redundant searches
-        cache_key = f"semantic:{semantic_query}"
-        if cache_key in self.search_cache:
-            return self.search_cache[cache_key], confidence
-        
-        # Perform vector search
-        try:
-            semantic_matches = self.db.vector_search(semantic_query, top_k=20)
-            
-            # Store in cache
-            self.search_cache[cache_key] = semantic_matches
-            
-            # Adjust confidence based on results
-            if len(semantic_matches) == 0:
-                confidence *= 0.5  # Significant confidence reduction for no results
-            elif len(semantic_matches) < 5:
-                confidence *= 0.8  # Slight confidence reduction for few results
-            
-        except Exception as e:
-            print(f"Error in semantic search: {str(e)}")
-            confidence = 0.0
-            semantic_matches = []
-        
-        return semantic_matches, confidence
+        return semantic_query
     
     def _determine_most_relevant(self, results: Dict, query_info: Dict, student_profile: Dict) -> Tuple[List[Dict], float]:
         """Determine the most relevant courses using a hybrid ranking approach"""
@@ -477,23 +480,23 @@ class CourseFinder:
         # Start with highest precision results - specific courses
         if sources["specific"]:
             relevant = list(sources["specific"])
-            confidence = self.confidence_scores["specific_courses"]
+            confidence = results["confidence_scores"]["specific_courses"]
         # Next try filtered courses (explicit criteria match)
         elif sources["filtered"]:
             relevant = list(sources["filtered"])
-            confidence = self.confidence_scores["filtered_courses"]
+            confidence = results["confidence_scores"]["filtered_courses"]
         # Next try semantic matches (implicit criteria)
         elif sources["semantic"]:
             relevant = list(sources["semantic"])
-            confidence = self.confidence_scores["semantic_matches"]
+            confidence = results["confidence_scores"]["semantic_matches"]
         # Fall back to level courses
         elif sources["level"]:
             relevant = list(sources["level"])
-            confidence = self.confidence_scores["level_courses"]
+            confidence = results["confidence_scores"]["level_courses"]
         # Last resort: term courses
         elif sources["term"]:
             relevant = list(sources["term"])
-            confidence = self.confidence_scores["term_courses"]
+            confidence = results["confidence_scores"]["term_courses"]
         else:
             # No relevant courses found
             return [], 0.0
@@ -511,6 +514,16 @@ class CourseFinder:
                     'score': 0.0
                 }
             
+            # Fused hybrid search scores from step 5, relative to the best match
+            retrieval_scores = results.get("retrieval_scores", {})
+            top_fused = max((entry['score'] for entry in retrieval_scores.values()), default=0.0)
+            
+            def retrieval_relevance(course: Dict) -> Optional[float]:
+                entry = retrieval_scores.get(course.get('course_id'))
+                if entry is None or top_fused <= 0:
+                    return None
+                return entry['score'] / top_fused
+            
             # Function to calculate preference match score
             def preference_match_score(course: Dict, preferences: List[str]) -> float:
                 score = 0.0
@@ -533,10 +546,10 @@ class CourseFinder:
                         except (ValueError, TypeError):
                             pass
                     
-                    # Interest-based preferences: semantic matching would capture these
+                    # Interest-based preferences: reuse the hybrid search relevance of the course
                     elif pref.startswith("interest:") and hasattr(self.db, 'model'):
-                        # Already handled by semantic search, but could add extra boost here
-                        score += 0.2
+                        relevance = retrieval_relevance(course)
+                        score += 0.2 if relevance is None else relevance
                     
                 return score / max(1, len(preferences))  # Normalize by number of preferences
             
@@ -566,12 +579,12 @@ class CourseFinder:
                 # Store the score
                 rank_data['score'] = base_score
             
-            # Sort by score (descending)
+            # Sort by score (descending), breaking ties by search relevance
             sorted_courses = [
                 rank_data['course'] 
                 for course_id, rank_data in sorted(
                     course_ranks.items(), 
-                    key=lambda x: x[1]['score'], 
+                    key=lambda x: (x[1]['score'], retrieval_relevance(x[1]['course']) or 0.0), 
                     reverse=True
                 )
             ]
@@ -669,9 +682,10 @@ class CourseFinder:
     def find_similar_courses(self, course_code: str, top_k: int = 5) -> List[Dict]:
         """Find courses similar to the given course using hybrid approach"""
         # Check if we have this query in cache
-        cache_key = f"similar:{course_code}:{top_k}"
-        if cache_key in self.search_cache:
-            return self.search_cache[cache_key]
+        cache_key = ("similar", normalize_query(course_code), top_k)
+        cached = self.search_cache.get(cache_key)
+        if cached is not None:
+            return cached
         
         # Use database's similar course finder if available
         if hasattr(self.db, 'find_similar_courses'):
@@ -717,34 +731,3 @@ class CourseFinder:
         self.search_cache[cache_key] = similar_courses_limited
         
         return similar_courses_limited
-    
-    def _course_matches_dept(self, course: Dict, dept: str) -> bool:
-        """Check if course matches department"""
-        # Check if dept is in class_tag
-        if 'class_tag' in course and isinstance(course['class_tag'], str):
-            return dept.upper() in course['class_tag'].upper()
-        return False
-    
-    def _course_matches_term(self, course: Dict, term: str) -> bool:
-        """Check if course matches term"""
-        if 'term' in course and isinstance(course['term'], str):
-            return term.lower() in course['term'].lower()
-        return False
-    
-    def _course_above_min_score(self, course: Dict, min_score: float) -> bool:
-        """Check if course is above minimum score"""
-        if 'overall_score_course_mean' in course and course['overall_score_course_mean'] is not None:
-            try:
-                return float(course['overall_score_course_mean']) >= min_score
-            except (ValueError, TypeError):
-                return False
-        return False  # If no score, don't include
-    
-    def _course_below_max_hours(self, course: Dict, max_hours: float) -> bool:
-        """Check if course is below maximum hours"""
-        if 'mean_hours' in course and course['mean_hours'] is not None:
-            try:
-                return float(course['mean_hours']) <= max_hours
-            except (ValueError, TypeError):
-                return True  # If can't convert, include by default
-        return True  # If no hours data, include by default
\ No newline at end of file
@@ -12,23 +12,37 @@ import numpy as np
 from typing import Dict, List, Optional, Tuple, Set, Any, Union
 from collections import defaultdict
 
+from cache import normalize_query
+
 class CourseRecommender:
     """Recommends courses based on student profile and query information with semantic understanding"""
     
+    # Result counts for the hybrid searches used to find candidates
+    SEMANTIC_TOP_K = 20
+    RELAXED_TOP_K = 10
+    
+    # Default bounds of the shared recommendation cache
+    CACHE_SIZE = 512
+    CACHE_MAX_MB = 16
+    CACHE_TTL = 3600
+    
+    # Recommendation sets whose confidence is tracked for each request
+    RESULT_SETS = ("recommended_courses", "workload_friendly_courses", "highly_rated_courses", "reasons")
+    
     def __init__(self, harvard_db):
-        """Initialize with database interface"""
-        self.db = harvard_db
-        
-        # Cache for recommendations to avoid redundant computations
-        self.recommendation_cache = {}
+        """Initialize with database interface
         
-        # Track confidence in recommendations
-        self.confidence = {
-            "recommended_courses": 0.0,
-            "workload_friendly_courses": 0.0,
-            "highly_rated_courses": 0.0,
-            "reasons": 0.0
-        }
+        One instance is shared by all requests of a worker: per-request state
+        lives in local variables and the recommendations dict, and the cache is
+        the process-wide, lock-protected 'recommendation' cache.
+        """
+        self.db = harvard_db
+    
+    @property
+    def recommendation_cache(self):
+        """Process-wide cache for recommendations, shared by every CourseRecommender"""
+        return self.db.shared_cache('recommendation', max_entries=self.CACHE_SIZE,
+                                    max_mb=self.CACHE_MAX_MB, ttl=self.CACHE_TTL)
     
     def get_recommendations(self, query_info: Dict, student_profile: Dict) -> Dict:
         """Get course recommendations with advanced retrieval and reasoning"""
@@ -56,15 +70,19 @@ class CourseRecommender:
         
         # Check if we can use a cached recommendation
         cache_key = self._generate_cache_key(query_info, student_profile)
-        if cache_key in self.recommendation_cache:
-            cached_rec = self.recommendation_cache[cache_key]
+        cached_rec = self.recommendation_cache.get(cache_key)
+        if cached_rec is not None:
             explanation.append("Using cached recommendations for similar query.")
             
-            # Update explanation
+            # Update explanation on a copy; the cached entry is shared between requests
+            cached_rec = dict(cached_rec)
             cached_rec["explanation"] = explanation + cached_rec.get("explanation", [])
             
             return cached_rec
         
+        # Track confidence in recommendations for this request
+        confidence = dict.fromkeys(self.RESULT_SETS, 0.0)
+        
         # Get candidate courses based on query filters
         explanation.append("Finding candidate courses based on query criteria...")
         candidate_courses = self._get_candidate_courses(query_info, student_profile)
@@ -107,7 +125,7 @@ class CourseRecommender:
         ranked_courses, confidence_score = self._rank_courses(candidate_courses, query_info, student_profile)
         
         # Store confidence
-        self.confidence["recommended_courses"] = confidence_score
+        confidence["recommended_courses"] = confidence_score
         
         # Store recommendations
         recommendations["recommended_courses"] = ranked_courses[:5]  # Top 5 overall
@@ -125,7 +143,7 @@ class CourseRecommender:
         )
         
         recommendations["workload_friendly_courses"] = workload_friendly[:3]  # Top 3 by workload
-        self.confidence["workload_friendly_courses"] = 0.9 if workload_friendly else 0.0
+        confidence["workload_friendly_courses"] = 0.9 if workload_friendly else 0.0
         
         if workload_friendly:
             explanation.append(f"Found {len(workload_friendly[:3])} courses with manageable workload.")
@@ -141,7 +159,7 @@ class CourseRecommender:
         )
         
         recommendations["highly_rated_courses"] = highly_rated[:3]  # Top 3 by rating
-        self.confidence["highly_rated_courses"] = 0.9 if highly_rated else 0.0
+        confidence["highly_rated_courses"] = 0.9 if highly_rated else 0.0
         
         if highly_rated:
             explanation.append(f"Found {len(highly_rated[:3])} highly-rated courses.")
@@ -156,7 +174,7 @@ class CourseRecommender:
             student_profile
         )
         
-        self.confidence["reasons"] = 0.85 if recommendations["reasons"] else 0.0
+        confidence["reasons"] = 0.85 if recommendations["reasons"] else 0.0
         
         # Find alternative paths (other courses that could be taken)
         explanation.append("Identifying alternative course paths...")
@@ -170,11 +188,11 @@ class CourseRecommender:
         
         # Perform self-reflection on recommendations
         explanation.append("Performing self-reflection on recommendations...")
-        self_reflection = self._perform_self_reflection(recommendations, query_info, student_profile)
+        self_reflection = self._perform_self_reflection(recommendations, query_info, student_profile, confidence)
         recommendations["self_reflection"] = self_reflection
         
         # Store confidence scores
-        recommendations["confidence_scores"] = dict(self.confidence)
+        recommendations["confidence_scores"] = confidence
         
         # Save full explanation
         recommendations["explanation"] = explanation
@@ -221,9 +239,12 @@ class CourseRecommender:
         if student_profile.get("concentration"):
             key_parts.append(f"conc:{student_profile['concentration']}")
         
-        # Add taken courses count (not the specific courses, just the count)
-        taken_count = len(student_profile.get("courses_taken", []))
-        key_parts.append(f"taken:{taken_count}")
+        # Add taken courses, which are filtered out of the recommendations
+        taken = sorted(normalize_query(str(course)) for course in student_profile.get("courses_taken", []))
+        key_parts.append(f"taken:{','.join(taken)}")
+        
+        # Add the query text, which drives the semantic candidate search
+        key_parts.append(f"query:{normalize_query(query_info.get('original_query', ''))}")
         
         # Join all parts with a separator
         return ";".join(key_parts)
@@ -319,12 +340,34 @@ class CourseRecommender:
         
         return candidate_courses
     
+    def planned_searches(self, query_info: Dict, student_profile: Dict) -> List[Tuple[str, int]]:
+        """(query, top_k) searches get_recommendations may fall back to, so their vector
+        parts can be run as one batch with the rest of the request
+        
+        The relaxed-criteria search is left out: it only runs when the strict
+        criteria find nothing, and then runs its own query.
+        """
+        if query_info["intent"] != "course_recommendation":
+            return []
+        return [(self._build_semantic_query(query_info), self.SEMANTIC_TOP_K)]
+    
+    def _build_semantic_query(self, query_info: Dict) -> str:
+        """Search query for hybrid candidate retrieval: the original query plus preferences"""
+        semantic_query = query_info["original_query"]
+        
+        # Enhance with preferences
+        if query_info["preferences"]:
+            pref_str = " ".join(query_info["preferences"])
+            semantic_query += f" {pref_str}"
+        
+        return semantic_query
+    
     def _get_relaxed_candidates(self, query_info: Dict, student_profile: Dict) -> List[Dict]:
         """Get candidate courses with relaxed criteria when strict criteria yield no results"""
         relaxed_candidates = []
         
-        # Copy the query info to relax constraints
-        relaxed_query = query_info.copy()
+        # Copy the query info and its constraints to relax them without changing the caller's
+        relaxed_query = {**query_info, "constraints": dict(query_info["constraints"])}
         
         # First, try relaxing max_hours and min_score constraints
         if relaxed_query["constraints"].get("max_hours") is not None:
@@ -358,7 +401,7 @@ class CourseRecommender:
         # If all else fails, try using semantic search if available
         if not relaxed_candidates and hasattr(self.db, 'hybrid_search'):
             original_query = query_info["original_query"]
-            relaxed_candidates = self.db.hybrid_search(original_query, top_k=10)
+            relaxed_candidates = self.db.hybrid_search(original_query, top_k=self.RELAXED_TOP_K)
         
         return relaxed_candidates
     
@@ -689,6 +732,13 @@ class CourseRecommender:
         if not hasattr(self.db, 'find_similar_courses'):
             return alternatives
         
+        # Look up similar courses for all top recommendations in one batch
+        course_tags = list(dict.fromkeys(course.get('class_tag') for course in top_courses if 'class_tag' in course))
+        if hasattr(self.db, 'find_similar_courses_batch'):
+            similar_by_tag = dict(zip(course_tags, self.db.find_similar_courses_batch(course_tags, top_k=3)))
+        else:
+            similar_by_tag = {}
+        
         # Get similar courses for each top recommendation
         seen_courses = set()
         for course in top_courses:
@@ -702,7 +752,9 @@ class CourseRecommender:
             seen_courses.add(course_tag)
             
             # Find similar courses
-            similar_courses = self.db.find_similar_courses(course_tag, top_k=3)
+            similar_courses = similar_by_tag.get(course_tag)
+            if similar_courses is None:
+                similar_courses = self.db.find_similar_courses(course_tag, top_k=3)
             
             # Filter out courses already in top recommendations
             similar_courses = [
@@ -769,7 +821,8 @@ class CourseRecommender:
         
         return alternatives
     
-    def _perform_self_reflection(self, recommendations: Dict, query_info: Dict, student_profile: Dict) -> List[str]:
+    def _perform_self_reflection(self, recommendations: Dict, query_info: Dict, student_profile: Dict,
+                                 confidence: Dict[str, float]) -> List[str]:
         """Perform self-reflection on recommendations to identify potential issues"""
         reflections = []
         
@@ -780,7 +833,7 @@ class CourseRecommender:
             reflections.append("Limited number of courses match the criteria")
         
         # Check confidence in recommendations
-        if self.confidence["recommended_courses"] < 0.7:
+        if confidence["recommended_courses"] < 0.7:
             reflections.append("Low confidence in these recommendations, may need more specific criteria")
         
         # Check for potential prerequisite issues
@@ -889,15 +942,10 @@ class CourseRecommender:
         if not candidate_courses and hasattr(self.db, 'hybrid_search'):
             retrieval_paths.append("Using hybrid semantic search")
             # Create a search query from the original query
-            semantic_query = query_info["original_query"]
-            
-            # Enhance with preferences
-            if query_info["preferences"]:
-                pref_str = " ".join(query_info["preferences"])
-                semantic_query += f" {pref_str}"
+            semantic_query = self._build_semantic_query(query_info)
             
             # Try to find semantically relevant courses
-            semantic_results = self.db.hybrid_search(semantic_query, top_k=20)
+            semantic_results = self.db.hybrid_search(semantic_query, top_k=self.SEMANTIC_TOP_K)
             candidate_courses.extend(semantic_results)
         
         # QUATERNARY PATH: If no specific criteria, recommend based on student's profile
@@ -933,16 +981,17 @@ class CourseRecommender:
                     intro_courses = self.db.get_courses_by_level_range(dept, 0, 99)
                     candidate_courses.extend(intro_courses)
         
+        # Work on row positions so the remaining filters are bitmap lookups
+        table = self.db.course_table
+        engine = self.db.filter_engine
+        candidate_indices = table.indices_of(candidate_courses)
+        
         # Apply term filter if specified
-        if query_info["terms"] and candidate_courses:
+        if query_info["terms"] and len(candidate_indices):
             retrieval_paths.append("Filtering by term")
-            term_filtered = []
-            for course in candidate_courses:
-                for term in query_info["terms"]:
-                    if 'term' in course and isinstance(course['term'], str) and term.lower() in course['term'].lower():
-                        term_filtered.append(course)
-                        break
-            candidate_courses = term_filtered if term_filtered else candidate_courses
+            term_mask = engine.mask(engine.union(engine.term_bitmap(term) for term in query_info["terms"]))
+            term_filtered = candidate_indices[term_mask[candidate_indices]]
+            candidate_indices = term_filtered if len(term_filtered) else candidate_indices
         
         # Apply constraints
         constraints_applied = False
@@ -952,24 +1001,17 @@ class CourseRecommender:
         if max_hours is not None:
             retrieval_paths.append(f"Filtering by max hours: {max_hours}")
             constraints_applied = True
-            candidate_courses = [
-                course for course in candidate_courses
-                if not course.get('mean_hours') or pd.isna(course.get('mean_hours')) or self._safe_float(course.get('mean_hours')) <= max_hours
-            ]
+            hours_mask = engine.mask(engine.max_hours_bitmap(max_hours))
+            candidate_indices = candidate_indices[hours_mask[candidate_indices]]
         
         if min_score is not None:
             retrieval_paths.append(f"Filtering by min score: {min_score}")
             constraints_applied = True
-            candidate_courses = [
-                course for course in candidate_courses
-                if not course.get('overall_score_course_mean') or pd.isna(course.get('overall_score_course_mean')) or self._safe_float(course.get('overall_score_course_mean')) >= min_score
-            ]
+            score_mask = engine.mask(engine.min_score_bitmap(min_score, include_missing=True))
+            candidate_indices = candidate_indices[score_mask[candidate_indices]]
         
         # Remove duplicates while preserving order
-        seen = set()
-        candidate_courses = [
-            course for course in candidate_courses
-            if not (course.get('course_id') in seen or seen.add(course.get('course_id')))
-        ]
+        _, first_seen = np.unique(candidate_indices, return_index=True)
+        candidate_indices = candidate_indices[np.sort(first_seen)]
         
-        return candidate_courses
\ No newline at end of file
+        return table.rows(candidate_indices)
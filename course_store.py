@@ -0,0 +1,479 @@
+"""
+course_store.py - Columnar Course Store
+
+This module provides an array-backed table for Harvard course data. Numeric and
+categorical fields are kept in NumPy arrays, text fields in interned object columns,
+and callers receive lightweight dict-like row views instead of one dict per course.
+
+Tables loaded from a snapshot keep their text fields in StringColumns: integer
+codes plus one UTF-8 buffer, all memory-mapped, so worker processes that load
+the same snapshot share them instead of each holding its own Python strings.
+"""
+
+import re
+import sys
+from collections.abc import Mapping, MutableMapping
+from typing import Dict, List, Optional, Tuple, Iterator, Iterable, Any
+
+import numpy as np
+import pandas as pd
+
+# Pattern used to split a class tag such as "MATH 136" into department and number
+COURSE_CODE_PATTERN = re.compile(r'([A-Za-z]+)\s*(\d+)')
+
+# Sentinel for fields removed from a row view
+_DELETED = object()
+
+
+def _intern_value(value: Any) -> Any:
+    """Intern strings so repeated values share a single object"""
+    if isinstance(value, str):
+        return sys.intern(value)
+    return value
+
+
+def _to_column(values: Any) -> np.ndarray:
+    """Convert a sequence of values to a compact NumPy column"""
+    series = values if isinstance(values, pd.Series) else pd.Series(values)
+    if pd.api.types.is_bool_dtype(series) or pd.api.types.is_integer_dtype(series):
+        return series.to_numpy()
+    if pd.api.types.is_numeric_dtype(series):
+        return series.to_numpy(dtype=np.float64)
+    values = series.to_numpy(dtype=object)
+    try:
+        codes, uniques = pd.factorize(values)
+    except TypeError:
+        # Unhashable values (e.g. lists) are stored as they are
+        return _object_column([_intern_value(v) for v in values.tolist()])
+
+    # Intern each distinct string once; missing values keep their original object
+    column = _object_column([_intern_value(v) for v in uniques.tolist()])[codes]
+    missing = codes < 0
+    column[missing] = values[missing]
+    return column
+
+
+def _object_column(values: List[Any]) -> np.ndarray:
+    """Build a 1-D object array without NumPy unpacking nested sequences"""
+    column = np.empty(len(values), dtype=object)
+    column[:] = values
+    return column
+
+
+class StringColumn:
+    """Read-only text column stored as dictionary codes over one UTF-8 buffer
+
+    Row i holds the distinct value codes[i], whose bytes are
+    buffer[offsets[code]:offsets[code + 1]]. Code -1 is a missing value (NaN)
+    and -2 is None. Values are decoded on access, so the arrays can be
+    memory-mapped and shared between processes.
+    """
+
+    dtype = np.dtype(object)
+    MISSING = -1
+    NONE = -2
+
+    def __init__(self, codes: np.ndarray, buffer: np.ndarray, offsets: np.ndarray):
+        """Initialize from encoded arrays (use encode to build from values)"""
+        self.codes = codes
+        self.buffer = buffer
+        self.offsets = offsets
+
+    @classmethod
+    def encode(cls, values: Any) -> Optional['StringColumn']:
+        """Encode a column of strings and missing values, or None if it holds anything else"""
+        if isinstance(values, StringColumn):
+            return values
+        values = np.asarray(values, dtype=object)
+        is_none = np.fromiter((v is None for v in values), dtype=bool, count=len(values))
+        try:
+            codes, uniques = pd.factorize(values)
+        except TypeError:
+            return None
+        if not all(isinstance(value, str) for value in uniques):
+            return None
+        missing = values[(codes < 0) & ~is_none]
+        if any(not (isinstance(value, float) and value != value) for value in missing):
+            return None
+        codes = codes.astype(np.int32)
+        codes[is_none] = cls.NONE
+
+        encoded = [value.encode('utf-8', 'surrogatepass') for value in uniques]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(value) for value in encoded])
+        buffer = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+        return cls(codes, buffer, offsets)
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        """The arrays backing the column, for snapshots"""
+        return {'codes': self.codes, 'buffer': self.buffer, 'offsets': self.offsets}
+
+    def category(self, code: int) -> Any:
+        """Decode one distinct value"""
+        if code < 0:
+            return None if code == self.NONE else np.nan
+        return bytes(self.buffer[self.offsets[code]:self.offsets[code + 1]]).decode('utf-8', 'surrogatepass')
+
+    @property
+    def categories(self) -> List[str]:
+        """All distinct values, in code order"""
+        return [self.category(code) for code in range(len(self.offsets) - 1)]
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, key: Any) -> Any:
+        if isinstance(key, (int, np.integer)):
+            return self.category(int(self.codes[key]))
+        return _object_column([self.category(code) for code in np.asarray(self.codes[key]).tolist()])
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        values = self[:]
+        return values if dtype is None else values.astype(dtype)
+
+    def tolist(self) -> List[Any]:
+        return [self.category(code) for code in self.codes.tolist()]
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + self.buffer.nbytes + self.offsets.nbytes
+
+
+class CourseRow(MutableMapping):
+    """Lightweight dict-like view of a single course in a CourseTable"""
+
+    __slots__ = ('_table', '_index', '_overrides')
+
+    def __init__(self, table: 'CourseTable', index: int):
+        """Initialize with the owning table and the row position"""
+        self._table = table
+        self._index = index
+        self._overrides = None  # Local edits, created on first write
+
+    @property
+    def index(self) -> int:
+        """Row position of this course in its table"""
+        return self._index
+
+    def __getitem__(self, key: str) -> Any:
+        if self._overrides is not None and key in self._overrides:
+            value = self._overrides[key]
+            if value is _DELETED:
+                raise KeyError(key)
+            return value
+        return self._table.value(key, self._index)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        # Edits stay local to this view and never touch the shared table
+        if self._overrides is None:
+            self._overrides = {}
+        self._overrides[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        if key not in self:
+            raise KeyError(key)
+        self[key] = _DELETED
+
+    def __iter__(self) -> Iterator[str]:
+        overrides = self._overrides or {}
+        for field in self._table.fields:
+            if overrides.get(field) is not _DELETED:
+                yield field
+        for key, value in overrides.items():
+            if value is not _DELETED and not self._table.has_field(key):
+                yield key
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __contains__(self, key: object) -> bool:
+        if self._overrides is not None and key in self._overrides:
+            return self._overrides[key] is not _DELETED
+        return self._table.has_field(key)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, CourseRow) and not self._overrides and not other._overrides:
+            return self._table is other._table and self._index == other._index
+        return super().__eq__(other)
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"CourseRow({self.to_dict()!r})"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Materialize the row as a plain dict (e.g. for JSON responses)"""
+        return {key: self[key] for key in self}
+
+
+class CourseTable(Mapping):
+    """Columnar course table indexed by course_id
+
+    Behaves as a read-only mapping of course_id -> CourseRow so existing callers
+    can keep iterating courses, while filters operate on the typed arrays:
+    course_ids, dept_codes, course_numbers, levels, term_codes, mean_hours and
+    overall_scores.
+    """
+
+    # Arrays derived from class tags and terms, persisted with snapshots
+    DERIVED_ARRAYS = ('dept_codes', 'course_numbers', 'levels', 'term_codes')
+
+    def __init__(self, columns: Dict[str, np.ndarray], fields: List[str], derived: Optional[Dict[str, Any]] = None):
+        """Initialize from prepared columns (use from_frame to build from pandas)"""
+        self._columns = columns
+        self.fields = list(fields)
+        self._field_set = set(self.fields)
+
+        self.course_ids = np.asarray(columns['course_id'], dtype=np.int64)
+        self._row_by_id = {int(cid): i for i, cid in enumerate(self.course_ids.tolist())}
+        self._id_index = None  # pandas Index over course_ids, built on first batch lookup
+
+        if derived is None:
+            self._build_derived_columns()
+        else:
+            self._restore_derived_columns(derived)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> 'CourseTable':
+        """Build a table from a courses DataFrame with one row per course_id"""
+        df = df.reset_index(drop=True)
+        columns = {}
+        for field in df.columns:
+            if field == 'course_id':
+                columns[field] = df[field].to_numpy(dtype=np.int64)
+            else:
+                columns[field] = _to_column(df[field])
+        return cls(columns, list(df.columns))
+
+    @classmethod
+    def empty(cls) -> 'CourseTable':
+        """Create a table with no courses"""
+        return cls({'course_id': np.empty(0, dtype=np.int64)}, ['course_id'])
+
+    def _build_derived_columns(self) -> None:
+        """Parse class tags and terms into typed arrays used for filtering"""
+        # Department code and course number from the class tag, parsed once per
+        # distinct tag; a trailing empty entry stands in for missing tags
+        tag_codes, distinct_tags = pd.factorize(self._string_series('class_tag'))
+        tags = pd.Series(list(distinct_tags) + [np.nan], dtype=object)
+        parts = tags.str.extract(COURSE_CODE_PATTERN)
+        codes, vocab = pd.factorize(parts[0].str.upper())
+        self.dept_codes = codes.astype(np.int32)[tag_codes]
+        self.dept_vocab = [sys.intern(dept) for dept in vocab]
+        self._dept_index = {dept: code for code, dept in enumerate(self.dept_vocab)}
+        self.course_numbers = pd.to_numeric(parts[1]).fillna(-1).to_numpy(dtype=np.int32)[tag_codes]
+        self.class_tags_upper = tags.str.upper().fillna('').to_numpy(dtype=object)[tag_codes]
+
+        # Level is the course number rounded down to the decade (136 -> 130)
+        self.levels = np.where(self.course_numbers >= 0, (self.course_numbers // 10) * 10, -1).astype(np.int32)
+
+        # Term codes into a small vocabulary of distinct, non-empty term strings
+        terms = self._string_series('term')
+        terms = terms.where(terms.str.len() > 0)
+        codes, vocab = pd.factorize(terms)
+        self.term_codes = codes.astype(np.int32)
+        self.term_vocab = list(vocab)
+
+        self._refresh_numeric_views()
+
+    def _string_series(self, field: str) -> pd.Series:
+        """A column as an object Series with non-string values replaced by NaN"""
+        column = self._columns.get(field)
+        if column is None or column.dtype != object:
+            return pd.Series(np.full(len(self.course_ids), np.nan), dtype=object)
+        series = pd.Series(np.asarray(column), dtype=object)
+        return series.where(series.map(type) == str)
+
+    def _restore_derived_columns(self, derived: Dict[str, Any]) -> None:
+        """Restore parsed columns saved by to_snapshot"""
+        for name in self.DERIVED_ARRAYS:
+            setattr(self, name, derived[name])
+        self.dept_vocab = list(derived['dept_vocab'])
+        self.term_vocab = list(derived['term_vocab'])
+        self._dept_index = {dept: code for code, dept in enumerate(self.dept_vocab)}
+        self.class_tags_upper = derived['class_tags_upper']
+        self._refresh_numeric_views()
+
+    def to_snapshot(self) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+        """Split the table into memory-mappable arrays and a metadata dict
+
+        Text columns are stored as StringColumn arrays; object columns holding
+        other values (e.g. lists) are kept in the metadata.
+        """
+        arrays = {}
+        object_columns = {}
+        string_columns = []
+        for field in self.fields:
+            column = self._columns[field]
+            if column.dtype != object:
+                arrays[f"column.{field}"] = column
+                continue
+            encoded = StringColumn.encode(column)
+            if encoded is None:
+                object_columns[field] = column.tolist()
+                continue
+            string_columns.append(field)
+            for part, array in encoded.arrays().items():
+                arrays[f"strings.{field}.{part}"] = array
+        for name in self.DERIVED_ARRAYS:
+            arrays[f"derived.{name}"] = getattr(self, name)
+        for part, array in StringColumn.encode(self.class_tags_upper).arrays().items():
+            arrays[f"derived.class_tags_upper.{part}"] = array
+
+        meta = {
+            'fields': list(self.fields),
+            'object_columns': object_columns,
+            'string_columns': string_columns,
+            'dept_vocab': list(self.dept_vocab),
+            'term_vocab': list(self.term_vocab)
+        }
+        return arrays, meta
+
+    @classmethod
+    def from_snapshot(cls, arrays: Dict[str, np.ndarray], meta: Dict[str, Any]) -> 'CourseTable':
+        """Rebuild a table from to_snapshot output (numeric arrays may be memory-mapped)"""
+        def string_column(prefix: str) -> StringColumn:
+            return StringColumn(*(arrays[f"{prefix}.{part}"] for part in ('codes', 'buffer', 'offsets')))
+
+        columns = {}
+        string_columns = set(meta['string_columns'])
+        for field in meta['fields']:
+            if field in string_columns:
+                columns[field] = string_column(f"strings.{field}")
+            elif field in meta['object_columns']:
+                columns[field] = _object_column(meta['object_columns'][field])
+            else:
+                columns[field] = arrays[f"column.{field}"]
+
+        derived = {name: arrays[f"derived.{name}"] for name in cls.DERIVED_ARRAYS}
+        derived.update({
+            'dept_vocab': meta['dept_vocab'],
+            'term_vocab': meta['term_vocab'],
+            'class_tags_upper': string_column("derived.class_tags_upper")
+        })
+        return cls(columns, meta['fields'], derived=derived)
+
+    def _refresh_numeric_views(self) -> None:
+        """Expose workload and rating columns as float arrays (NaN when missing)"""
+        n = len(self.course_ids)
+        for field, attr in (('mean_hours', 'mean_hours'), ('overall_score_course_mean', 'overall_scores')):
+            column = self._columns.get(field)
+            if column is None:
+                values = np.full(n, np.nan)
+            else:
+                values = pd.to_numeric(pd.Series(np.asarray(column)), errors='coerce').to_numpy(dtype=np.float64)
+            setattr(self, attr, values)
+
+    # Mapping interface: course_id -> CourseRow
+
+    def __getitem__(self, course_id: Any) -> CourseRow:
+        return CourseRow(self, self._row_by_id[course_id])
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._row_by_id)
+
+    def __len__(self) -> int:
+        return len(self.course_ids)
+
+    def __contains__(self, course_id: object) -> bool:
+        try:
+            return course_id in self._row_by_id
+        except TypeError:
+            return False
+
+    # Column access
+
+    def has_field(self, field: Any) -> bool:
+        """Check whether the table has a given column"""
+        return field in self._field_set
+
+    def value(self, field: str, index: int) -> Any:
+        """Return a single cell as a plain Python value"""
+        if field not in self._field_set:
+            raise KeyError(field)
+        column = self._columns[field]
+        value = column[index]
+        if column.dtype != object:
+            return value.item()
+        return value
+
+    def column(self, field: str) -> np.ndarray:
+        """Return the raw array for a column"""
+        return self._columns[field]
+
+    def set_column(self, field: str, values: Any) -> None:
+        """Add or replace a column aligned with the table rows"""
+        column = _to_column(values)
+        if len(column) != len(self.course_ids):
+            raise ValueError(f"Column {field} has {len(column)} values for {len(self.course_ids)} courses")
+        self._columns[field] = column
+        if field not in self._field_set:
+            self.fields.append(field)
+            self._field_set.add(field)
+        if field in ('mean_hours', 'overall_score_course_mean'):
+            self._refresh_numeric_views()
+
+    # Row access
+
+    def row_index(self, course_id: Any) -> Optional[int]:
+        """Get the row position for a course_id"""
+        try:
+            return self._row_by_id.get(course_id)
+        except TypeError:
+            return None
+
+    def row_indices(self, course_ids: Iterable) -> np.ndarray:
+        """Map course_ids to row positions (-1 for unknown ids)"""
+        if self._id_index is None:
+            id_index = pd.Index(self.course_ids)
+            id_index.is_unique  # Build the lookup engine now; lazy builds race between request threads
+            self._id_index = id_index
+        ids = pd.to_numeric(pd.Series(list(course_ids), dtype=object), errors='coerce')
+        return self._id_index.get_indexer(ids.to_numpy(dtype=np.float64)).astype(np.int64)
+
+    def indices_of(self, courses: Iterable[Mapping]) -> np.ndarray:
+        """Get row positions for course rows or dicts, dropping unknown courses"""
+        indices = []
+        for course in courses:
+            if isinstance(course, CourseRow) and course._table is self:
+                indices.append(course.index)
+            else:
+                row = self.row_index(course.get('course_id'))
+                if row is not None:
+                    indices.append(row)
+        return np.asarray(indices, dtype=np.int64)
+
+    def row(self, index: int) -> CourseRow:
+        """Get a row view by position"""
+        return CourseRow(self, int(index))
+
+    def rows(self, indices: Iterable[int]) -> List[CourseRow]:
+        """Get row views for an array of positions"""
+        return [CourseRow(self, int(i)) for i in indices]
+
+    def rows_where(self, mask: np.ndarray) -> List[CourseRow]:
+        """Get row views for all rows selected by a boolean mask"""
+        return self.rows(np.flatnonzero(mask))
+
+    # Vectorized filters, each returning a boolean mask over the rows
+
+    def min_score_mask(self, min_score: float, include_missing: bool = False) -> np.ndarray:
+        """Courses with an overall Q score of at least min_score"""
+        missing = np.isnan(self.overall_scores)
+        with np.errstate(invalid='ignore'):
+            mask = self.overall_scores >= min_score
+        return mask | missing if include_missing else mask
+
+    def max_hours_mask(self, max_hours: float, include_missing: bool = True) -> np.ndarray:
+        """Courses with mean hours of at most max_hours"""
+        with np.errstate(invalid='ignore'):
+            mask = self.mean_hours <= max_hours
+        return mask | np.isnan(self.mean_hours) if include_missing else mask
+
+    def memory_usage(self) -> int:
+        """Approximate bytes held by the column arrays (excluding shared strings)"""
+        total = sum(column.nbytes for column in self._columns.values())
+        for array in (self.dept_codes, self.course_numbers, self.levels, self.term_codes,
+                      self.mean_hours, self.overall_scores, self.class_tags_upper):
+            total += array.nbytes
+        return total
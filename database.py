@@ -10,14 +10,48 @@ import re
 import numpy as np
 from typing import Dict, List, Optional, Tuple, Set, Any, Union
 import os
-import pickle
 import logging
-from nltk.tokenize import word_tokenize as nltk_word_tokenize
+import uuid
+import atexit
+import threading
+
+from course_store import CourseTable
+from filter_engine import FilterEngine
+from snapshot import read_snapshot, write_snapshot
+from tokenizer import default_tokenizer
+from fusion import fuse_results, DEFAULT_RRF_K
+from cache import BoundedCache, shared_cache, bind_data_version, normalize_query
+from vector_index import (build_vector_index, index_fingerprint, neighbor_table, save_vector_index,
+                          load_vector_index, search_index)
+from embedding_service import EmbeddingClient, EMBEDDING_MODELS
+from embedding_store import text_hash, load_embedding_cache, save_embedding_cache, reuse_embeddings
+from metrics import SEARCH_SECONDS
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("HarvardDatabase")
 
+# Version of the course embedding text recipe (_embedding_text); keys the embedding cache
+EMBEDDING_TEXT_VERSION = 1
+
+# Neighbours stored per course for find_similar_courses
+NEIGHBOR_TABLE_K = 10
+
+# Default bounds of the shared search result cache
+SEARCH_CACHE_SIZE = 4096
+SEARCH_CACHE_MAX_MB = 64
+SEARCH_CACHE_TTL = 3600
+
+# Default bounds of the shared query embedding cache
+QUERY_EMBEDDING_CACHE_SIZE = 16384
+QUERY_EMBEDDING_CACHE_MAX_MB = 32
+
+# Bound of the per-database cache of embedded course texts (see _encode_texts)
+TEXT_EMBEDDING_CACHE_SIZE = 4096
+
+# Query embedding files already restored (and saved at exit) by this process
+_persisted_query_embedding_files = set()
+
 # Try to import optional dependencies with fallbacks
 try:
     from sentence_transformers import SentenceTransformer
@@ -41,67 +75,49 @@ except ImportError:
     SKLEARN_AVAILABLE = False
 
 try:
-    from rank_bm25 import BM25Okapi
-    BM25_AVAILABLE = True
+    from bm25 import BM25Index, SCIPY_AVAILABLE as BM25_AVAILABLE
+    if not BM25_AVAILABLE:
+        logger.warning("scipy not available, BM25 search will be disabled")
 except ImportError:
-    logger.warning("rank_bm25 not available, BM25 search will be disabled")
+    logger.warning("bm25 module not available, BM25 search will be disabled")
     BM25_AVAILABLE = False
 
-try:
-    import nltk
-    NLTK_AVAILABLE = True
-
-    # Set the download directory to a location within the project
-    nltk_data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "nltk_data")
-    os.makedirs(nltk_data_dir, exist_ok=True)
-
-    # Important: update path *before* calling `find()` or `download`
-    nltk.data.path = [nltk_data_dir] + nltk.data.path
 
-    # Download required NLTK resources with proper error handling
-    def download_nltk_resource(resource):
-        try:
-            nltk.data.find(resource)
-            logger.info(f"NLTK resource {resource} already downloaded")
-        except LookupError:
-            logger.info(f"Downloading NLTK resource: {resource}")
-            nltk.download(resource, download_dir=nltk_data_dir, quiet=True)
+def group_rows(keys: np.ndarray) -> Dict[int, np.ndarray]:
+    """Positions of each distinct key, with keys in order of first appearance"""
+    return pd.Series(keys).groupby(keys, sort=False).indices
 
-    # Correct NLTK resources
-    download_nltk_resource('punkt')
-    download_nltk_resource('stopwords')
 
-    # Now import after ensuring availability
-    try:
-        from nltk.tokenize import word_tokenize
-        from nltk.corpus import stopwords
-    except ImportError:
-        logger.warning("Failed to import NLTK modules after download")
-        NLTK_AVAILABLE = False
+def normalize_embeddings(embeddings) -> np.ndarray:
+    """Scale embedding rows to unit length (zero rows are left as they are)"""
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    if embeddings.ndim == 1:
+        embeddings = embeddings.reshape(1, -1)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
     
-except ImportError:
-    logger.warning("nltk not available, text tokenization will use basic split")
-    NLTK_AVAILABLE = False
+    # Already normalized (e.g. memory-mapped from a snapshot): keep without copying
+    if np.allclose(norms[norms > 0], 1.0, atol=1e-4):
+        return embeddings
+    return embeddings / np.where(norms > 0, norms, 1.0)
 
-def safe_word_tokenize(text: str) -> List[str]:
-    try:
-        return nltk_word_tokenize(text)
-    except Exception as e:
-        logger.warning(f"Falling back to basic tokenization due to error: {e}")
-        return text.lower().split()
 
 class HarvardDatabase:
     """Enhanced database for Harvard courses with vector search capabilities"""
     
-    def __init__(self, subjects_df, courses_df, q_reports_df):
-        """Initialize with the raw dataframes"""
+    def __init__(self, subjects_df, courses_df, q_reports_df, index_backend: Optional[str] = None):
+        """Initialize with the raw dataframes
+        
+        index_backend selects the vector index ('flat', 'ivfpq' or 'hnsw'); it
+        defaults to the VECTOR_INDEX_BACKEND environment variable, then 'flat'.
+        """
         self.subjects_df = subjects_df
         self.courses_df = courses_df  
         self.q_reports_df = q_reports_df
         
         # Processed data structures
-        self.merged_courses = None  # Will hold course data merged with Q reports
-        self.course_dict = {}  # Will hold courses indexed by course_id
+        self.course_table = CourseTable.empty()  # Columnar course data merged with Q reports
+        self.course_dict = self.course_table  # Mapping view of course_id -> course row
+        self.filter_engine = FilterEngine(self.course_table)  # Precomputed filter bitmaps
         self.dept_course_dict = {}  # Will hold courses indexed by department and number
         self.concentration_dict = {}  # Will hold concentration data
         
@@ -111,22 +127,42 @@ class HarvardDatabase:
         self.courses_by_level = {}  # Maps (dept, level) to lists of course_ids
         self.courses_by_term = {}  # Maps terms to lists of course_ids
         
-        # Track processed IDs to avoid duplicates
-        self.processed_ids = set()
+        # Q report index: sorted course IDs with the offset of their first report
+        self.q_report_ids = np.empty(0, dtype=np.int64)
+        self.q_report_offsets = np.empty(0, dtype=np.int64)
+        self.q_report_hours = np.empty(0)  # mean_hours per Q report row
+        self.q_report_scores = np.empty(0)  # overall_score_course_mean per Q report row
         
         # Vector search components
-        self.model = None  # Sentence transformer model for embeddings
+        self.model = None  # Sentence transformer model, or a client of the embedding service
+        self.embedding_service = os.getenv('EMBEDDING_SERVICE') or None  # Address of a shared embedding service
+        self.embedding_model_id = None  # Name of the loaded model; keys the query embedding cache
+        self.query_embedding_file = os.getenv('QUERY_EMBEDDING_CACHE_FILE') or None  # Persists cached query embeddings
         self.course_embeddings = None  # Course embeddings for vector search
         self.course_ids_for_embeddings = []  # Course IDs corresponding to embeddings
         self.embedding_index = None  # FAISS index for efficient vector search
+        self.index_backend = index_backend or os.getenv('VECTOR_INDEX_BACKEND', 'flat')
+        self._neighbor_table = (None, None, None)  # (course_ids_for_embeddings, neighbour course IDs, similarities)
+        self._vector_searches_in_flight = {}  # Normalized query -> (Event set when done, top_k) of running searches
+        self._vector_search_lock = threading.Lock()
         
         # BM25 for lexical search
+        self.tokenizer = default_tokenizer()  # Shared by the BM25 corpus and queries
         self.bm25_index = None  # BM25 index for keyword search
         self.tokenized_corpus = []  # Tokenized course texts
         self.course_ids_for_bm25 = []  # Course IDs corresponding to BM25 index
         
-        # Cached search results
-        self.search_cache = {}  # Cache for search results
+        # Hybrid search fusion defaults (see fusion.py)
+        self.fusion_method = os.getenv('HYBRID_FUSION_METHOD', 'rrf')
+        self.fusion_normalization = os.getenv('HYBRID_SCORE_NORMALIZATION', 'minmax')
+        self.rrf_k = int(os.getenv('HYBRID_RRF_K', DEFAULT_RRF_K))
+        
+        # Search results are cached in the process-wide 'search' cache (see search_cache)
+        self.data_version = uuid.uuid4().hex  # Snapshot content hash once known; keys the shared caches
+        
+        # Embeddings for texts that are not in course_embeddings (e.g. edited courses)
+        self.text_embedding_cache = BoundedCache('text_embedding', max_entries=TEXT_EMBEDDING_CACHE_SIZE)
+        self._embedding_id_lookup = (None, None, None)  # (course_ids_for_embeddings, id array, pandas Index)
         
         # Embedding cache directory
         self.cache_dir = "data/embeddings_cache"
@@ -134,63 +170,53 @@ class HarvardDatabase:
             os.makedirs(self.cache_dir)
     
     def process_courses(self) -> None:
-        """Process and clean course data"""
+        """Process and clean course data into the columnar course table"""
         try:
             # Clean the courses dataframe
             self.courses_df = self.courses_df.dropna(subset=['class_name', 'course_id'])
             
-            # Extract course information
-            for _, row in self.courses_df.iterrows():
-                course_id = row['course_id']
-                
-                # Skip if we've already processed this ID
-                if course_id in self.processed_ids:
-                    continue
-                    
-                self.processed_ids.add(course_id)
-                
-                # Store course in dictionary
-                self.course_dict[course_id] = row.to_dict()
-                
-                # Extract department and number
-                class_tag = row.get('class_tag', '')
-                if isinstance(class_tag, str):
-                    # Try to extract department and number
-                    match = re.search(r'([A-Za-z]+)\s*(\d+)', class_tag)
-                    if match:
-                        dept = match.group(1).upper()
-                        num = int(match.group(2))
-                        
-                        # Store by department and number
-                        key = (dept, num)
-                        if key not in self.dept_course_dict:
-                            self.dept_course_dict[key] = []
-                        self.dept_course_dict[key].append(course_id)
-                        
-                        # Store by course code
-                        course_code = f"{dept} {num}"
-                        self.course_by_code[course_code] = course_id
-                        
-                        # Store by level
-                        level = (num // 10) * 10  # E.g., 136 -> 130
-                        level_key = (dept, level)
-                        if level_key not in self.courses_by_level:
-                            self.courses_by_level[level_key] = []
-                        self.courses_by_level[level_key].append(course_id)
-                
-                # Store by name
-                class_name = row.get('class_name', '')
-                if isinstance(class_name, str) and class_name:
-                    self.course_by_name[class_name.lower()] = course_id
-                
-                # Store by term
-                term = row.get('term', '')
-                if isinstance(term, str) and term:
-                    if term not in self.courses_by_term:
-                        self.courses_by_term[term] = []
-                    self.courses_by_term[term].append(course_id)
+            # Keep the first row for each course ID
+            unique_courses = self.courses_df.drop_duplicates(subset='course_id', keep='first')
+            
+            # Store courses in the columnar table
+            self.course_table = CourseTable.from_frame(unique_courses)
+            self.course_dict = self.course_table
+            self.filter_engine = FilterEngine(self.course_table)
+            table = self.course_table
+            
+            # Build lookup tables from the parsed columns with grouped operations
+            course_ids = table.course_ids
+            coded = np.flatnonzero(table.dept_codes >= 0)
+            dept_codes = table.dept_codes[coded].astype(np.int64)
+            
+            # Store by department and number
+            numbers = table.course_numbers[coded]
+            for key, rows in group_rows((dept_codes << 32) | numbers).items():
+                dept = table.dept_vocab[key >> 32]
+                self.dept_course_dict[(dept, int(key & 0xFFFFFFFF))] = course_ids[coded[rows]].tolist()
+            
+            # Store by course code (the last course with a code wins)
+            depts = np.asarray(table.dept_vocab + [''], dtype=object)[dept_codes]
+            course_codes = depts + ' ' + numbers.astype(str).astype(object)
+            self.course_by_code.update(zip(course_codes.tolist(), course_ids[coded].tolist()))
+            
+            # Store by level
+            levels = table.levels[coded]
+            for key, rows in group_rows((dept_codes << 32) | levels).items():
+                dept = table.dept_vocab[key >> 32]
+                self.courses_by_level[(dept, int(key & 0xFFFFFFFF))] = course_ids[coded[rows]].tolist()
+            
+            # Store by name (the last course with a name wins)
+            names = pd.Series(table.column('class_name'), dtype=object)
+            named = np.flatnonzero((names.map(type) == str) & (names.str.len() > 0))
+            self.course_by_name.update(zip(names.iloc[named].str.lower().tolist(), course_ids[named].tolist()))
+            
+            # Store by term
+            termed = np.flatnonzero(table.term_codes >= 0)
+            for term_code, rows in group_rows(table.term_codes[termed]).items():
+                self.courses_by_term[table.term_vocab[term_code]] = course_ids[termed[rows]].tolist()
                     
-            logger.info(f"Processed {len(self.course_dict)} courses")
+            logger.info(f"Processed {len(self.course_table)} courses")
             
         except Exception as e:
             logger.error(f"Error processing courses: {str(e)}")
@@ -205,58 +231,103 @@ class HarvardDatabase:
             # Convert course_id to integer for joining
             self.q_reports_df['course_id'] = self.q_reports_df['course_id'].astype(int)
             
-            # Create a working copy of course data
-            courses_working = pd.DataFrame.from_dict(self.course_dict, orient='index')
-            
-            # Convert course_id to int for joining
-            if 'course_id' in courses_working.columns:
-                courses_working['course_id'] = courses_working['course_id'].astype(int)
-            
-            # Merge course data with Q reports
-            self.merged_courses = courses_working.merge(
-                self.q_reports_df[['course_id', 'overall_score_course_mean', 'mean_hours', 'comments']],
-                on='course_id',
-                how='left'
-            )
-            
-            # Update the course dictionary with the Q report data
-            for _, row in self.merged_courses.iterrows():
-                course_id = row['course_id']
-                if course_id in self.course_dict:
-                    # Update with Q report data
-                    self.course_dict[course_id].update({
-                        'overall_score_course_mean': row.get('overall_score_course_mean'),
-                        'mean_hours': row.get('mean_hours'),
-                        'comments': row.get('comments')
-                    })
+            # Index report rows by course ID for direct workload and score lookups
+            self._build_q_report_index()
+            
+            # The last report for a course wins, matching the previous update order
+            q_fields = ['overall_score_course_mean', 'mean_hours', 'comments']
+            q_reports = self.q_reports_df[['course_id'] + q_fields].drop_duplicates(subset='course_id', keep='last')
+            
+            # Join Q reports onto the course table rows in one left merge
+            courses = pd.DataFrame({'course_id': self.course_table.course_ids})
+            merged = courses.merge(q_reports, on='course_id', how='left', validate='one_to_one', indicator=True)
+            matched = int((merged['_merge'] == 'both').sum())
+            
+            for field in q_fields:
+                column = merged[field]
+                if pd.api.types.is_numeric_dtype(column):
+                    values = column.to_numpy(dtype=float)
+                else:
+                    values = column.astype(object).where(column.notna(), np.nan).to_numpy()
+                self.course_table.set_column(field, values)
                     
-            logger.info(f"Processed Q reports for {len(self.merged_courses)} courses")
+            logger.info(f"Processed Q reports for {matched} courses")
             
         except Exception as e:
             logger.error(f"Error processing Q reports: {str(e)}")
             raise
     
+    def _build_q_report_index(self) -> None:
+        """Index Q report rows by course ID (first report per course) for array lookups"""
+        df = self.q_reports_df
+        ids = pd.to_numeric(df['course_id'], errors='coerce').to_numpy(dtype=np.float64)
+        rows = np.flatnonzero(~np.isnan(ids))
+        ids = ids[rows].astype(np.int64)
+        
+        order = np.argsort(ids, kind='stable')
+        sorted_ids = ids[order]
+        first = np.ones(len(sorted_ids), dtype=bool)
+        first[1:] = sorted_ids[1:] != sorted_ids[:-1]
+        
+        self.q_report_ids = sorted_ids[first]
+        self.q_report_offsets = rows[order[first]]
+        
+        for field, attr in (('mean_hours', 'q_report_hours'), ('overall_score_course_mean', 'q_report_scores')):
+            if field in df.columns:
+                values = pd.to_numeric(df[field], errors='coerce').to_numpy(dtype=np.float64)
+            else:
+                values = np.full(len(df), np.nan)
+            setattr(self, attr, values)
+    
+    def q_report_rows(self, course_ids) -> np.ndarray:
+        """Offsets into q_reports_df of the first report for each course ID (-1 if none)"""
+        ids = pd.to_numeric(pd.Series(list(course_ids), dtype=object), errors='coerce').to_numpy(dtype=np.float64)
+        valid = ~np.isnan(ids)
+        keys = np.where(valid, ids, -1).astype(np.int64)
+        
+        if len(self.q_report_ids) == 0:
+            return np.full(len(keys), -1, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(self.q_report_ids, keys), len(self.q_report_ids) - 1)
+        found = valid & (self.q_report_ids[positions] == keys)
+        return np.where(found, self.q_report_offsets[positions], -1)
+    
+    def get_workloads(self, course_ids) -> Tuple[np.ndarray, np.ndarray]:
+        """Mean hours and overall Q scores for a batch of course IDs
+        
+        Returns two float arrays aligned with course_ids (NaN when unknown). Values
+        come from each course's first Q report; mean hours fall back to the course
+        table when the report has none.
+        """
+        course_ids = list(course_ids)
+        rows = self.q_report_rows(course_ids)
+        found = rows >= 0
+        hours = np.full(len(rows), np.nan)
+        scores = np.full(len(rows), np.nan)
+        hours[found] = self.q_report_hours[rows[found]]
+        scores[found] = self.q_report_scores[rows[found]]
+        
+        # Fall back to the merged course table for missing hours
+        missing = np.flatnonzero(np.isnan(hours))
+        if len(missing):
+            table_rows = self.course_table.row_indices(course_ids[i] for i in missing)
+            known = table_rows >= 0
+            hours[missing[known]] = self.course_table.mean_hours[table_rows[known]]
+        
+        return hours, scores
+    
     def process_concentrations(self) -> None:
         """Process concentration data"""
         try:
             # Clean the subjects dataframe
             self.subjects_df = self.subjects_df.dropna(subset=['subject'])
             
-            # Process each concentration
-            for _, row in self.subjects_df.iterrows():
-                subject = row['subject']
-                
-                # Skip if we've already processed this concentration
-                if subject in self.concentration_dict:
-                    continue
-                
-                # Store concentration data
-                self.concentration_dict[subject] = {
-                    'department': row.get('department', ''),
-                    'ab0': row.get('ab0', ''),
-                    'ab1': row.get('ab1', ''),
-                    'ab2': row.get('ab2', '')
-                }
+            # The first row for each concentration wins
+            subjects = self.subjects_df.drop_duplicates(subset='subject', keep='first')
+            fields = ['department', 'ab0', 'ab1', 'ab2']
+            columns = [subjects[field].tolist() if field in subjects else [''] * len(subjects) for field in fields]
+            for subject, *values in zip(subjects['subject'].tolist(), *columns):
+                if subject not in self.concentration_dict:
+                    self.concentration_dict[subject] = dict(zip(fields, values))
                 
             logger.info(f"Processed {len(self.concentration_dict)} concentrations")
             
@@ -271,7 +342,7 @@ class HarvardDatabase:
             logger.info("Building basic indices")
             
             # Advanced indices are built only if dependencies are available
-            if SENTENCE_TRANSFORMERS_AVAILABLE and FAISS_AVAILABLE:
+            if self._can_embed():
                 logger.info("Building vector search indices")
                 
                 # Initialize the sentence transformer model with explicit error checking
@@ -281,31 +352,8 @@ class HarvardDatabase:
                         logger.error("Failed to load embedding model")
                         raise ValueError("Embedding model could not be loaded")
                         
-                    # Check if we have cached embeddings
-                    cache_file = os.path.join(self.cache_dir, "course_embeddings.pkl")
-                    if os.path.exists(cache_file):
-                        try:
-                            with open(cache_file, 'rb') as f:
-                                cache_data = pickle.load(f)
-                                self.course_embeddings = cache_data.get('embeddings')
-                                self.course_ids_for_embeddings = cache_data.get('ids')
-                            logger.info("Loaded cached embeddings")
-                            
-                            # Important: Build the FAISS index after loading cached embeddings
-                            if self.course_embeddings is not None and len(self.course_embeddings) > 0:
-                                dimension = self.course_embeddings.shape[1]
-                                self.embedding_index = faiss.IndexFlatL2(dimension)
-                                self.embedding_index.add(self.course_embeddings)
-                                logger.info("Built FAISS index from cached embeddings")
-                            else:
-                                logger.warning("Cached embeddings are empty or invalid")
-                                self._build_vector_search_index()
-                        except Exception as e:
-                            logger.error(f"Error loading cached embeddings: {e}")
-                            self._build_vector_search_index()
-                    else:
-                        # Build the vector search index
-                        self._build_vector_search_index()
+                    # Embed the catalogue, reusing cached embeddings of unchanged courses
+                    self._build_vector_search_index()
                 except Exception as e:
                     logger.error(f"Failed to initialize vector search: {e}")
                     self.model = None
@@ -316,7 +364,7 @@ class HarvardDatabase:
                 logger.warning("Skipping vector search index building due to missing dependencies")
                 
             # Build BM25 index for keyword search if available
-            if BM25_AVAILABLE and NLTK_AVAILABLE:
+            if BM25_AVAILABLE:
                 logger.info("Building BM25 indices")
                 self._build_bm25_index()
             else:
@@ -332,23 +380,174 @@ class HarvardDatabase:
             self.bm25_index = None
             self.tokenized_corpus = []
             self.course_ids_for_bm25 = []
+        
+        # Search results cached before the indexes were built are stale
+        self.data_version = uuid.uuid4().hex
     
-    def _load_embedding_model(self):
-        """Load the sentence transformer model for embeddings"""
+    def save_snapshot(self, snapshot_dir: str, content_hash: str) -> Optional[str]:
+        """Persist the processed database so later boots can skip processing"""
         try:
-            # Use a good all-purpose embedding model
-            return SentenceTransformer('all-MiniLM-L6-v2')
+            arrays, table_meta = self.course_table.to_snapshot()
+            arrays = {f"courses.{name}": array for name, array in arrays.items()}
+            
+            meta = {
+                'course_table': table_meta,
+                'dept_course_dict': self.dept_course_dict,
+                'course_by_code': self.course_by_code,
+                'course_by_name': self.course_by_name,
+                'courses_by_level': self.courses_by_level,
+                'courses_by_term': self.courses_by_term,
+                'concentration_dict': self.concentration_dict,
+                'q_reports_df': self.q_reports_df,
+                'bm25_vocab': None,
+                'bm25_tokenizer': self.tokenizer.config
+            }
+            
+            # Embeddings and their index; the index is a raw FAISS file so workers can map it
+            files = {}
+            if self.course_embeddings is not None and len(self.course_embeddings) > 0:
+                arrays['embeddings.vectors'] = np.asarray(self.course_embeddings, dtype=np.float32)
+                arrays['embeddings.course_ids'] = np.asarray(self.course_ids_for_embeddings, dtype=np.int64)
+                meta['index_backend'] = self.index_backend
+                meta['embedding_model_id'] = self._model_id()
+                meta['embedding_text_version'] = EMBEDDING_TEXT_VERSION
+                if self.embedding_index is not None:
+                    index = self.embedding_index
+                    files['embeddings.faiss'] = lambda path: save_vector_index(index, path)
+                
+                # Course-to-course neighbour table
+                table_ids, neighbor_ids, neighbor_scores = self._neighbor_table
+                if neighbor_ids is not None and table_ids is self.course_ids_for_embeddings:
+                    arrays['embeddings.neighbor_ids'] = neighbor_ids
+                    arrays['embeddings.neighbor_scores'] = neighbor_scores
+            
+            # BM25 postings, stored as built so loading needs no tokenizing or weighting
+            if self.bm25_index is not None:
+                bm25_arrays, meta['bm25_params'] = self.bm25_index.to_arrays()
+                for name, array in bm25_arrays.items():
+                    arrays[f"bm25.{name}"] = array
+                arrays['bm25.course_ids'] = np.asarray(self.course_ids_for_bm25, dtype=np.int64)
+                meta['bm25_vocab'] = sorted(self.bm25_index.vocabulary, key=self.bm25_index.vocabulary.get)
+            
+            return write_snapshot(snapshot_dir, content_hash, arrays, meta, files)
         except Exception as e:
-            logger.error(f"Error loading embedding model: {e}")
-            # Fallback to a simpler model that might be already cached
-            try:
-                return SentenceTransformer('paraphrase-MiniLM-L3-v2')
-            except Exception as e2:
-                logger.error(f"Error loading fallback embedding model: {e2}")
+            logger.error(f"Error saving snapshot: {e}")
+            return None
+    
+    @classmethod
+    def load_snapshot(cls, snapshot_dir: str, content_hash: str, index_backend: Optional[str] = None) -> Optional['HarvardDatabase']:
+        """Build a database from a snapshot, memory-mapping its arrays
+        
+        Course columns, embeddings, the vector index and the BM25 postings are
+        all mapped read-only from the snapshot files, so processes loading the
+        same snapshot share those pages; only the embedding model and small
+        lookup dicts are private to each process.
+        """
+        snapshot = read_snapshot(snapshot_dir, content_hash)
+        if snapshot is None:
+            return None
+        arrays, meta, files = snapshot
+        
+        try:
+            # Raw CSV frames other than the Q reports are not kept in snapshots
+            db = cls(None, None, meta['q_reports_df'], index_backend=index_backend)
+            
+            table_arrays = {name[len("courses."):]: array for name, array in arrays.items() if name.startswith("courses.")}
+            db.course_table = CourseTable.from_snapshot(table_arrays, meta['course_table'])
+            db.course_dict = db.course_table
+            db.filter_engine = FilterEngine(db.course_table)
+            
+            db.dept_course_dict = meta['dept_course_dict']
+            db.course_by_code = meta['course_by_code']
+            db.course_by_name = meta['course_by_name']
+            db.courses_by_level = meta['courses_by_level']
+            db.courses_by_term = meta['courses_by_term']
+            db.concentration_dict = meta['concentration_dict']
+            db._build_q_report_index()
+            
+            # Vector search from the stored embeddings
+            if db._can_embed():
+                db.model = db._load_embedding_model()
+                same_embeddings = (meta.get('embedding_model_id') == db._model_id() and
+                                   meta.get('embedding_text_version') == EMBEDDING_TEXT_VERSION)
+                if db.model is not None and 'embeddings.vectors' in arrays and not same_embeddings:
+                    # Another model's vectors can have the same dimension, so they would load without error
+                    logger.info(f"Snapshot embeddings are from {meta.get('embedding_model_id')}, "
+                                f"re-embedding courses with {db._model_id()}")
+                    db._build_vector_search_index()
+                elif db.model is not None and 'embeddings.vectors' in arrays:
+                    db.course_embeddings = arrays['embeddings.vectors']
+                    db.course_ids_for_embeddings = arrays['embeddings.course_ids'].tolist()
+                    if meta.get('index_backend') == db.index_backend and 'embeddings.neighbor_ids' in arrays:
+                        # Map the stored index and reuse the neighbour table
+                        index_file = files.get('embeddings.faiss')
+                        db.embedding_index = load_vector_index(index_file, mmap=True) if index_file else None
+                    if db.embedding_index is not None:
+                        db._neighbor_table = (db.course_ids_for_embeddings, arrays['embeddings.neighbor_ids'],
+                                              arrays['embeddings.neighbor_scores'])
+                    else:
+                        db._build_embedding_index()
+                elif db.model is not None:
+                    logger.info("Snapshot has no embeddings, building vector search index")
+                    db._build_vector_search_index()
+            
+            # BM25 from the stored postings
+            if BM25_AVAILABLE and meta.get('bm25_vocab') is not None and meta.get('bm25_tokenizer') == db.tokenizer.config:
+                bm25_arrays = {name: arrays[f"bm25.{name}"] for name in BM25Index.ARRAYS}
+                db.bm25_index = BM25Index.from_arrays({token: i for i, token in enumerate(meta['bm25_vocab'])},
+                                                      bm25_arrays, meta['bm25_params'])
+                db.course_ids_for_bm25 = arrays['bm25.course_ids'].tolist()
+            elif BM25_AVAILABLE:
+                logger.info("Snapshot BM25 index was tokenized differently, rebuilding it")
+                db._build_bm25_index()
+            
+            # Shared caches describe this snapshot's data
+            db.data_version = content_hash
+            
+            logger.info(f"Loaded database snapshot with {len(db.course_table)} courses")
+            return db
+        except Exception as e:
+            logger.error(f"Error loading snapshot: {e}")
+            return None
+    
+    def _can_embed(self) -> bool:
+        """Whether vector search is possible, with a local model or the embedding service"""
+        return FAISS_AVAILABLE and (SENTENCE_TRANSFORMERS_AVAILABLE or self.embedding_service is not None)
+    
+    def _load_embedding_model(self):
+        """Load the sentence transformer model for embeddings
+        
+        With EMBEDDING_SERVICE set, returns a client of that service instead so
+        the model runs once for all workers; falls back to a local model when
+        the service is unreachable.
+        """
+        if self.embedding_service:
+            client = EmbeddingClient(self.embedding_service)
+            if client.ping():
+                logger.info(f"Using embedding service at {self.embedding_service}")
+                self.embedding_model_id = f"service:{self.embedding_service}"
+                return client
+            logger.warning(f"Embedding service at {self.embedding_service} is unreachable, loading the model locally")
+            if not SENTENCE_TRANSFORMERS_AVAILABLE:
                 return None
+        
+        # Use a good all-purpose embedding model, falling back to a simpler one that might be already cached
+        for name in EMBEDDING_MODELS:
+            try:
+                model = SentenceTransformer(name)
+                self.embedding_model_id = name
+                return model
+            except Exception as e:
+                logger.error(f"Error loading embedding model {name}: {e}")
+        return None
     
     def _build_vector_search_index(self):
-        """Build the vector search index for semantic search with better error handling"""
+        """Build the vector search index for semantic search with better error handling
+        
+        Course embeddings are cached in cache_dir (see embedding_store.py); only
+        courses whose embedding text changed since the cache was written are
+        encoded again.
+        """
         if not self.model:
             logger.error("No embedding model available, skipping vector search index")
             return
@@ -359,68 +558,47 @@ class HarvardDatabase:
             self.course_ids_for_embeddings = []
             
             for course_id, course in self.course_dict.items():
-                # Combine relevant fields for embedding
-                text_parts = []
-                
-                # Add class name
-                if 'class_name' in course and isinstance(course['class_name'], str):
-                    text_parts.append(course['class_name'])
-                
-                # Add class tag
-                if 'class_tag' in course and isinstance(course['class_tag'], str):
-                    text_parts.append(course['class_tag'])
-                
-                # Add description
-                if 'description' in course and isinstance(course['description'], str):
-                    text_parts.append(course['description'])
-                
-                # Add requirements
-                if 'course_requirements' in course and isinstance(course['course_requirements'], str):
-                    text_parts.append(f"Requirements: {course['course_requirements']}")
-                
-                # Add instructor
-                if 'instructors' in course and isinstance(course['instructors'], str):
-                    text_parts.append(f"Instructor: {course['instructors']}")
-                
-                # Add comments from Q reports
-                if 'comments' in course and isinstance(course['comments'], str):
-                    text_parts.append(f"Student comments: {course['comments']}")
+                course_text = self._embedding_text(course)
                 
                 # Skip if no text to embed
-                if not text_parts:
+                if not course_text:
                     continue
                 
-                course_text = " ".join(text_parts)
                 course_texts.append(course_text)
                 self.course_ids_for_embeddings.append(course_id)
             
             # Generate embeddings if we have texts
             if len(course_texts) > 0:
-                logger.info(f"Generating embeddings for {len(course_texts)} courses...")
-                self.course_embeddings = self.model.encode(course_texts, show_progress_bar=True)
+                model_id = self._model_id()
+                hashes = [text_hash(text) for text in course_texts]
+                cache = load_embedding_cache(self.cache_dir, model_id, EMBEDDING_TEXT_VERSION)
+                embeddings, missing = reuse_embeddings(cache, self.course_ids_for_embeddings, hashes)
+                logger.info(f"Reusing {len(course_texts) - len(missing)} cached course embeddings, "
+                            f"generating {len(missing)}...")
                 
-                # Check if embeddings were generated successfully
-                if self.course_embeddings is None or len(self.course_embeddings) == 0:
-                    logger.error("Failed to generate embeddings")
-                    raise ValueError("Embedding generation failed")
+                if len(missing):
+                    encoded = self.model.encode([course_texts[i] for i in missing], show_progress_bar=True)
+                    
+                    # Check if embeddings were generated successfully
+                    if encoded is None or len(encoded) != len(missing):
+                        logger.error("Failed to generate embeddings")
+                        raise ValueError("Embedding generation failed")
+                    # Cached rows are unit length so an unchanged catalogue maps without copying
+                    encoded = normalize_embeddings(encoded)
+                    if embeddings is None or embeddings.shape[1] != encoded.shape[1]:
+                        embeddings = encoded
+                    else:
+                        embeddings[missing] = encoded
+                
+                # Rewrite the cache when courses were embedded, removed or reordered
+                if len(missing) or cache.course_ids != self.course_ids_for_embeddings:
+                    save_embedding_cache(self.cache_dir, model_id, EMBEDDING_TEXT_VERSION, embeddings,
+                                         self.course_ids_for_embeddings, hashes)
+                self.course_embeddings = embeddings
                     
                 # Build FAISS index for fast similarity search
-                dimension = self.course_embeddings.shape[1]
-                self.embedding_index = faiss.IndexFlatL2(dimension)
-                self.embedding_index.add(self.course_embeddings)
+                self._build_embedding_index()
                 logger.info(f"Built FAISS index with {len(course_texts)} embeddings")
-                
-                # Cache the embeddings
-                try:
-                    os.makedirs(self.cache_dir, exist_ok=True)
-                    with open(os.path.join(self.cache_dir, "course_embeddings.pkl"), 'wb') as f:
-                        pickle.dump({
-                            'embeddings': self.course_embeddings,
-                            'ids': self.course_ids_for_embeddings
-                        }, f)
-                    logger.info("Cached course embeddings")
-                except Exception as e:
-                    logger.error(f"Error caching embeddings: {e}")
             else:
                 logger.warning("No courses with text to embed")
                 
@@ -430,6 +608,97 @@ class HarvardDatabase:
             self.course_embeddings = None
             self.course_ids_for_embeddings = []
             self.embedding_index = None
+    
+    def _embedding_text(self, course: Dict) -> str:
+        """Text a course is embedded from (bump EMBEDDING_TEXT_VERSION when changing it)"""
+        # Combine relevant fields for embedding
+        text_parts = []
+        
+        # Add class name
+        if 'class_name' in course and isinstance(course['class_name'], str):
+            text_parts.append(course['class_name'])
+        
+        # Add class tag
+        if 'class_tag' in course and isinstance(course['class_tag'], str):
+            text_parts.append(course['class_tag'])
+        
+        # Add description
+        if 'description' in course and isinstance(course['description'], str):
+            text_parts.append(course['description'])
+        
+        # Add requirements
+        if 'course_requirements' in course and isinstance(course['course_requirements'], str):
+            text_parts.append(f"Requirements: {course['course_requirements']}")
+        
+        # Add instructor
+        if 'instructors' in course and isinstance(course['instructors'], str):
+            text_parts.append(f"Instructor: {course['instructors']}")
+        
+        # Add comments from Q reports
+        if 'comments' in course and isinstance(course['comments'], str):
+            text_parts.append(f"Student comments: {course['comments']}")
+        
+        return " ".join(text_parts)
+    
+    def _build_embedding_index(self) -> None:
+        """Normalize course_embeddings and index them for cosine (inner-product) search
+        
+        Also builds the course-to-course neighbour table. Trained indexes and
+        neighbour tables are persisted next to the embedding cache and reused.
+        """
+        embeddings = normalize_embeddings(self.course_embeddings)
+        self.course_embeddings = embeddings
+        fingerprint = index_fingerprint(embeddings, self.index_backend)[:16]
+        
+        index_file = os.path.join(self.cache_dir, f"vector_index-{self.index_backend}-{fingerprint}.faiss")
+        self.embedding_index = load_vector_index(index_file) if self.index_backend != 'flat' else None
+        if self.embedding_index is not None:
+            logger.info(f"Loaded trained {self.index_backend} index from {index_file}")
+        else:
+            self.embedding_index = build_vector_index(embeddings, self.index_backend)
+            if self.index_backend != 'flat':
+                try:
+                    save_vector_index(self.embedding_index, index_file)
+                except Exception as e:
+                    logger.error(f"Error saving vector index: {e}")
+        
+        neighbors_file = os.path.join(self.cache_dir, f"neighbors-{self.index_backend}-{fingerprint}-k{NEIGHBOR_TABLE_K}.npz")
+        if os.path.exists(neighbors_file):
+            try:
+                with np.load(neighbors_file) as stored:
+                    self._set_neighbor_table(stored['rows'], stored['scores'])
+                return
+            except Exception as e:
+                logger.error(f"Error loading neighbour table: {e}")
+        
+        rows, scores = neighbor_table(self.embedding_index, embeddings, NEIGHBOR_TABLE_K)
+        self._set_neighbor_table(rows, scores)
+        logger.info(f"Built course neighbour table with k={NEIGHBOR_TABLE_K}")
+        try:
+            np.savez(neighbors_file, rows=rows, scores=scores)
+        except Exception as e:
+            logger.error(f"Error saving neighbour table: {e}")
+    
+    def _set_neighbor_table(self, rows: np.ndarray, scores: np.ndarray) -> None:
+        """Store neighbour rows of course_embeddings as course IDs"""
+        id_array, _ = self._embedding_ids()
+        neighbor_ids = np.where(rows >= 0, id_array[np.maximum(rows, 0)], -1)
+        self._neighbor_table = (self.course_ids_for_embeddings, neighbor_ids, np.asarray(scores, dtype=np.float32))
+    
+    def similar_course_ids(self, course_id) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Precomputed (neighbour course IDs, similarities) for a course, best first
+        
+        Returns None when the course has no embedding or the table is not built.
+        """
+        table_ids, neighbor_ids, scores = self._neighbor_table
+        if neighbor_ids is None or table_ids is not self.course_ids_for_embeddings:
+            return None
+        row = self._embedding_rows([course_id])[0]
+        if row < 0:
+            return None
+        valid = neighbor_ids[row] >= 0
+        return neighbor_ids[row][valid], scores[row][valid]
+    
     def get_course_workload(self, course_id=None, course_code=None):
         """Directly retrieve course workload data from q_reports"""
         if course_id is None and course_code is not None:
@@ -447,21 +716,10 @@ class HarvardDatabase:
         except (ValueError, TypeError):
             return None
         
-        # Direct lookup in q_reports_df
-        if hasattr(self, 'q_reports_df'):
-            q_report = self.q_reports_df[self.q_reports_df['course_id'] == course_id]
-            if not q_report.empty and 'mean_hours' in q_report.columns:
-                hours_val = q_report['mean_hours'].iloc[0]
-                if not pd.isna(hours_val):
-                    return hours_val
-        
-        # Fall back to course_dict if q_reports lookup failed
-        if course_id in self.course_dict and 'mean_hours' in self.course_dict[course_id]:
-            hours_val = self.course_dict[course_id].get('mean_hours')
-            if hours_val is not None and not pd.isna(hours_val):
-                return hours_val
-        
-        return None
+        hours, _ = self.get_workloads([course_id])
+        if np.isnan(hours[0]):
+            return None
+        return hours[0]
 
     def _build_bm25_index(self):
         """Build BM25 index for keyword search with error handling"""
@@ -499,7 +757,7 @@ class HarvardDatabase:
                     continue
                 
                 # Combine and tokenize
-                course_text = " ".join(text_parts).lower()
+                course_text = " ".join(text_parts)
                 try:
                     tokenized_text = self._tokenize_text(course_text)
                     
@@ -511,7 +769,7 @@ class HarvardDatabase:
             
             # Create BM25 index if we have data
             if self.tokenized_corpus:
-                self.bm25_index = BM25Okapi(self.tokenized_corpus)
+                self.bm25_index = BM25Index.from_corpus(self.tokenized_corpus)
                 logger.info(f"Built BM25 index with {len(self.tokenized_corpus)} documents")
             else:
                 logger.warning("No documents in BM25 index")
@@ -523,32 +781,115 @@ class HarvardDatabase:
             self.course_ids_for_bm25 = []
     
     def _tokenize_text(self, text: str) -> List[str]:
-        """Tokenize text for BM25 indexing with fallback for missing NLTK"""
-        if not isinstance(text, str):
-            return []
-            
-        # Use NLTK if available
-        if NLTK_AVAILABLE:
-            try:
-                # Tokenize
-                tokens = safe_word_tokenize(text)
-                
-                # Remove stopwords and non-alphabetic tokens
-                stop_words = set(stopwords.words('english'))
-                return [token.lower() for token in tokens 
-                        if token.lower() not in stop_words and token.isalpha()]
-            except Exception as e:
-                logger.warning(f"Error using NLTK tokenization: {e}. Falling back to basic tokenization.")
-                # Fall back to basic tokenization
-                
-        # Basic tokenization fallback
-        words = text.lower().split()
-        # Simple stopwords list for fallback
-        basic_stopwords = {'the', 'a', 'an', 'and', 'or', 'but', 'if', 'because', 'as', 'what',
-                          'when', 'where', 'how', 'who', 'which', 'this', 'that', 'these', 'those',
-                          'then', 'just', 'so', 'than', 'such', 'both', 'through', 'about', 'for',
-                          'is', 'of', 'while', 'during', 'to', 'from', 'in', 'on', 'at', 'by'}
-        return [word for word in words if word.isalpha() and word not in basic_stopwords]
+        """Tokenize text for BM25 indexing"""
+        return self.tokenizer.tokenize(text)
+    
+    def shared_cache(self, name: str, **bounds):
+        """Process-wide cache for results derived from this database (see cache.py)
+        
+        The shared caches are cleared whenever they are used with a different
+        database version than before.
+        """
+        bind_data_version(self.data_version)
+        return shared_cache(name, **bounds)
+    
+    @property
+    def search_cache(self):
+        """Shared cache of vector and hybrid search results"""
+        return self.shared_cache('search', max_entries=SEARCH_CACHE_SIZE, max_mb=SEARCH_CACHE_MAX_MB,
+                                 ttl=SEARCH_CACHE_TTL)
+    
+    @property
+    def query_embedding_cache(self):
+        """Shared cache of unit-length query embeddings by (model, normalized query)
+        
+        Embeddings only depend on the model, so unlike the result caches this
+        one is kept when the data changes.
+        """
+        return shared_cache('query_embedding', max_entries=QUERY_EMBEDDING_CACHE_SIZE,
+                            max_mb=QUERY_EMBEDDING_CACHE_MAX_MB, versioned=False)
+    
+    def _model_id(self) -> str:
+        return self.embedding_model_id or type(self.model).__name__
+    
+    def _embed_queries(self, queries: List[str]) -> np.ndarray:
+        """Unit-length float32 embeddings of queries, running the model only for uncached ones"""
+        self._restore_query_embeddings()
+        cache = self.query_embedding_cache
+        model_id = self._model_id()
+        texts = [normalize_query(query) for query in queries]
+        
+        found = {}
+        for text in dict.fromkeys(texts):
+            embedding = cache.get((model_id, text))
+            if embedding is not None:
+                found[text] = embedding
+        
+        misses = [text for text in dict.fromkeys(texts) if text not in found]
+        if misses:
+            encoded = normalize_embeddings(np.asarray(self.model.encode(misses), dtype=np.float32))
+            for text, embedding in zip(misses, encoded):
+                # Copy so each entry owns its row and the batch array can be freed
+                found[text] = embedding.copy()
+                cache.set((model_id, text), found[text])
+        return np.stack([found[text] for text in texts])
+    
+    def _restore_query_embeddings(self) -> None:
+        """Load persisted query embeddings once per process and save them again at exit"""
+        path = self.query_embedding_file
+        if not path or path in _persisted_query_embedding_files:
+            return
+        _persisted_query_embedding_files.add(path)
+        self.load_query_embeddings(path)
+        atexit.register(self.save_query_embeddings, path)
+    
+    def save_query_embeddings(self, path: Optional[str] = None) -> bool:
+        """Write the current model's cached query embeddings to an .npz file"""
+        path = path or self.query_embedding_file
+        if not path or self.model is None:
+            return False
+        model_id = self._model_id()
+        entries = [(key[1], embedding) for key, embedding in self.query_embedding_cache.items() if key[0] == model_id]
+        if not entries:
+            return False
+        
+        try:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            staging = f"{path}.{os.getpid()}.tmp"
+            with open(staging, 'wb') as f:
+                np.savez(f, model_id=np.array(model_id), texts=np.array([text for text, _ in entries]),
+                         vectors=np.stack([embedding for _, embedding in entries]))
+            os.replace(staging, path)
+            logger.info(f"Saved {len(entries)} query embeddings to {path}")
+            return True
+        except Exception as e:
+            logger.error(f"Error saving query embeddings: {e}")
+            return False
+    
+    def load_query_embeddings(self, path: Optional[str] = None) -> int:
+        """Warm the query embedding cache from save_query_embeddings output; returns the entries loaded"""
+        path = path or self.query_embedding_file
+        if not path or not os.path.exists(path) or self.model is None:
+            return 0
+        model_id = self._model_id()
+        
+        try:
+            with np.load(path, allow_pickle=False) as stored:
+                if str(stored['model_id']) != model_id:
+                    logger.info(f"Ignoring query embeddings in {path}: computed with another model")
+                    return 0
+                texts = stored['texts'].tolist()
+                vectors = stored['vectors'].astype(np.float32)
+        except Exception as e:
+            logger.error(f"Error loading query embeddings: {e}")
+            return 0
+        
+        # Stored least recently used first, so the LRU order survives the restart
+        cache = self.query_embedding_cache
+        for text, embedding in zip(texts, vectors):
+            cache.set((model_id, text), embedding.copy())
+        logger.info(f"Loaded {len(texts)} query embeddings from {path}")
+        return len(texts)
     
     def get_course_by_id(self, course_id: int) -> Optional[Dict]:
         """Get course by ID"""
@@ -569,18 +910,12 @@ class HarvardDatabase:
     
     def get_courses_by_level_range(self, dept: str, start_level: int, end_level: int) -> List[Dict]:
         """Get courses by department and level range (e.g., 'MATH', 130, 139)"""
-        result = []
-        for level in range((start_level // 10) * 10, ((end_level // 10) + 1) * 10, 10):
-            level_key = (dept, level)
-            course_ids = self.courses_by_level.get(level_key, [])
-            for cid in course_ids:
-                course = self.get_course_by_id(cid)
-                if course:
-                    # Extract the actual course number from the class_tag
-                    match = re.search(r'([A-Za-z]+)\s*(\d+)', course.get('class_tag', ''))
-                    if match and int(match.group(2)) >= start_level and int(match.group(2)) <= end_level:
-                        result.append(course)
-        return result
+        table = self.course_table
+        indices = self.filter_engine.select(departments=[dept], exact_dept=True,
+                                            course_levels=[(start_level, end_level)])
+        # Order by level decade like the per-level lookup tables
+        indices = indices[np.argsort(table.levels[indices], kind='stable')]
+        return table.rows(indices)
     
     def get_courses_by_term(self, term: str) -> List[Dict]:
         """Get courses by term (e.g., 'Fall 2023')"""
@@ -593,179 +928,347 @@ class HarvardDatabase:
     
     def vector_search(self, query: str, top_k: int = 20) -> List[Dict]:
         """Perform semantic vector search using the query"""
-        if not (SENTENCE_TRANSFORMERS_AVAILABLE and FAISS_AVAILABLE):
+        return self.vector_search_batch([query], top_k=top_k)[0]
+    
+    def vector_search_batch(self, queries: List[str], top_k: int = 20) -> List[List[Dict]]:
+        """Semantic vector search for several queries with one encode and one index search"""
+        results = []
+        for course_ids, _ in self.vector_search_scored_batch(queries, top_k=top_k):
+            # Get courses from the matched IDs
+            courses = []
+            for course_id in course_ids.tolist():
+                course = self.get_course_by_id(course_id)
+                if course:
+                    courses.append(course)
+            results.append(courses)
+        return results
+    
+    def vector_search_scored(self, query: str, top_k: int = 20) -> Tuple[np.ndarray, np.ndarray]:
+        """Semantic vector search returning (course_ids, cosine similarities), best first"""
+        return self.vector_search_scored_batch([query], top_k=top_k)[0]
+    
+    def vector_search_scored_batch(self, queries: List[str], top_k: int = 20) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Scored vector search for several queries, aligned with queries"""
+        return self._vector_search_many([(query, top_k) for query in queries])
+    
+    def _vector_search_many(self, requests: List[Tuple[str, int]]) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Answer (query, top_k) requests, encoding and searching all uncached queries together
+        
+        Results are cached per (normalized query, top_k) in search_cache, so a batch
+        run ahead of time (see run_searches) serves the individual searches issued later.
+        """
+        no_results = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))
+        
+        if not self._can_embed():
             logger.warning("Vector search requested but dependencies not available")
-            return []  # Return empty list if functionality not available
+            return [no_results] * len(requests)  # Return no results if functionality not available
         
         if not hasattr(self, 'embedding_index') or self.embedding_index is None:
             logger.warning("Vector search index not built")
-            return []
-            
-        try:
-            # Generate query embedding
-            query_embedding = self.model.encode([query])
-            
-            # Search the FAISS index
-            scores, indices = self.embedding_index.search(query_embedding, top_k)
-            
-            # Get courses from indices
-            results = []
-            for i in indices[0]:
-                if i < len(self.course_ids_for_embeddings):
-                    course_id = self.course_ids_for_embeddings[i]
-                    course = self.get_course_by_id(course_id)
-                    if course:
-                        results.append(course)
+            return [no_results] * len(requests)
+        
+        # Cached answers, and the queries still to run, each searched once with its largest top_k
+        found = {}
+        pending = {}
+        for query, top_k in requests:
+            key = ("vector", normalize_query(query), top_k)
+            cached = self.search_cache.get(key)
+            if cached is not None:
+                found[key] = cached
+            else:
+                pending[key[1]] = max(top_k, pending.get(key[1], 0))
+        
+        # Queries another thread is already searching (e.g. run_searches in a concurrent
+        # pipeline stage) are waited for instead of being encoded twice
+        waiting = {}
+        claimed = {}
+        if pending:
+            with self._vector_search_lock:
+                for query, top_k in pending.items():
+                    flight = self._vector_searches_in_flight.get(query)
+                    if flight is not None and flight[1] >= top_k:
+                        waiting[query] = flight
+                    else:
+                        claimed[query] = (threading.Event(), top_k)
+                        self._vector_searches_in_flight[query] = claimed[query]
+        
+        if claimed:
+            try:
+                # Unit-length query embeddings, with one forward pass for the uncached ones
+                pending_queries = list(claimed)
+                with SEARCH_SECONDS.time(operation="query_embedding"):
+                    query_embeddings = self._embed_queries(pending_queries)
+                
+                # One index search; inner products of unit vectors are cosine similarities
+                # (quantized indexes rescore their candidates against the float vectors)
+                with SEARCH_SECONDS.time(operation="vector_index_search"):
+                    scores, indices = search_index(self.embedding_index, query_embeddings,
+                                                   max(top_k for _, top_k in claimed.values()), self.course_embeddings)
+                
+                # Drop the -1 padding FAISS returns when there are fewer than top_k vectors
+                id_array, _ = self._embedding_ids()
+                hits = {}
+                for row, query in enumerate(pending_queries):
+                    valid = (indices[row] >= 0) & (indices[row] < len(id_array))
+                    hits[query] = (id_array[indices[row][valid]], scores[row][valid])
+                
+                for query, top_k in requests:
+                    key = ("vector", normalize_query(query), top_k)
+                    if key not in found and key[1] in hits:
+                        course_ids, similarities = hits[key[1]]
+                        found[key] = (course_ids[:top_k], similarities[:top_k])
+                        self.search_cache[key] = found[key]
+            except Exception as e:
+                logger.error(f"Error in vector search: {e}")
+                return [no_results] * len(requests)
+            finally:
+                with self._vector_search_lock:
+                    for query, flight in claimed.items():
+                        if self._vector_searches_in_flight.get(query) is flight:
+                            del self._vector_searches_in_flight[query]
+                        flight[0].set()
+        
+        if waiting:
+            for event, _ in waiting.values():
+                event.wait()
             
-            return results
-        except Exception as e:
-            logger.error(f"Error in vector search: {e}")
-            return []
+            # Answers the other thread cached for its (larger or equal) top_k; searched again here if it failed
+            missing = []
+            for query, top_k in requests:
+                key = ("vector", normalize_query(query), top_k)
+                if key not in found:
+                    cached = self.search_cache.get(("vector", key[1], waiting[key[1]][1]))
+                    if cached is not None:
+                        found[key] = (cached[0][:top_k], cached[1][:top_k])
+                    else:
+                        missing.append((query, top_k))
+            if missing:
+                for (query, top_k), result in zip(missing, self._vector_search_many(missing)):
+                    found[("vector", normalize_query(query), top_k)] = result
+        
+        return [found[("vector", normalize_query(query), top_k)] for query, top_k in requests]
+    
+    def run_searches(self, searches: List[Tuple[str, int]]) -> None:
+        """Run the vector part of the (query, top_k) searches a request will issue, as one batch
+        
+        Later vector_search, hybrid_search and semantic lookups for these queries
+        are then served from the cache instead of each running the model.
+        """
+        if searches and self.embedding_index is not None:
+            self._vector_search_many(list(searches))
     
     def keyword_search(self, query: str, top_k: int = 20) -> List[Dict]:
         """Perform keyword-based BM25 search using the query"""
-        if not (BM25_AVAILABLE and NLTK_AVAILABLE):
+        course_ids, _ = self.keyword_search_scored(query, top_k=top_k)
+        
+        # Get courses from the matched IDs
+        results = []
+        for course_id in course_ids.tolist():
+            course = self.get_course_by_id(course_id)
+            if course:
+                results.append(course)
+        return results
+    
+    def keyword_search_scored(self, query: str, top_k: int = 20) -> Tuple[np.ndarray, np.ndarray]:
+        """BM25 keyword search returning (course_ids, BM25 scores), best first"""
+        no_results = (np.empty(0, dtype=np.int64), np.empty(0))
+        
+        if not BM25_AVAILABLE:
             logger.warning("BM25 search requested but dependencies not available")
-            return []
+            return no_results
             
         if not hasattr(self, 'bm25_index') or self.bm25_index is None:
             logger.warning("BM25 index not built")
-            return []
+            return no_results
             
         try:
-            # Tokenize query
-            tokenized_query = self._tokenize_text(query.lower())
+            # Tokenize query (cached, same token stream as the indexed course text)
+            tokenized_query = self.tokenizer.tokenize_query(query)
             
             if not tokenized_query:
                 logger.warning("Empty tokenized query")
-                return []
-            
-            # Get BM25 scores
-            bm25_scores = self.bm25_index.get_scores(tokenized_query)
-            
-            # Get top_k indices
-            top_indices = np.argsort(bm25_scores)[::-1][:top_k]
-            
-            # Get courses from indices
-            results = []
-            for i in top_indices:
-                if i < len(self.course_ids_for_bm25):
-                    course_id = self.course_ids_for_bm25[i]
-                    course = self.get_course_by_id(course_id)
-                    if course:
-                        results.append(course)
+                return no_results
             
-            return results
+            # Score only the postings of the query terms and select the top_k
+            with SEARCH_SECONDS.time(operation="bm25_search"):
+                rows, scores = self.bm25_index.top_k(tokenized_query, top_k)
+            course_ids = np.asarray(self.course_ids_for_bm25, dtype=np.int64)[rows]
+            return course_ids, scores
         except Exception as e:
             logger.error(f"Error in keyword search: {e}")
-            return []
+            return no_results
     
-    def hybrid_search(self, query: str, top_k: int = 20, alpha: float = 0.5) -> List[Dict]:
-        """Perform hybrid search combining vector and keyword search with reciprocal rank fusion"""
-        # Check if we have this query in cache
-        cache_key = f"{query}_{top_k}_{alpha}"
-        if cache_key in self.search_cache:
-            return self.search_cache[cache_key]
-            
+    def keyword_search_batch(self, queries: List[str], top_k: int = 20) -> List[List[Dict]]:
+        """Keyword search for several queries, aligned with queries"""
+        return [self.keyword_search(query, top_k=top_k) for query in queries]
+    
+    def hybrid_search_batch(self, queries: List[str], top_k: int = 20, alpha: float = 0.5) -> List[List[Dict]]:
+        """Hybrid search for several queries, with their vector searches run as one batch"""
+        uncached = [query for query in queries if self._hybrid_cache_key(query, top_k, alpha) not in self.search_cache]
+        self.run_searches([(query, top_k) for query in uncached])
+        return [self.hybrid_search(query, top_k=top_k, alpha=alpha) for query in queries]
+    
+    def _hybrid_cache_key(self, query: str, top_k: int, alpha: float, method: Optional[str] = None,
+                          normalization: Optional[str] = None, rrf_k: Optional[int] = None) -> Tuple:
+        return ("hybrid", normalize_query(query), top_k, alpha, method or self.fusion_method,
+                normalization or self.fusion_normalization, rrf_k or self.rrf_k)
+    
+    def hybrid_search_scored(self, query: str, top_k: int = 20, alpha: float = 0.5,
+                             method: Optional[str] = None, normalization: Optional[str] = None,
+                             rrf_k: Optional[int] = None) -> List[Dict]:
+        """
+        Fuse semantic and keyword search into the top_k results with their scores
+        
+        Each retriever contributes its own top_k candidates, weighted alpha
+        (semantic) and 1 - alpha (keyword). method is 'rrf' (reciprocal rank
+        fusion with constant rrf_k) or 'linear' (weighted sum of 'minmax' or
+        'zscore' normalized scores); defaults come from fusion_method,
+        fusion_normalization and rrf_k.
+        
+        Returns:
+            List of {'course_id', 'score', 'components'} as produced by
+            fusion.fuse_results, with components 'semantic' and/or 'keyword'
+        """
+        cache_key = self._hybrid_cache_key(query, top_k, alpha, method, normalization, rrf_k)
+        cached = self.search_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
         try:
-            # Get results from available search methods
-            semantic_results = []
-            if SENTENCE_TRANSFORMERS_AVAILABLE and FAISS_AVAILABLE and hasattr(self, 'embedding_index') and self.embedding_index is not None:
-                semantic_results = self.vector_search(query, top_k=top_k)
-                
-            keyword_results = []
-            if BM25_AVAILABLE and NLTK_AVAILABLE and hasattr(self, 'bm25_index') and self.bm25_index is not None:
-                keyword_results = self.keyword_search(query, top_k=top_k)
-                
-            # If neither search method is available, fall back to basic filtering
-            if not semantic_results and not keyword_results:
-                logger.warning("No search methods available, falling back to basic filtering")
-                # Simple text matching fallback
-                results = []
-                for course_id, course in self.course_dict.items():
-                    # Check if query appears in course name, tag, or description
-                    query_lower = query.lower()
-                    if ((course.get('class_name', '') and query_lower in course['class_name'].lower()) or
-                        (course.get('class_tag', '') and query_lower in course['class_tag'].lower()) or
-                        (course.get('description', '') and query_lower in course['description'].lower())):
-                        results.append(course)
-                
-                # Sort by course code (not ideal but better than nothing)
-                results.sort(key=lambda x: x.get('class_tag', ''))
-                return results[:top_k]
-            
-            # Combine using reciprocal rank fusion
-            course_ranks = {}
-            
-            # Process semantic search results
-            for i, course in enumerate(semantic_results):
-                course_id = course.get('course_id')
-                if course_id:
-                    course_ranks[course_id] = course_ranks.get(course_id, 0) + alpha * (1.0 / (i + 1))
-            
-            # Process keyword search results
-            for i, course in enumerate(keyword_results):
-                course_id = course.get('course_id')
-                if course_id:
-                    course_ranks[course_id] = course_ranks.get(course_id, 0) + (1 - alpha) * (1.0 / (i + 1))
-            
-            # Sort by combined score
-            sorted_course_ids = sorted(course_ranks.keys(), key=lambda x: course_ranks[x], reverse=True)
-            
-            # Get top courses
-            results = []
-            for course_id in sorted_course_ids[:top_k]:
-                course = self.get_course_by_id(course_id)
-                if course:
-                    results.append(course)
+            components = {}
+            if self._can_embed() and hasattr(self, 'embedding_index') and self.embedding_index is not None:
+                components['semantic'] = self.vector_search_scored(query, top_k=top_k)
+            if BM25_AVAILABLE and hasattr(self, 'bm25_index') and self.bm25_index is not None:
+                components['keyword'] = self.keyword_search_scored(query, top_k=top_k)
             
-            # Cache the results
-            self.search_cache[cache_key] = results
+            with SEARCH_SECONDS.time(operation="hybrid_fusion"):
+                fused = fuse_results(components, top_k,
+                                     method=method or self.fusion_method,
+                                     weights={'semantic': alpha, 'keyword': 1 - alpha},
+                                     normalization=normalization or self.fusion_normalization,
+                                     rrf_k=rrf_k or self.rrf_k)
+            fused = [entry for entry in fused if entry['course_id'] in self.course_dict]
             
-            return results
+            self.search_cache[cache_key] = fused
+            return fused
         except Exception as e:
             logger.error(f"Error in hybrid search: {e}")
             return []
     
+    def hybrid_search(self, query: str, top_k: int = 20, alpha: float = 0.5, **fusion) -> List[Dict]:
+        """Perform hybrid search combining vector and keyword search (see hybrid_search_scored)"""
+        fused = self.hybrid_search_scored(query, top_k=top_k, alpha=alpha, **fusion)
+        if fused:
+            return [self.get_course_by_id(entry['course_id']) for entry in fused]
+        
+        # If neither search method found anything, fall back to basic filtering
+        logger.warning("No search results available, falling back to basic filtering")
+        # Simple text matching fallback
+        results = []
+        query_lower = query.lower()
+        for course_id, course in self.course_dict.items():
+            # Check if query appears in course name, tag, or description
+            if ((course.get('class_name', '') and query_lower in course['class_name'].lower()) or
+                (course.get('class_tag', '') and query_lower in course['class_tag'].lower()) or
+                (course.get('description', '') and query_lower in course['description'].lower())):
+                results.append(course)
+        
+        # Sort by course code (not ideal but better than nothing)
+        results.sort(key=lambda x: x.get('class_tag', ''))
+        return results[:top_k]
+    
     def semantic_filter(self, courses: List[Dict], filter_query: str, min_similarity: float = 0.5) -> List[Dict]:
         """Filter courses by semantic similarity to a filter query"""
-        if not courses or not SENTENCE_TRANSFORMERS_AVAILABLE or not self.model:
+        with SEARCH_SECONDS.time(operation="semantic_filter"):
+            return self._semantic_filter(courses, filter_query, min_similarity)
+    
+    def _semantic_filter(self, courses: List[Dict], filter_query: str, min_similarity: float) -> List[Dict]:
+        if not courses or not self.model:
             return courses
             
         try:
             # Generate filter query embedding
-            filter_embedding = self.model.encode([filter_query])[0]
+            filter_embedding = self._embed_queries([filter_query])[0]
             
-            # Filter courses based on similarity
-            results = []
-            for course in courses:
-                # Create course text
-                course_text = ""
-                
-                if 'class_name' in course and isinstance(course['class_name'], str):
-                    course_text += course['class_name'] + " "
-                
-                if 'description' in course and isinstance(course['description'], str):
-                    course_text += course['description'] + " "
-                
-                if 'comments' in course and isinstance(course['comments'], str):
-                    course_text += course['comments']
-                
-                if not course_text:
-                    continue
-                
-                # Compute similarity
-                course_embedding = self.model.encode([course_text])[0]
-                similarity = self._cosine_similarity(filter_embedding, course_embedding)
-                
-                if similarity >= min_similarity:
-                    results.append(course)
+            # Courses need some text to be compared at all
+            candidates = [course for course in courses if self._semantic_filter_text(course)]
+            if not candidates:
+                return []
             
-            return results
+            # Reuse stored embeddings by course ID; encode the rest in one batch
+            rows = self._embedding_rows([course.get('course_id') for course in candidates])
+            embeddings = np.zeros((len(candidates), len(filter_embedding)), dtype=np.float32)
+            stored = rows >= 0
+            if stored.any():
+                embeddings[stored] = np.asarray(self.course_embeddings)[rows[stored]]
+            
+            missing = np.flatnonzero(~stored)
+            if len(missing):
+                texts = [self._semantic_filter_text(candidates[i]) for i in missing]
+                embeddings[missing] = self._encode_texts(texts)
+            
+            # Cosine similarity of every candidate in one matrix-vector product
+            norms = np.linalg.norm(embeddings, axis=1) * np.linalg.norm(filter_embedding)
+            dots = embeddings @ filter_embedding
+            similarities = np.divide(dots, norms, out=np.zeros_like(dots), where=norms > 0)
+            
+            return [course for course, similarity in zip(candidates, similarities) if similarity >= min_similarity]
         except Exception as e:
             logger.error(f"Error in semantic filter: {e}")
             return courses  # Return original courses if filtering fails
     
+    def _semantic_filter_text(self, course: Dict) -> str:
+        """Text used to embed a course that has no stored embedding"""
+        course_text = ""
+        
+        if 'class_name' in course and isinstance(course['class_name'], str):
+            course_text += course['class_name'] + " "
+        
+        if 'description' in course and isinstance(course['description'], str):
+            course_text += course['description'] + " "
+        
+        if 'comments' in course and isinstance(course['comments'], str):
+            course_text += course['comments']
+        
+        return course_text
+    
+    def _embedding_rows(self, course_ids: List) -> np.ndarray:
+        """Rows of course_embeddings for the given course IDs (-1 when not embedded)"""
+        if self.course_embeddings is None or not len(self.course_ids_for_embeddings):
+            return np.full(len(course_ids), -1, dtype=np.int64)
+        
+        _, index = self._embedding_ids()
+        ids = pd.to_numeric(pd.Series(course_ids, dtype=object), errors='coerce').to_numpy(dtype=np.float64)
+        return index.get_indexer(ids).astype(np.int64)
+    
+    def _embedding_ids(self) -> Tuple[np.ndarray, pd.Index]:
+        """Embedded course IDs as an array and a lookup index, rebuilt when the ID list is replaced"""
+        indexed_ids, id_array, index = self._embedding_id_lookup
+        if indexed_ids is not self.course_ids_for_embeddings:
+            id_array = np.asarray(self.course_ids_for_embeddings, dtype=np.int64)
+            index = pd.Index(id_array.astype(np.float64))
+            index.is_unique  # Build the lookup engine now; lazy builds race between request threads
+            self._embedding_id_lookup = (self.course_ids_for_embeddings, id_array, index)
+        return id_array, index
+    
+    def _encode_texts(self, texts: List[str]) -> np.ndarray:
+        """Embed texts in one batch, reusing embeddings of texts seen before"""
+        cache = self.text_embedding_cache
+        found = {}
+        for text in dict.fromkeys(texts):
+            embedding = cache.get(text)
+            if embedding is not None:
+                found[text] = embedding
+        
+        # Read into a local dict first: concurrent stages may evict entries meanwhile
+        misses = [text for text in dict.fromkeys(texts) if text not in found]
+        if misses:
+            encoded = np.asarray(self.model.encode(misses), dtype=np.float32)
+            for text, embedding in zip(misses, encoded):
+                cache[text] = embedding
+            found.update(zip(misses, encoded))
+        return np.stack([found[text] for text in texts])
+    
     def _cosine_similarity(self, vec1: np.ndarray, vec2: np.ndarray) -> float:
         """Compute cosine similarity between two vectors"""
         try:
@@ -793,38 +1296,46 @@ class HarvardDatabase:
                       max_hours: Optional[float] = None) -> List[Dict]:
         """Filter courses by criteria with error handling"""
         try:
-            results = []
-            
-            for course_id, course in self.course_dict.items():
-                # Skip if doesn't match department
-                if dept and not self._course_matches_dept(course, dept):
-                    continue
-                
-                # Skip if doesn't match level
-                if level and not self._course_matches_level(course, level):
-                    continue
-                
-                # Skip if doesn't match term
-                if term and not self._course_matches_term(course, term):
-                    continue
-                
-                # Skip if below minimum score
-                if min_score and not self._course_above_min_score(course, min_score):
-                    continue
-                
-                # Skip if above maximum hours
-                if max_hours and not self._course_below_max_hours(course, max_hours):
-                    continue
-                
-                # Passed all filters
-                results.append(course)
-            
-            return results
+            # Falsy criteria are ignored. Courses without a score are excluded by a
+            # minimum score, while courses without workload data are kept.
+            with SEARCH_SECONDS.time(operation="structured_filter"):
+                rows = self.filter_engine.select(
+                    departments=[dept] if dept else None,
+                    levels=[level] if level else None,
+                    terms=[term] if term else None,
+                    min_score=min_score or None,
+                    max_hours=max_hours or None
+                )
+            return self.course_table.rows(rows)
             
         except Exception as e:
             logger.error(f"Error filtering courses: {e}")
             return []
     
+    def find_similar_courses_batch(self, course_codes: List[str], top_k: int = 5) -> List[List[Dict]]:
+        """Similar courses for several course codes, with the vector searches run as one batch"""
+        if FAISS_AVAILABLE and self.model is not None:
+            # Only courses missing from the neighbour table need a text search
+            sources = [self.get_course_by_code(code) for code in course_codes]
+            texts = [
+                self._similarity_text(source) for source in sources
+                if source and (top_k > NEIGHBOR_TABLE_K or self.similar_course_ids(source.get('course_id')) is None)
+            ]
+            self.run_searches([(text, top_k + 1) for text in texts if text])
+        return [self.find_similar_courses(code, top_k=top_k) for code in course_codes]
+    
+    def _similarity_text(self, course: Dict) -> str:
+        """Text searched for to find courses similar to a course"""
+        course_text = ""
+        
+        if 'class_name' in course and isinstance(course['class_name'], str):
+            course_text += course['class_name'] + " "
+        
+        if 'description' in course and isinstance(course['description'], str):
+            course_text += course['description']
+        
+        return course_text
+    
     def find_similar_courses(self, course_code: str, top_k: int = 5) -> List[Dict]:
         """Find courses semantically similar to a given course"""
         try:
@@ -833,16 +1344,20 @@ class HarvardDatabase:
             if not source_course:
                 return []
             
+            # Use the precomputed neighbour table when it covers the course
+            neighbors = self.similar_course_ids(source_course.get('course_id'))
+            if neighbors is not None and top_k <= NEIGHBOR_TABLE_K:
+                similar_courses = []
+                for course_id in neighbors[0].tolist():
+                    course = self.get_course_by_id(course_id)
+                    if course and course.get('class_tag') != source_course.get('class_tag'):
+                        similar_courses.append(course)
+                return similar_courses[:top_k]
+            
             # If vector search is available, use it
-            if SENTENCE_TRANSFORMERS_AVAILABLE and FAISS_AVAILABLE and self.model is not None:
+            if FAISS_AVAILABLE and self.model is not None:
                 # Create course text
-                course_text = ""
-                
-                if 'class_name' in source_course and isinstance(source_course['class_name'], str):
-                    course_text += source_course['class_name'] + " "
-                
-                if 'description' in source_course and isinstance(source_course['description'], str):
-                    course_text += source_course['description']
+                course_text = self._similarity_text(source_course)
                 
                 if course_text:
                     # Use vector search to find similar courses
@@ -885,59 +1400,3 @@ class HarvardDatabase:
         except Exception as e:
             logger.error(f"Error finding similar courses: {e}")
             return []
-    
-    def _course_matches_dept(self, course: Dict, dept: str) -> bool:
-        """Check if course matches department"""
-        try:
-            # Check if dept is in class_tag
-            if 'class_tag' in course and isinstance(course['class_tag'], str):
-                return dept.upper() in course['class_tag'].upper()
-            return False
-        except Exception:
-            return False
-    
-    def _course_matches_level(self, course: Dict, level: int) -> bool:
-        """Check if course matches level"""
-        try:
-            if 'class_tag' in course and isinstance(course['class_tag'], str):
-                match = re.search(r'([A-Za-z]+)\s*(\d+)', course['class_tag'])
-                if match:
-                    num = int(match.group(2))
-                    course_level = (num // 10) * 10  # Round to nearest 10
-                    return course_level == level
-            return False
-        except Exception:
-            return False
-    
-    def _course_matches_term(self, course: Dict, term: str) -> bool:
-        """Check if course matches term"""
-        try:
-            if 'term' in course and isinstance(course['term'], str):
-                return term.lower() in course['term'].lower()
-            return False
-        except Exception:
-            return False
-    
-    def _course_above_min_score(self, course: Dict, min_score: float) -> bool:
-        """Check if course is above minimum score"""
-        try:
-            if 'overall_score_course_mean' in course and not pd.isna(course['overall_score_course_mean']):
-                try:
-                    return float(course['overall_score_course_mean']) >= min_score
-                except (ValueError, TypeError):
-                    return False
-            return False  # If no score, don't include
-        except Exception:
-            return False
-    
-    def _course_below_max_hours(self, course: Dict, max_hours: float) -> bool:
-        """Check if course is below maximum hours"""
-        try:
-            if 'mean_hours' in course and not pd.isna(course['mean_hours']):
-                try:
-                    return float(course['mean_hours']) <= max_hours
-                except (ValueError, TypeError):
-                    return True  # If can't convert, include by default
-            return True  # If no hours data, include by default
-        except Exception:
-            return True
\ No newline at end of file
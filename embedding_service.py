@@ -0,0 +1,389 @@
+"""
+embedding_service.py - Shared Embedding Service
+
+Runs the sentence transformer in one process and serves encode requests from
+every web worker over a Unix socket (or a localhost TCP port). Requests that
+arrive within a short window are encoded together in a single model call, and
+query embeddings are cached so repeated queries skip the model entirely.
+
+EmbeddingClient has the encode() signature HarvardDatabase uses on a
+SentenceTransformer, so setting EMBEDDING_SERVICE to the service address
+(unix:/path/to.sock, /path/to.sock or host:port) makes vector search, semantic
+filtering and similar-course lookups use the service transparently.
+
+Wire format: every message is a 4-byte big-endian length followed by the
+payload. A request is a JSON object ({"texts": [...]}, {"op": "ping"} or
+{"op": "stats"}); an encode reply is a JSON header {"count", "dim"} followed
+by a frame of little-endian float32 vectors.
+
+Usage:
+    python embedding_service.py --address unix:/tmp/chatharvard-embeddings.sock
+"""
+
+import argparse
+import json
+import logging
+import os
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from cache import BoundedCache
+
+logger = logging.getLogger("EmbeddingService")
+
+DEFAULT_ADDRESS = "unix:/tmp/chatharvard-embeddings.sock"
+
+# Models tried in order, here and in HarvardDatabase._load_embedding_model
+EMBEDDING_MODELS = ('all-MiniLM-L6-v2', 'paraphrase-MiniLM-L3-v2')
+
+# Micro-batching: wait up to BATCH_WINDOW_MS after the first request for more
+BATCH_WINDOW_MS = 5.0
+MAX_BATCH_SIZE = 64
+
+# Requests of at most this many texts are treated as queries and cached;
+# bulk requests (catalogue embedding) bypass the cache
+QUERY_REQUEST_SIZE = 32
+CACHE_SIZE = 8192
+CACHE_MAX_MB = 64
+
+# Texts per request sent by the client for bulk encodes
+CLIENT_CHUNK_SIZE = 256
+
+_LENGTH = struct.Struct(">I")
+
+
+def parse_address(address: str) -> Tuple[int, Any]:
+    """Socket family and address for unix:/path, /path or host:port"""
+    if address.startswith("unix:"):
+        return socket.AF_UNIX, address[len("unix:"):]
+    if address.startswith("/"):
+        return socket.AF_UNIX, address
+    host, _, port = address.rpartition(":")
+    return socket.AF_INET, (host or "127.0.0.1", int(port))
+
+
+def send_frame(sock: socket.socket, payload: bytes) -> None:
+    sock.sendall(_LENGTH.pack(len(payload)) + payload)
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            raise ConnectionError("Connection closed")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def recv_frame(sock: socket.socket) -> bytes:
+    (size,) = _LENGTH.unpack(_recv_exact(sock, _LENGTH.size))
+    return _recv_exact(sock, size)
+
+
+class MicroBatcher:
+    """Collects concurrent encode requests and runs them as one model call"""
+
+    def __init__(self, model, batch_window_ms: float = BATCH_WINDOW_MS, max_batch_size: int = MAX_BATCH_SIZE,
+                 cache: Optional[BoundedCache] = None):
+        """
+        Args:
+            model: Object with a SentenceTransformer-style encode(texts)
+            batch_window_ms: How long to wait for more requests after the first
+            max_batch_size: Texts that close a batch early
+            cache: Cache of query embeddings by text (None to disable)
+        """
+        self.model = model
+        self.batch_window = batch_window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.cache = cache
+        self.dimension = None
+
+        self.requests = 0
+        self.batches = 0
+        self.texts_encoded = 0
+
+        self._pending: "queue.Queue[Tuple[List[str], bool, Future]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, texts: List[str]) -> Future:
+        """Queue texts for encoding; the future resolves to a float32 array"""
+        future = Future()
+        self._pending.put((texts, len(texts) <= QUERY_REQUEST_SIZE, future))
+        return future
+
+    def _collect(self) -> List[Tuple[List[str], bool, Future]]:
+        """Block for one request, then gather more until the window closes or the batch is full"""
+        batch = [self._pending.get()]
+        size = len(batch[0][0])
+        deadline = time.monotonic() + self.batch_window
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._pending.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(request)
+            size += len(request[0])
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            try:
+                self._encode_batch(batch)
+            except Exception as e:
+                logger.error(f"Error encoding batch: {e}")
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _encode_batch(self, batch: List[Tuple[List[str], bool, Future]]) -> None:
+        """Encode the distinct uncached texts of a batch once and answer every request"""
+        found: Dict[str, np.ndarray] = {}
+        misses: Dict[str, bool] = {}  # text -> whether to cache it
+        for texts, cacheable, _ in batch:
+            for text in texts:
+                if text in misses:
+                    misses[text] = misses[text] or cacheable
+                    continue
+                if text in found:
+                    continue
+                cached = self.cache.get(text) if self.cache is not None and cacheable else None
+                if cached is not None:
+                    found[text] = cached
+                else:
+                    misses[text] = cacheable
+
+        if misses:
+            texts = list(misses)
+            encoded = np.asarray(self.model.encode(texts), dtype=np.float32)
+            self.dimension = encoded.shape[1]
+            for text, vector in zip(texts, encoded):
+                found[text] = vector
+                if self.cache is not None and misses[text]:
+                    self.cache.set(text, vector.copy())
+            self.batches += 1
+            self.texts_encoded += len(texts)
+
+        for texts, _, future in batch:
+            self.requests += 1
+            if texts:
+                future.set_result(np.stack([found[text] for text in texts]))
+            else:
+                future.set_result(np.empty((0, self.dimension or 0), dtype=np.float32))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'requests': self.requests,
+            'batches': self.batches,
+            'texts_encoded': self.texts_encoded,
+            'cache': self.cache.stats() if self.cache is not None else None
+        }
+
+
+class _RequestHandler(socketserver.BaseRequestHandler):
+    """Serves one persistent client connection"""
+
+    def handle(self) -> None:
+        batcher = self.server.batcher
+        while True:
+            try:
+                request = json.loads(recv_frame(self.request))
+            except (ConnectionError, OSError):
+                return
+            except ValueError:
+                send_frame(self.request, json.dumps({'error': 'invalid request'}).encode())
+                continue
+
+            op = request.get('op', 'encode')
+            if op == 'ping':
+                send_frame(self.request, json.dumps({'ok': True}).encode())
+            elif op == 'stats':
+                send_frame(self.request, json.dumps(batcher.stats()).encode())
+            else:
+                try:
+                    vectors = batcher.submit([str(text) for text in request.get('texts', [])]).result()
+                except Exception as e:
+                    send_frame(self.request, json.dumps({'error': str(e)}).encode())
+                    continue
+                header = {'count': vectors.shape[0], 'dim': vectors.shape[1]}
+                send_frame(self.request, json.dumps(header).encode())
+                send_frame(self.request, vectors.astype('<f4', copy=False).tobytes())
+
+
+# Listen backlog; every worker thread may connect at once when workers boot
+REQUEST_QUEUE_SIZE = 256
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    request_queue_size = REQUEST_QUEUE_SIZE
+
+
+class _TCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = REQUEST_QUEUE_SIZE
+
+
+def create_server(model, address: str = DEFAULT_ADDRESS, batch_window_ms: float = BATCH_WINDOW_MS,
+                  max_batch_size: int = MAX_BATCH_SIZE, cache_size: int = CACHE_SIZE,
+                  cache_max_mb: Optional[float] = CACHE_MAX_MB) -> socketserver.BaseServer:
+    """Bind an embedding server for model at address; call serve_forever() to run it"""
+    family, bind_address = parse_address(address)
+    if family == socket.AF_UNIX:
+        if os.path.exists(bind_address):
+            os.unlink(bind_address)
+        server = _UnixServer(bind_address, _RequestHandler)
+    else:
+        server = _TCPServer(bind_address, _RequestHandler)
+
+    cache = None
+    if cache_size:
+        cache = BoundedCache('embedding_service', max_entries=cache_size,
+                             max_bytes=int(cache_max_mb * 1e6) if cache_max_mb else None)
+    server.batcher = MicroBatcher(model, batch_window_ms, max_batch_size, cache)
+    return server
+
+
+class EmbeddingClient:
+    """Encodes texts through an embedding service; usable in place of a SentenceTransformer
+
+    Thread-safe: each thread keeps its own persistent connection.
+    """
+
+    def __init__(self, address: str, timeout: float = 30.0, chunk_size: int = CLIENT_CHUNK_SIZE):
+        """
+        Args:
+            address: Service address (unix:/path, /path or host:port)
+            timeout: Socket timeout in seconds per request
+            chunk_size: Texts sent per request when encoding many at once
+        """
+        self.address = address
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self._family, self._address = parse_address(address)
+        self._local = threading.local()
+
+    def _connection(self) -> socket.socket:
+        sock = getattr(self._local, 'sock', None)
+        if sock is None:
+            sock = socket.socket(self._family, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self._address)
+            self._local.sock = sock
+        return sock
+
+    def _close(self) -> None:
+        sock = getattr(self._local, 'sock', None)
+        self._local.sock = None
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+    def _call(self, request: Dict[str, Any], read_vectors: bool = False):
+        """Send a request and read its reply, reconnecting once if the connection dropped"""
+        payload = json.dumps(request).encode()
+        for attempt in range(2):
+            try:
+                sock = self._connection()
+                send_frame(sock, payload)
+                reply = json.loads(recv_frame(sock))
+                if 'error' in reply:
+                    raise RuntimeError(f"Embedding service error: {reply['error']}")
+                if not read_vectors:
+                    return reply
+                data = recv_frame(sock)
+                return np.frombuffer(data, dtype='<f4').reshape(reply['count'], reply['dim']).astype(np.float32)
+            except (ConnectionError, OSError):
+                self._close()
+                if attempt:
+                    raise
+
+    def ping(self) -> bool:
+        """Whether the service is reachable"""
+        try:
+            return bool(self._call({'op': 'ping'}).get('ok'))
+        except Exception:
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        """Request, batch and cache counters of the service"""
+        return self._call({'op': 'stats'})
+
+    def encode(self, sentences: Sequence[str], batch_size: Optional[int] = None,
+               show_progress_bar: bool = False, **kwargs) -> np.ndarray:
+        """Embed texts as a float32 array (one row per text); extra arguments are ignored"""
+        if isinstance(sentences, str):
+            return self.encode([sentences])[0]
+        texts = list(sentences)
+        chunks = [self._call({'texts': texts[start:start + self.chunk_size]}, read_vectors=True)
+                  for start in range(0, len(texts), self.chunk_size)]
+        if not chunks:
+            return np.empty((0, 0), dtype=np.float32)
+        return chunks[0] if len(chunks) == 1 else np.concatenate(chunks)
+
+
+def wait_for_service(address: str, timeout: float = 120.0, interval: float = 0.25) -> bool:
+    """Poll until the service answers a ping or timeout seconds have passed"""
+    client = EmbeddingClient(address, timeout=interval * 4)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if client.ping():
+            return True
+        time.sleep(interval)
+    return False
+
+
+def load_model():
+    """Load the first available sentence transformer of EMBEDDING_MODELS"""
+    from sentence_transformers import SentenceTransformer
+    for name in EMBEDDING_MODELS:
+        try:
+            return SentenceTransformer(name)
+        except Exception as e:
+            logger.error(f"Error loading embedding model {name}: {e}")
+    raise RuntimeError("No embedding model could be loaded")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve sentence embeddings to ChatHarvard workers")
+    parser.add_argument("--address", default=os.getenv('EMBEDDING_SERVICE', DEFAULT_ADDRESS),
+                        help="unix:/path/to.sock or host:port")
+    parser.add_argument("--batch-window-ms", type=float, default=BATCH_WINDOW_MS,
+                        help="time to wait for more requests before encoding a batch")
+    parser.add_argument("--max-batch-size", type=int, default=MAX_BATCH_SIZE, help="texts per model call")
+    parser.add_argument("--cache-size", type=int, default=CACHE_SIZE, help="cached query embeddings (0 disables)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    os.environ.setdefault('TOKENIZERS_PARALLELISM', 'false')
+
+    server = create_server(load_model(), args.address, args.batch_window_ms, args.max_batch_size, args.cache_size)
+    logger.info(f"Embedding service listening on {args.address}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        family, bind_address = parse_address(args.address)
+        if family == socket.AF_UNIX and os.path.exists(bind_address):
+            os.unlink(bind_address)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+embedding_store.py - Validated Course Embedding Cache
+
+This module persists course embeddings between builds so only courses whose
+text changed are sent through the model again. The cache is a raw float32
+.npy matrix, loaded memory-mapped, plus a JSON manifest describing it:
+
+- format and text recipe versions
+- model id and embedding dimension
+- course ids, one per matrix row
+- a hash of the text each row was embedded from
+
+A cache written for another model, dimension or recipe is ignored. Rows are
+matched to courses by id and text hash, so a catalogue refresh re-embeds only
+new and edited courses.
+
+The manifest names the matrix file it describes and is replaced last, so a
+crash while saving leaves the previous cache intact. The previous matrix is
+kept until the next save, and a reader whose matrix disappeared after it read
+the manifest reads the manifest again.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import uuid
+from datetime import datetime
+from typing import List, Optional, Sequence, Tuple, Any
+
+import numpy as np
+
+logger = logging.getLogger("EmbeddingStore")
+
+STORE_VERSION = 1
+MANIFEST_FILE = "course_embeddings.json"
+MATRIX_PREFIX = "course_embeddings-"
+
+
+def text_hash(text: str) -> str:
+    """Short stable hash of an embedded text"""
+    return hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=8).hexdigest()
+
+
+class EmbeddingCache:
+    """Embeddings loaded from the cache, with the course id and text hash of every row"""
+
+    def __init__(self, embeddings: np.ndarray, course_ids: List[Any], hashes: List[str]):
+        self.embeddings = embeddings
+        self.course_ids = course_ids
+        self.hashes = hashes
+        self._rows = {(course_id, digest): row for row, (course_id, digest) in enumerate(zip(course_ids, hashes))}
+
+    def row(self, course_id: Any, digest: str) -> Optional[int]:
+        """Row holding the embedding of course_id for text with this hash, if cached"""
+        return self._rows.get((course_id, digest))
+
+
+def _read_manifest(cache_dir: str) -> Optional[dict]:
+    """The cache manifest, or None when there is no cache"""
+    manifest_file = os.path.join(cache_dir, MANIFEST_FILE)
+    if not os.path.exists(manifest_file):
+        return None
+    with open(manifest_file, 'r') as f:
+        return json.load(f)
+
+
+def load_embedding_cache(cache_dir: str, model_id: str, text_version: int,
+                         attempts: int = 3) -> Optional[EmbeddingCache]:
+    """Open the cache if it was written for this model and text recipe, else None"""
+    try:
+        for attempt in range(attempts):
+            manifest = _read_manifest(cache_dir)
+            if manifest is None:
+                return None
+
+            expected = {'version': STORE_VERSION, 'model_id': model_id, 'text_version': text_version}
+            mismatched = [key for key, value in expected.items() if manifest.get(key) != value]
+            if mismatched:
+                logger.info(f"Ignoring embedding cache: {', '.join(mismatched)} changed")
+                return None
+
+            try:
+                embeddings = np.load(os.path.join(cache_dir, manifest['matrix']), mmap_mode='r', allow_pickle=False)
+            except FileNotFoundError:
+                # Another process saved a newer cache and removed this matrix since the manifest was read
+                if attempt + 1 < attempts:
+                    continue
+                raise
+            course_ids, hashes = manifest['course_ids'], manifest['hashes']
+            if embeddings.shape != (len(course_ids), manifest['dimension']) or len(hashes) != len(course_ids):
+                logger.warning("Ignoring embedding cache: matrix does not match its manifest")
+                return None
+            return EmbeddingCache(embeddings, course_ids, hashes)
+    except Exception as e:
+        logger.error(f"Error loading embedding cache: {e}")
+        return None
+
+
+def save_embedding_cache(cache_dir: str, model_id: str, text_version: int, embeddings: np.ndarray,
+                         course_ids: Sequence[Any], hashes: Sequence[str]) -> bool:
+    """Write embeddings and their manifest, replacing the previous cache"""
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    matrix = f"{MATRIX_PREFIX}{uuid.uuid4().hex[:12]}.npy"
+    manifest = {
+        'version': STORE_VERSION,
+        'model_id': model_id,
+        'text_version': text_version,
+        'dimension': int(embeddings.shape[1]),
+        'matrix': matrix,
+        'created': datetime.now().isoformat(),
+        'course_ids': [course_id.item() if isinstance(course_id, np.generic) else course_id for course_id in course_ids],
+        'hashes': list(hashes)
+    }
+
+    try:
+        previous = _read_manifest(cache_dir)
+    except Exception:
+        previous = None
+    keep = {matrix, previous.get('matrix') if isinstance(previous, dict) else None}
+
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        np.save(os.path.join(cache_dir, matrix), embeddings, allow_pickle=False)
+        staging = os.path.join(cache_dir, f"{MANIFEST_FILE}.{os.getpid()}.tmp")
+        with open(staging, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(staging, os.path.join(cache_dir, MANIFEST_FILE))
+    except Exception as e:
+        logger.error(f"Error saving embedding cache: {e}")
+        return False
+
+    # Older matrices are no longer referenced (processes that mapped them keep their pages). The
+    # previous one stays until the next save for readers that read its manifest but have not opened it yet
+    for name in os.listdir(cache_dir):
+        if name.startswith(MATRIX_PREFIX) and name not in keep:
+            try:
+                os.remove(os.path.join(cache_dir, name))
+            except OSError:
+                pass
+    logger.info(f"Saved {len(embeddings)} course embeddings to {cache_dir}")
+    return True
+
+
+def reuse_embeddings(cache: Optional[EmbeddingCache], course_ids: Sequence[Any],
+                     hashes: Sequence[str]) -> Tuple[Optional[np.ndarray], np.ndarray]:
+    """Rows of a new embedding matrix filled from the cache
+
+    Returns (matrix, missing): matrix has one row per course with cached rows
+    copied in (None when nothing could be reused), and missing lists the
+    positions that still need to be embedded. When every course is cached in
+    the same order the read-only memory-mapped matrix itself is returned.
+    """
+    if cache is None:
+        return None, np.arange(len(course_ids))
+
+    rows = np.fromiter((-1 if (row := cache.row(course_id, digest)) is None else row
+                        for course_id, digest in zip(course_ids, hashes)), dtype=np.int64, count=len(course_ids))
+    if len(rows) == len(cache.course_ids) and np.array_equal(rows, np.arange(len(rows))):
+        # Unchanged catalogue: use the memory-mapped matrix as it is
+        return cache.embeddings, np.empty(0, dtype=np.int64)
+
+    reused = rows >= 0
+    if not reused.any():
+        return None, np.arange(len(course_ids))
+
+    matrix = np.empty((len(course_ids), cache.embeddings.shape[1]), dtype=np.float32)
+    matrix[reused] = cache.embeddings[rows[reused]]
+    return matrix, np.flatnonzero(~reused)
@@ -0,0 +1,202 @@
+"""
+filter_engine.py - Precompiled Course Filter Engine
+
+This module answers structured course filters (department, level, exact number,
+term, workload and Q score) by ANDing per-course bitmaps that are computed once
+when the course table is loaded, instead of rescanning the catalogue per query.
+"""
+
+from typing import Dict, List, Optional, Tuple, Iterable, Any
+
+import numpy as np
+
+from course_store import CourseTable, StringColumn
+
+
+class FilterEngine:
+    """Answers structured filters over a CourseTable with precomputed bitmaps"""
+
+    # Bound on memoized substring lookups (department and term strings)
+    MAX_CACHED_PATTERNS = 256
+
+    def __init__(self, table: CourseTable):
+        """Precompute bitmaps for the given course table"""
+        self.table = table
+        self.size = len(table)
+
+        # Packed bitmaps keyed by exact department code, level decade and term
+        self.dept_bitmaps = self._group_bitmaps(table.dept_codes, table.dept_vocab)
+        self.level_bitmaps = self._group_bitmaps(table.levels)
+        self.term_bitmaps = self._group_bitmaps(table.term_codes, table.term_vocab)
+
+        # Course numbers sorted once so number ranges become two binary searches
+        numbered = np.flatnonzero(table.course_numbers >= 0)
+        self._number_order = numbered[np.argsort(table.course_numbers[numbered], kind='stable')]
+        self._sorted_numbers = table.course_numbers[self._number_order]
+
+        # Distinct class tags, for "department appears in class tag" matching
+        tags = table.class_tags_upper
+        if isinstance(tags, StringColumn):
+            # Already dictionary-encoded in tables loaded from a snapshot
+            self._tag_vocab, self._tag_codes = tags.categories, tags.codes
+        else:
+            self._tag_vocab, self._tag_codes = np.unique(tags, return_inverse=True)
+
+        # Memoized substring lookups
+        self._dept_pattern_cache = {}
+        self._term_pattern_cache = {}
+
+        self._empty = np.packbits(np.zeros(self.size, dtype=bool))
+        self._full = np.packbits(np.ones(self.size, dtype=bool))
+
+    def _bitmap_from_rows(self, rows: np.ndarray) -> np.ndarray:
+        """Build a packed bitmap with the given rows set"""
+        mask = np.zeros(self.size, dtype=bool)
+        mask[rows] = True
+        return np.packbits(mask)
+
+    def _group_bitmaps(self, codes: np.ndarray, keys: Optional[List[Any]] = None) -> Dict[Any, np.ndarray]:
+        """Build one bitmap per distinct non-negative code"""
+        bitmaps = {}
+        valid = np.flatnonzero(codes >= 0)
+        if not len(valid):
+            return bitmaps
+        order = valid[np.argsort(codes[valid], kind='stable')]
+        boundaries = np.flatnonzero(np.diff(codes[order])) + 1
+        for group in np.split(order, boundaries):
+            code = int(codes[group[0]])
+            key = keys[code] if keys is not None else code
+            bitmaps[key] = self._bitmap_from_rows(group)
+        return bitmaps
+
+    def _remember(self, cache: Dict, key: str, bitmap: np.ndarray) -> np.ndarray:
+        """Store a memoized bitmap, resetting the cache when it grows too large"""
+        if len(cache) >= self.MAX_CACHED_PATTERNS:
+            cache.clear()
+        cache[key] = bitmap
+        return bitmap
+
+    # Bitmap builders
+
+    def dept_bitmap(self, dept: str, exact: bool = False) -> np.ndarray:
+        """Courses in a department
+
+        With exact=True the parsed department code must equal dept; otherwise dept
+        only has to appear in the class tag (case-insensitive).
+        """
+        needle = dept.upper()
+        if exact:
+            return self.dept_bitmaps.get(needle, self._empty)
+
+        cached = self._dept_pattern_cache.get(needle)
+        if cached is not None:
+            return cached
+
+        tag_codes = [code for code, tag in enumerate(self._tag_vocab) if needle in tag]
+        rows = np.flatnonzero(np.isin(self._tag_codes, tag_codes))
+        return self._remember(self._dept_pattern_cache, needle, self._bitmap_from_rows(rows))
+
+    def level_bitmap(self, level: int) -> np.ndarray:
+        """Courses in a level decade (e.g. 130 for 130-139)"""
+        return self.level_bitmaps.get(level, self._empty)
+
+    def number_range_bitmap(self, start: int, end: int) -> np.ndarray:
+        """Courses whose number lies in [start, end]"""
+        lo = np.searchsorted(self._sorted_numbers, start, side='left')
+        hi = np.searchsorted(self._sorted_numbers, end, side='right')
+        return self._bitmap_from_rows(self._number_order[lo:hi])
+
+    def term_bitmap(self, term: str) -> np.ndarray:
+        """Courses whose term contains the given string (case-insensitive)"""
+        needle = term.lower()
+        cached = self._term_pattern_cache.get(needle)
+        if cached is not None:
+            return cached
+
+        bitmap = self._empty
+        for value, term_bitmap in self.term_bitmaps.items():
+            if needle in value.lower():
+                bitmap = bitmap | term_bitmap
+        return self._remember(self._term_pattern_cache, needle, bitmap)
+
+    def max_hours_bitmap(self, max_hours: float, include_missing: bool = True) -> np.ndarray:
+        """Courses with mean hours of at most max_hours"""
+        return np.packbits(self.table.max_hours_mask(max_hours, include_missing=include_missing))
+
+    def min_score_bitmap(self, min_score: float, include_missing: bool = False) -> np.ndarray:
+        """Courses with an overall Q score of at least min_score"""
+        return np.packbits(self.table.min_score_mask(min_score, include_missing=include_missing))
+
+    def union(self, bitmaps: Iterable[np.ndarray]) -> np.ndarray:
+        """OR several bitmaps together"""
+        result = self._empty
+        for bitmap in bitmaps:
+            result = result | bitmap
+        return result
+
+    # Results
+
+    def mask(self, bitmap: np.ndarray) -> np.ndarray:
+        """Unpack a bitmap into a boolean mask over the table rows"""
+        return np.unpackbits(bitmap, count=self.size).astype(bool)
+
+    def rows(self, bitmap: np.ndarray) -> np.ndarray:
+        """Row positions (ascending) selected by a bitmap"""
+        return np.flatnonzero(np.unpackbits(bitmap, count=self.size))
+
+    def select(self,
+               departments: Optional[List[str]] = None,
+               exact_dept: bool = False,
+               levels: Optional[List[int]] = None,
+               course_levels: Optional[List[Tuple[int, int]]] = None,
+               terms: Optional[List[str]] = None,
+               max_hours: Optional[float] = None,
+               min_score: Optional[float] = None,
+               include_missing_hours: bool = True,
+               include_missing_score: bool = False) -> np.ndarray:
+        """Select row positions matching every given criterion
+
+        Values inside one criterion are ORed (any department, any level range,
+        any term); criteria are ANDed together. Criteria left as None are ignored.
+        """
+        bitmap = self._full
+
+        if departments:
+            bitmap = bitmap & self.union(self.dept_bitmap(dept, exact=exact_dept) for dept in departments)
+
+        if levels:
+            bitmap = bitmap & self.union(self.level_bitmap(level) for level in levels)
+
+        if course_levels:
+            bitmap = bitmap & self.union(self.number_range_bitmap(start, end) for start, end in course_levels)
+
+        if terms:
+            bitmap = bitmap & self.union(self.term_bitmap(term) for term in terms)
+
+        if max_hours is not None:
+            bitmap = bitmap & self.max_hours_bitmap(max_hours, include_missing=include_missing_hours)
+
+        if min_score is not None:
+            bitmap = bitmap & self.min_score_bitmap(min_score, include_missing=include_missing_score)
+
+        return self.rows(bitmap)
+
+    def match_query_rows(self, query_info: Dict, departments: Optional[List[str]] = None) -> np.ndarray:
+        """Row positions matching the structured parts of a query
+
+        Departments default to those in query_info. Courses without workload or
+        score data do not pass the max_hours and min_score constraints.
+        """
+        constraints = query_info.get("constraints", {})
+        return self.select(
+            departments=departments if departments is not None else query_info.get("departments"),
+            course_levels=query_info.get("course_levels"),
+            terms=query_info.get("terms"),
+            max_hours=constraints.get("max_hours"),
+            min_score=constraints.get("min_score"),
+            include_missing_hours=False
+        )
+
+    def match_query(self, query_info: Dict, departments: Optional[List[str]] = None) -> np.ndarray:
+        """Course IDs (in catalogue order) matching the structured parts of a query"""
+        return self.table.course_ids[self.match_query_rows(query_info, departments)]
@@ -43,6 +43,56 @@ const sanitizeForJSON = (obj) => {
   return result;
 };
 
+/**
+ * Sends a chat message and reads the reply as a server-sent event stream
+ * @param {string} message - The user's message
+ * @param {Function} onDelta - Called with the reply text received so far
+ * @returns {Object} - The final { response, history } payload
+ */
+const streamChatMessage = async (message, onDelta) => {
+  const token = localStorage.getItem('token');
+  const res = await fetch(`${axios.defaults.baseURL || ''}/api/chat/message`, {
+    method: 'POST',
+    credentials: 'include',
+    headers: {
+      'Content-Type': 'application/json',
+      Accept: 'text/event-stream',
+      ...(token ? { Authorization: `Bearer ${token}` } : {}),
+    },
+    body: JSON.stringify({ message }),
+  });
+  if (!res.ok || !res.body) throw new Error(`Chat request failed with status ${res.status}`);
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  let text = '';
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    // Events are separated by a blank line; keep any partial event for the next read
+    const events = buffer.split('\n\n');
+    buffer = events.pop();
+    for (const raw of events) {
+      const event = raw.match(/^event: (.*)$/m)?.[1];
+      const data = raw.match(/^data: (.*)$/m)?.[1];
+      if (!event || data === undefined) continue;
+      const payload = JSON.parse(data);
+      if (event === 'delta') {
+        text += payload.text;
+        onDelta(text);
+      } else if (event === 'done') {
+        return payload;
+      } else if (event === 'error') {
+        throw new Error(payload.error);
+      }
+    }
+  }
+  throw new Error('Chat stream ended early');
+};
+
 function Chat() {
   const navigate = useNavigate();
   const [messages, setMessages] = useState([]);
@@ -174,9 +224,12 @@ const sanitizeForJSON = (obj) => {
         }
       }
 
-      // Get the AI response
-      const response = await axios.post('/api/chat/message', { message: userMessage });
-      let updated = response.data.history;
+      // Get the AI response, showing it as it streams in
+      setMessages(prev => [...prev, { role: 'assistant', content: '' }]);
+      const response = await streamChatMessage(userMessage, (text) => {
+        setMessages(prev => [...prev.slice(0, -1), { role: 'assistant', content: text }]);
+      });
+      let updated = response.history;
 
       // Handle comparison request
       if (userMessage.toLowerCase().includes('compare')) {
@@ -200,7 +253,7 @@ const sanitizeForJSON = (obj) => {
       setMessages(updated);
     } catch (err) {
       console.error(err);
-      setMessages(prev => [...prev, { 
+      setMessages(prev => [...prev.filter(msg => msg.role !== 'assistant' || msg.content), { 
         role: 'assistant', 
         content: 'Sorry, I ran into an error. Try again!' 
       }]);
@@ -0,0 +1,88 @@
+"""
+fusion.py - Hybrid Result Fusion
+
+This module merges ranked lists from several retrievers (semantic vector search
+and BM25 keyword search) into one ranking. Two fusion methods are supported:
+
+- rrf:    reciprocal rank fusion, sum of weight / (rrf_k + rank)
+- linear: weighted sum of per-retriever scores normalized with min-max or z-score
+
+Only the best top_k fused results are kept (bounded heap), and each result
+carries its per-retriever rank and scores so callers can rerank with them.
+"""
+
+import heapq
+from typing import Dict, List, Optional, Tuple, Any
+
+import numpy as np
+
+FUSION_METHODS = ('rrf', 'linear')
+NORMALIZATIONS = ('minmax', 'zscore')
+
+# Standard RRF constant: dampens the advantage of the very first ranks
+DEFAULT_RRF_K = 60
+
+
+def normalize_scores(scores: np.ndarray, method: str = 'minmax') -> np.ndarray:
+    """Put one retriever's scores on a common scale
+
+    min-max maps to [0, 1] (all 1.0 when every score is equal); z-score centres
+    on the mean in units of standard deviation (all 0.0 when there is no spread).
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    if len(scores) == 0:
+        return scores
+    if method == 'minmax':
+        low, high = scores.min(), scores.max()
+        if high == low:
+            return np.ones_like(scores)
+        return (scores - low) / (high - low)
+    if method == 'zscore':
+        std = scores.std()
+        if std == 0:
+            return np.zeros_like(scores)
+        return (scores - scores.mean()) / std
+    raise ValueError(f"Unknown score normalization '{method}', expected one of {NORMALIZATIONS}")
+
+
+def fuse_results(components: Dict[str, Tuple[np.ndarray, np.ndarray]],
+                 top_k: int,
+                 method: str = 'rrf',
+                 weights: Optional[Dict[str, float]] = None,
+                 normalization: str = 'minmax',
+                 rrf_k: int = DEFAULT_RRF_K) -> List[Dict[str, Any]]:
+    """
+    Fuse ranked (course_ids, scores) lists, best first, into the top_k results
+
+    Args:
+        components: Retriever name to (course_ids, scores), each ordered best first
+        top_k: Number of fused results to keep
+        method: 'rrf' or 'linear'
+        weights: Retriever name to weight (default 1.0 each)
+        normalization: Score normalization for linear fusion, 'minmax' or 'zscore'
+        rrf_k: Rank constant for reciprocal rank fusion
+
+    Returns:
+        List of {'course_id', 'score', 'components'} ordered by fused score, where
+        components maps each retriever that returned the course to its
+        {'rank' (1-based), 'score' (raw), 'normalized'} values. Ties keep the order
+        in which courses were first returned.
+    """
+    if method not in FUSION_METHODS:
+        raise ValueError(f"Unknown fusion method '{method}', expected one of {FUSION_METHODS}")
+    weights = weights or {}
+
+    fused: Dict[int, Dict[str, Any]] = {}
+    for name, (course_ids, scores) in components.items():
+        weight = weights.get(name, 1.0)
+        normalized = normalize_scores(scores, normalization)
+        for rank, (course_id, score, norm) in enumerate(zip(course_ids, scores, normalized), start=1):
+            course_id = int(course_id)
+            entry = fused.get(course_id)
+            if entry is None:
+                entry = fused[course_id] = {'course_id': course_id, 'score': 0.0, 'components': {}}
+            entry['components'][name] = {'rank': rank, 'score': float(score), 'normalized': float(norm)}
+            entry['score'] += weight / (rrf_k + rank) if method == 'rrf' else weight * float(norm)
+
+    # Bounded heap selection; nlargest keeps input order among equal scores
+    return heapq.nlargest(top_k, fused.values(), key=lambda entry: entry['score'])
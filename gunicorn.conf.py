@@ -0,0 +1,84 @@
+"""
+gunicorn.conf.py - Multi-worker Server Configuration
+
+Runs ChatHarvard with several worker processes that share one copy of the
+course data. The master builds the database snapshot once before forking;
+every worker then memory-maps that snapshot read-only, so course columns,
+embeddings, the vector index and the BM25 postings are shared through the OS
+page cache. Only the embedding model and small lookup tables are per worker.
+
+With EMBEDDING_SERVICE set (e.g. unix:/tmp/chatharvard-embeddings.sock) the
+master also starts embedding_service.py at that address, so the model is
+loaded once and workers send it batched encode requests instead. Set
+EMBEDDING_SERVICE_AUTOSTART=false when the service is run separately.
+
+Workers write their metrics to METRICS_DIR (a temporary directory unless set)
+so that /metrics reports all workers, whichever one answers the scrape. The
+server binds to 0.0.0.0, so set METRICS_TOKEN in production: without it
+/metrics is served to loopback clients only.
+
+Usage:
+    gunicorn -c gunicorn.conf.py app:app
+"""
+
+import glob
+import os
+import subprocess
+import sys
+import tempfile
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5050')}"
+workers = int(os.getenv('WEB_CONCURRENCY', '4'))
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+EMBEDDING_SERVICE = os.getenv('EMBEDDING_SERVICE')
+EMBEDDING_SERVICE_AUTOSTART = os.getenv('EMBEDDING_SERVICE_AUTOSTART', 'true').lower() != 'false'
+
+# Set before the app is imported so every worker shares the directory
+METRICS_DIR = os.environ.setdefault('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'chatharvard-metrics'))
+
+_embedding_process = None
+
+
+def _start_embedding_service(server):
+    """Run the shared embedding service and wait until it answers"""
+    global _embedding_process
+    from embedding_service import wait_for_service
+
+    _embedding_process = subprocess.Popen([sys.executable, os.path.join(BASE_DIR, "embedding_service.py"),
+                                           "--address", EMBEDDING_SERVICE], cwd=BASE_DIR)
+    if not wait_for_service(EMBEDDING_SERVICE):
+        server.log.warning("Embedding service did not start, workers will load the model themselves")
+
+
+def on_starting(server):
+    """Start the embedding service, then build the snapshot in a separate process so the master stays small"""
+    # Metrics of a previous server run would otherwise be merged into this one's
+    for path in glob.glob(os.path.join(METRICS_DIR, "metrics-*.json")):
+        os.remove(path)
+
+    if EMBEDDING_SERVICE and EMBEDDING_SERVICE_AUTOSTART:
+        _start_embedding_service(server)
+
+    script = "import sys, app; sys.exit(0 if app.prepare_database_snapshot() else 1)"
+    result = subprocess.run([sys.executable, "-c", script], cwd=BASE_DIR)
+    if result.returncode != 0:
+        server.log.warning("Could not prepare the database snapshot, workers will load the data files")
+
+
+def post_worker_init(worker):
+    """Load the database when the worker boots rather than on its first request"""
+    from app import initialize_database
+    initialize_database()
+
+
+def on_exit(server):
+    """Stop the embedding service started by on_starting"""
+    if _embedding_process is not None and _embedding_process.poll() is None:
+        _embedding_process.terminate()
+        try:
+            _embedding_process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            _embedding_process.kill()
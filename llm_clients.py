@@ -0,0 +1,183 @@
+"""
+llm_clients.py - Pooled LLM API Clients
+
+Building an Anthropic or OpenAI client loads certificates and creates a new
+HTTP connection pool, so a client per message pays for that setup plus a fresh
+TCP and TLS handshake every time. This module keeps one client per provider
+and API key and hands it out to every request using that key, so requests
+reuse the client's kept-alive connections.
+
+Clients are keyed by provider, sync/async flavour and a SHA-256 hash of the key
+(raw keys are never used as dictionary keys or logged). The pool is bounded
+(least recently used clients are evicted first), clients idle for longer than
+the idle timeout are closed, and all access is thread-safe. A client that is
+evicted while a request is still using it is closed when that request is done.
+
+Async clients are bound to the event loop they were first used on (see
+llm_stream.py) and are closed on that loop.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+import anthropic
+import openai
+
+logger = logging.getLogger("LLMClients")
+
+# Default bounds of the client pool
+CLIENT_POOL_SIZE = 64
+CLIENT_IDLE_SECONDS = 300
+
+_CLIENT_CLASSES = {
+    ('anthropic', False): anthropic.Anthropic,
+    ('anthropic', True): anthropic.AsyncAnthropic,
+    ('openai', False): openai.OpenAI,
+    ('openai', True): openai.AsyncOpenAI
+}
+
+
+def key_hash(api_key: str) -> str:
+    """Hash identifying an API key without keeping it as a lookup key"""
+    return hashlib.sha256((api_key or '').encode()).hexdigest()
+
+
+class _PooledClient:
+    __slots__ = ('client', 'loop', 'last_used', 'leases', 'evicted')
+
+    def __init__(self, client: Any, loop: Optional[asyncio.AbstractEventLoop]):
+        self.client = client
+        self.loop = loop
+        self.last_used = time.monotonic()
+        self.leases = 0
+        self.evicted = False
+
+
+class ClientPool:
+    """Bounded, thread-safe pool of LLM clients keyed by provider and hashed API key"""
+
+    def __init__(self, max_size: int = CLIENT_POOL_SIZE, idle_seconds: float = CLIENT_IDLE_SECONDS):
+        self.max_size = max_size
+        self.idle_seconds = idle_seconds
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @contextmanager
+    def lease(self, provider: str, api_key: str, asynchronous: bool = False) -> Iterator[Any]:
+        """Client for provider and api_key, reused across requests while the block runs
+
+        Async clients must be leased from a coroutine running on the loop that will use them.
+        """
+        if (provider, asynchronous) not in _CLIENT_CLASSES:
+            raise ValueError(f"Unknown LLM provider: {provider}")
+        key = (provider, asynchronous, key_hash(api_key))
+
+        entry = self._checkout(key)
+        if entry is None:
+            client = _CLIENT_CLASSES[(provider, asynchronous)](api_key=api_key)
+            loop = asyncio.get_running_loop() if asynchronous else None
+            entry = self._add(key, _PooledClient(client, loop))
+        try:
+            yield entry.client
+        finally:
+            self._release(entry)
+
+    def _checkout(self, key) -> Optional[_PooledClient]:
+        with self._lock:
+            self._reset_after_fork()
+            self._evict_idle()
+            entry = self._clients.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            entry.leases += 1
+            self._clients.move_to_end(key)
+            return entry
+
+    def _add(self, key, entry: _PooledClient) -> _PooledClient:
+        """Store a new client, or lease the one another thread stored meanwhile"""
+        with self._lock:
+            existing = self._clients.get(key)
+            if existing is not None:
+                existing.leases += 1
+                duplicate, entry = entry, existing
+            else:
+                duplicate = None
+                entry.leases = 1
+                self._clients[key] = entry
+                while len(self._clients) > self.max_size:
+                    self._evict(next(iter(self._clients)))
+        if duplicate is not None:
+            _close(duplicate)
+        return entry
+
+    def _release(self, entry: _PooledClient) -> None:
+        with self._lock:
+            entry.leases -= 1
+            entry.last_used = time.monotonic()
+            close = entry.evicted and entry.leases == 0
+        if close:
+            _close(entry)
+
+    def _evict(self, key) -> None:
+        """Drop a client from the pool (caller holds the lock); close it once no request uses it"""
+        entry = self._clients.pop(key)
+        entry.evicted = True
+        self.evictions += 1
+        if entry.leases == 0:
+            _close(entry)
+
+    def _evict_idle(self) -> None:
+        cutoff = time.monotonic() - self.idle_seconds
+        for key in [key for key, entry in self._clients.items() if entry.leases == 0 and entry.last_used < cutoff]:
+            self._evict(key)
+
+    def _reset_after_fork(self) -> None:
+        """Forget clients inherited from a parent process; their connections belong to the parent"""
+        if self._pid != os.getpid():
+            self._clients = OrderedDict()
+            self._pid = os.getpid()
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in list(self._clients):
+                self._evict(key)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'clients': len(self._clients),
+                'in_use': sum(entry.leases > 0 for entry in self._clients.values()),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+
+def _close(entry: _PooledClient) -> None:
+    try:
+        if entry.loop is None:
+            entry.client.close()
+        elif not entry.loop.is_closed():
+            asyncio.run_coroutine_threadsafe(entry.client.close(), entry.loop)
+    except Exception as e:
+        logger.warning(f"Error closing LLM client: {e}")
+
+
+client_pool = ClientPool(
+    max_size=int(os.getenv('LLM_CLIENT_POOL_SIZE', CLIENT_POOL_SIZE)),
+    idle_seconds=float(os.getenv('LLM_CLIENT_IDLE_SECONDS', CLIENT_IDLE_SECONDS))
+)
@@ -0,0 +1,112 @@
+"""
+llm_stream.py - Streaming LLM Responses
+
+This module streams chat completions from Anthropic or OpenAI token by token
+with their async clients, so a response can be forwarded to the browser as soon
+as the model starts generating instead of after the whole answer is done.
+
+Flask views are synchronous, so every stream runs on one background asyncio
+event loop per process and is handed back to the request thread as a plain
+iterator. Closing the iterator (e.g. when the browser disconnects) cancels the
+upstream request.
+
+The SDKs read ANTHROPIC_BASE_URL and OPENAI_BASE_URL, which is how the local
+stub server in benchmarks/stub_llm.py is substituted for the real APIs.
+Async clients come from the shared pool in llm_clients.py, so streams for the
+same API key reuse kept-alive connections.
+"""
+
+import asyncio
+import logging
+import os
+import queue
+import threading
+from typing import AsyncIterator, Callable, Dict, Iterator, List
+
+from llm_clients import client_pool
+
+logger = logging.getLogger("LLMStream")
+
+_DONE = object()
+
+_loop = None
+_loop_pid = None
+_loop_lock = threading.Lock()
+
+
+def event_loop() -> asyncio.AbstractEventLoop:
+    """The process-wide event loop running LLM streams, started on first use (and again after a fork)"""
+    global _loop, _loop_pid
+    with _loop_lock:
+        if _loop is None or _loop_pid != os.getpid() or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+            _loop_pid = os.getpid()
+            threading.Thread(target=_loop.run_forever, name="llm-stream-loop", daemon=True).start()
+        return _loop
+
+
+def iterate_in_loop(stream_factory: Callable[[], AsyncIterator[str]]) -> Iterator[str]:
+    """Run an async iterator on the shared event loop and yield its items in the calling thread"""
+    items = queue.Queue()
+
+    async def pump():
+        try:
+            async for item in stream_factory():
+                items.put((item, None))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            items.put((None, e))
+        else:
+            items.put((_DONE, None))
+
+    future = asyncio.run_coroutine_threadsafe(pump(), event_loop())
+    try:
+        while True:
+            item, error = items.get()
+            if error is not None:
+                raise error
+            if item is _DONE:
+                return
+            yield item
+    finally:
+        future.cancel()
+
+
+async def _anthropic_stream(api_key: str, model: str, system_prompt: str, messages: List[Dict],
+                            max_tokens: int) -> AsyncIterator[str]:
+    with client_pool.lease('anthropic', api_key, asynchronous=True) as client:
+        async with client.messages.stream(model=model, max_tokens=max_tokens, system=system_prompt,
+                                          messages=messages) as stream:
+            async for text in stream.text_stream:
+                yield text
+
+
+async def _openai_stream(api_key: str, model: str, system_prompt: str, messages: List[Dict],
+                         max_tokens: int) -> AsyncIterator[str]:
+    with client_pool.lease('openai', api_key, asynchronous=True) as client:
+        stream = await client.chat.completions.create(
+            model=model,
+            messages=[{"role": "system", "content": system_prompt}] + messages,
+            max_tokens=max_tokens,
+            stream=True
+        )
+        async with stream:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+
+
+_PROVIDER_STREAMS = {
+    'anthropic': _anthropic_stream,
+    'openai': _openai_stream
+}
+
+
+def stream_chat(provider: str, api_key: str, model: str, system_prompt: str, messages: List[Dict],
+                max_tokens: int) -> Iterator[str]:
+    """Text deltas of a chat completion, yielded as the model produces them"""
+    if provider not in _PROVIDER_STREAMS:
+        raise ValueError(f"Unknown LLM provider: {provider}")
+    stream = _PROVIDER_STREAMS[provider]
+    return iterate_in_loop(lambda: stream(api_key, model, system_prompt, messages, max_tokens))
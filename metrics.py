@@ -0,0 +1,329 @@
+"""
+metrics.py - Pipeline Latency Metrics in Prometheus Format
+
+This module keeps counters, gauges and latency histograms for the chat
+pipeline and renders them in the Prometheus text exposition format for the
+/metrics endpoint. It has no dependencies beyond the standard library.
+
+Under gunicorn every worker keeps its own metrics. When METRICS_DIR is set
+(gunicorn.conf.py sets it), each process periodically writes its metrics to a
+file in that directory and /metrics merges the files of all workers: counters
+and histograms are summed (including those of workers that have exited), while
+gauges are reported per live worker with a pid label.
+
+The well-known pipeline metrics are defined at the bottom of this module:
+
+- chatharvard_stage_duration_seconds{stage}: stages of a chat request
+- chatharvard_search_duration_seconds{operation}: HarvardDatabase search steps
+- chatharvard_llm_request_duration_seconds{provider,mode}: LLM calls
+- chatharvard_llm_first_token_seconds{provider}: time to first streamed token
+- chatharvard_context_tokens: estimated size of the LLM context
+- chatharvard_chat_requests_total{mode,status}: chat requests served
+- chatharvard_cache_*{cache}: shared cache statistics (see cache.py)
+"""
+
+import atexit
+import bisect
+import json
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from cache import cache_stats
+
+logger = logging.getLogger("Metrics")
+
+# Latency buckets in seconds, from sub-millisecond lookups to full LLM generations
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_BUCKETS = (250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+
+# Seconds between writes of a worker's metrics to METRICS_DIR
+FLUSH_SECONDS = 1.0
+
+# Rough size of a token for context size estimates
+CHARS_PER_TOKEN = 4
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, registry: 'MetricsRegistry', name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def values(self) -> Dict[Tuple[str, ...], Any]:
+        with self._lock:
+            return {key: list(value) if isinstance(value, list) else value for key, value in self._values.items()}
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+        self.registry.touch()
+
+    def set(self, value: float, **labels) -> None:
+        """Set the total directly (for counters mirrored from another source)"""
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, registry, name, documentation, labelnames=(), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        slot = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            # Per-bucket counts (the last slot is +Inf), then the sum
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0] * (len(self.buckets) + 2)
+            counts[slot] += 1
+            counts[-1] += value
+        self.registry.touch()
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the block in seconds"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+
+class MetricsRegistry:
+    """Metrics of this process, merged with those of sibling workers when a directory is set"""
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._last_flush = 0.0
+        self._dirty = False
+
+    def _register(self, cls, name: str, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(self, name, *args, **kwargs)
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, documentation, labelnames, buckets)
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        """Register a function that updates metrics from another source just before they are exported"""
+        self._collectors.append(collector)
+
+    def _collect(self) -> Dict[str, Dict[str, Any]]:
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception as e:
+                logger.warning(f"Metrics collector failed: {e}")
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {
+            metric.name: {
+                'kind': metric.kind,
+                'documentation': metric.documentation,
+                'labelnames': list(metric.labelnames),
+                'buckets': list(getattr(metric, 'buckets', ())),
+                'values': [[list(key), value] for key, value in metric.values().items()]
+            }
+            for metric in metrics
+        }
+
+    def touch(self) -> None:
+        """Note new observations; writes them to the metrics directory at most every FLUSH_SECONDS"""
+        self._dirty = True
+        if self.directory and time.monotonic() - self._last_flush >= FLUSH_SECONDS:
+            self.flush(wait=False)
+
+    def flush(self, wait: bool = True) -> None:
+        """Write this process's metrics to the metrics directory (skipped if another thread is writing and not wait)"""
+        if not self.directory or not self._flush_lock.acquire(blocking=wait):
+            return
+        try:
+            self._last_flush = time.monotonic()
+            self._dirty = False
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f"metrics-{os.getpid()}.json")
+            staging = f"{path}.tmp"
+            with open(staging, 'w') as f:
+                json.dump(self._collect(), f)
+            os.replace(staging, path)
+        except Exception as e:
+            logger.warning(f"Error writing metrics: {e}")
+        finally:
+            self._flush_lock.release()
+
+    def flush_if_dirty(self) -> None:
+        if self._dirty:
+            self.flush()
+
+    def _process_states(self) -> List[Tuple[Optional[int], Dict[str, Any]]]:
+        """(pid, metrics) of this process and, with a directory, of every worker that wrote metrics"""
+        if not self.directory:
+            return [(None, self._collect())]
+
+        self.flush()
+        states = []
+        for name in os.listdir(self.directory):
+            if not (name.startswith("metrics-") and name.endswith(".json")):
+                continue
+            try:
+                with open(os.path.join(self.directory, name), 'r') as f:
+                    states.append((int(name[len("metrics-"):-len(".json")]), json.load(f)))
+            except (OSError, ValueError):
+                continue
+        return states
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        families = {}
+        for pid, state in self._process_states():
+            live = pid is None or pid == os.getpid() or _pid_alive(pid)
+            for name, family in state.items():
+                merged = families.setdefault(name, dict(family, values={}))
+                for key, value in family['values']:
+                    if family['kind'] == 'gauge':
+                        # Gauges describe a live process, so they are reported per worker
+                        if not live:
+                            continue
+                        if pid is not None:
+                            key = key + [str(pid)]
+                        merged['values'][tuple(key)] = value
+                    elif tuple(key) in merged['values']:
+                        previous = merged['values'][tuple(key)]
+                        merged['values'][tuple(key)] = ([a + b for a, b in zip(previous, value)]
+                                                        if isinstance(value, list) else previous + value)
+                    else:
+                        merged['values'][tuple(key)] = value
+                if family['kind'] == 'gauge' and pid is not None:
+                    merged['labelnames'] = family['labelnames'] + ['pid']
+
+        lines = []
+        for name, family in families.items():
+            lines.append(f"# HELP {name} {family['documentation']}")
+            lines.append(f"# TYPE {name} {family['kind']}")
+            for key, value in sorted(family['values'].items()):
+                labels = list(zip(family['labelnames'], key))
+                if family['kind'] != 'histogram':
+                    lines.append(f"{name}{_labels(labels)} {_number(value)}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(list(family['buckets']) + [math.inf], value[:-1]):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_labels(labels + [('le', _number(bound))])} {cumulative}")
+                lines.append(f"{name}_sum{_labels(labels)} {_number(value[-1])}")
+                lines.append(f"{name}_count{_labels(labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+
+def _labels(labels: List[Tuple[str, str]]) -> str:
+    if not labels:
+        return ""
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + "}"
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count of a prompt (about four characters per token)"""
+    return math.ceil(len(text or "") / CHARS_PER_TOKEN)
+
+
+def observe_timings(timings: Dict[str, float], prefix: str = "") -> None:
+    """Record a dict of stage durations in milliseconds (see pipeline.py) as stage spans"""
+    for stage, ms in timings.items():
+        STAGE_SECONDS.observe(ms / 1000, stage=f"{prefix}{stage}")
+
+
+registry = MetricsRegistry(os.getenv('METRICS_DIR') or None)
+atexit.register(registry.flush_if_dirty)
+
+STAGE_SECONDS = registry.histogram(
+    "chatharvard_stage_duration_seconds", "Time spent in each stage of a chat request", ["stage"])
+SEARCH_SECONDS = registry.histogram(
+    "chatharvard_search_duration_seconds", "Time spent in HarvardDatabase search operations", ["operation"])
+LLM_SECONDS = registry.histogram(
+    "chatharvard_llm_request_duration_seconds", "Duration of LLM calls until the full answer", ["provider", "mode"])
+LLM_FIRST_TOKEN_SECONDS = registry.histogram(
+    "chatharvard_llm_first_token_seconds", "Time from a streamed LLM call to its first token", ["provider"])
+CONTEXT_TOKENS = registry.histogram(
+    "chatharvard_context_tokens", "Estimated size of the LLM prompt context in tokens", buckets=TOKEN_BUCKETS)
+CHAT_REQUESTS = registry.counter(
+    "chatharvard_chat_requests_total", "Chat messages answered", ["mode", "status"])
+
+_CACHE_HITS = registry.counter("chatharvard_cache_hits_total", "Shared cache hits", ["cache"])
+_CACHE_MISSES = registry.counter("chatharvard_cache_misses_total", "Shared cache misses", ["cache"])
+_CACHE_EVICTIONS = registry.counter("chatharvard_cache_evictions_total", "Shared cache evictions", ["cache"])
+_CACHE_HIT_RATIO = registry.gauge("chatharvard_cache_hit_ratio", "Shared cache hit ratio since start", ["cache"])
+_CACHE_ENTRIES = registry.gauge("chatharvard_cache_entries", "Entries held by a shared cache", ["cache"])
+_CACHE_BYTES = registry.gauge("chatharvard_cache_bytes", "Estimated bytes held by a shared cache", ["cache"])
+
+
+def _collect_cache_stats() -> None:
+    for name, stats in cache_stats().items():
+        _CACHE_HITS.set(stats['hits'], cache=name)
+        _CACHE_MISSES.set(stats['misses'], cache=name)
+        _CACHE_EVICTIONS.set(stats['evictions'], cache=name)
+        _CACHE_HIT_RATIO.set(stats['hit_rate'], cache=name)
+        _CACHE_ENTRIES.set(stats['entries'], cache=name)
+        _CACHE_BYTES.set(stats['bytes'], cache=name)
+
+
+registry.add_collector(_collect_cache_stats)
@@ -0,0 +1,87 @@
+"""
+pipeline.py - Concurrent Pipeline Stages
+
+This module runs independent stages of the chat retrieval pipeline (e.g. the
+course finder and the recommender, or the finder's structured and semantic
+searches) on a shared thread pool and records how long each stage took. NumPy,
+FAISS and the BM25 postings release the GIL for most of their work, so vector
+search, keyword scoring and bitmap filtering overlap in practice.
+
+Stage groups may be nested: a stage can itself run a group of stages. The
+calling thread never just waits for a stage that has not started yet; it runs
+that stage itself, so nested groups cannot exhaust the pool and deadlock.
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Tuple
+
+logger = logging.getLogger("Pipeline")
+
+# Default size of the shared stage thread pool
+PIPELINE_WORKERS = 8
+
+
+class PipelineExecutor:
+    """Runs groups of independent, named stages concurrently"""
+
+    def __init__(self, max_workers: int = PIPELINE_WORKERS):
+        self.max_workers = max_workers
+        self._pool = None
+        self._pool_pid = None
+        self._lock = threading.Lock()
+
+    def _executor(self) -> ThreadPoolExecutor:
+        # Threads do not survive a fork, so each worker process gets its own pool
+        with self._lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="pipeline")
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def run(self, stages: Dict[str, Callable[[], Any]]) -> Tuple[Dict[str, Any], Dict[str, float]]:
+        """Run the stages concurrently; returns (result by stage name, milliseconds by stage name)
+
+        The first stage runs in the calling thread. If a stage fails, its
+        exception is raised once every started stage has finished.
+        """
+        timings = {}
+
+        def timed(name, stage):
+            start = time.perf_counter()
+            try:
+                return stage()
+            finally:
+                timings[name] = (time.perf_counter() - start) * 1000
+
+        names = list(stages)
+        if self.max_workers <= 1 or len(names) <= 1:
+            return {name: timed(name, stages[name]) for name in names}, timings
+
+        executor = self._executor()
+        futures = {name: executor.submit(timed, name, stages[name]) for name in names[1:]}
+        outcomes = {}
+        try:
+            outcomes[names[0]] = (timed(names[0], stages[names[0]]), None)
+        except Exception as e:
+            outcomes[names[0]] = (None, e)
+
+        for name, future in futures.items():
+            try:
+                # Run stages the pool has not started yet here instead of waiting for a free thread
+                result = timed(name, stages[name]) if future.cancel() else future.result()
+                outcomes[name] = (result, None)
+            except Exception as e:
+                outcomes[name] = (None, e)
+
+        for name in names:
+            error = outcomes[name][1]
+            if error is not None:
+                raise error
+        return {name: outcomes[name][0] for name in names}, {name: timings[name] for name in names}
+
+
+pipeline_executor = PipelineExecutor(max_workers=int(os.getenv('PIPELINE_WORKERS', PIPELINE_WORKERS)))
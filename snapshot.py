@@ -0,0 +1,147 @@
+"""
+snapshot.py - Persistent Database Snapshots
+
+This module stores a fully processed database on disk so a worker can boot by
+memory-mapping arrays instead of re-reading and re-processing the CSV files.
+A snapshot is a directory holding one .npy file per array, optional raw files
+written by other libraries (e.g. a FAISS index), a pickled metadata blob and a
+JSON manifest, keyed by a content hash of the input files.
+
+Snapshot files are never modified once written, so any number of worker
+processes can map the same snapshot read-only and share its pages through the
+OS page cache instead of each holding a private copy.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import pickle
+import shutil
+import tempfile
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple, Any
+
+import numpy as np
+
+logger = logging.getLogger("Snapshot")
+
+# Bump whenever the layout or the meaning of stored data changes
+SNAPSHOT_VERSION = 2
+
+MANIFEST_FILE = "manifest.json"
+META_FILE = "meta.pkl"
+ARRAYS_DIR = "arrays"
+FILES_DIR = "files"
+
+
+def compute_content_hash(paths: List[str], chunk_size: int = 1 << 20) -> str:
+    """Hash the contents of the input files (in order) together with the snapshot version"""
+    digest = hashlib.sha256()
+    digest.update(f"snapshot-v{SNAPSHOT_VERSION}".encode())
+    for path in paths:
+        digest.update(os.path.basename(path).encode())
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def snapshot_path(snapshot_dir: str, content_hash: str) -> str:
+    """Directory holding the snapshot for a given content hash"""
+    return os.path.join(snapshot_dir, f"v{SNAPSHOT_VERSION}-{content_hash[:16]}")
+
+
+def has_snapshot(snapshot_dir: str, content_hash: str) -> bool:
+    """Whether a complete snapshot exists for a content hash"""
+    return os.path.exists(os.path.join(snapshot_path(snapshot_dir, content_hash), MANIFEST_FILE))
+
+
+def write_snapshot(snapshot_dir: str, content_hash: str, arrays: Dict[str, np.ndarray], meta: Dict[str, Any],
+                   files: Optional[Dict[str, Callable[[str], None]]] = None) -> str:
+    """Write arrays and metadata as a snapshot, replacing any previous one atomically
+
+    files maps a name to a writer called with the path to write that file to.
+    """
+    os.makedirs(snapshot_dir, exist_ok=True)
+    target = snapshot_path(snapshot_dir, content_hash)
+    staging = tempfile.mkdtemp(prefix=".snapshot-", dir=snapshot_dir)
+
+    try:
+        os.makedirs(os.path.join(staging, ARRAYS_DIR))
+        for name, array in arrays.items():
+            array = np.asarray(array)
+            if array.dtype == object:
+                raise ValueError(f"Array {name} has object dtype and cannot be memory-mapped")
+            np.save(os.path.join(staging, ARRAYS_DIR, f"{name}.npy"), array, allow_pickle=False)
+
+        files = files or {}
+        os.makedirs(os.path.join(staging, FILES_DIR))
+        for name, writer in files.items():
+            writer(os.path.join(staging, FILES_DIR, name))
+
+        with open(os.path.join(staging, META_FILE), 'wb') as f:
+            pickle.dump(meta, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        manifest = {
+            "version": SNAPSHOT_VERSION,
+            "content_hash": content_hash,
+            "created": datetime.now().isoformat(),
+            "arrays": sorted(arrays.keys()),
+            "files": sorted(files.keys())
+        }
+        with open(os.path.join(staging, MANIFEST_FILE), 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+        # Swap the finished directory into place
+        if os.path.exists(target):
+            shutil.rmtree(target)
+        os.replace(staging, target)
+        logger.info(f"Wrote snapshot {target} with {len(arrays)} arrays")
+        return target
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+
+def read_snapshot(snapshot_dir: str, content_hash: str) -> Optional[Tuple[Dict[str, np.ndarray], Dict[str, Any], Dict[str, str]]]:
+    """Open a snapshot, memory-mapping its arrays; returns None when missing or stale
+
+    Returns (arrays, meta, files) where files maps each raw file name to its path.
+    """
+    path = snapshot_path(snapshot_dir, content_hash)
+    manifest_file = os.path.join(path, MANIFEST_FILE)
+    if not os.path.exists(manifest_file):
+        return None
+
+    try:
+        with open(manifest_file, 'r') as f:
+            manifest = json.load(f)
+
+        if manifest.get("version") != SNAPSHOT_VERSION or manifest.get("content_hash") != content_hash:
+            logger.warning(f"Ignoring snapshot {path}: version or content hash mismatch")
+            return None
+
+        arrays = {
+            name: np.load(os.path.join(path, ARRAYS_DIR, f"{name}.npy"), mmap_mode='r', allow_pickle=False)
+            for name in manifest.get("arrays", [])
+        }
+        files = {name: os.path.join(path, FILES_DIR, name) for name in manifest.get("files", [])}
+
+        with open(os.path.join(path, META_FILE), 'rb') as f:
+            meta = pickle.load(f)
+
+        return arrays, meta, files
+    except Exception as e:
+        logger.error(f"Error reading snapshot {path}: {e}")
+        return None
+
+
+def prune_snapshots(snapshot_dir: str, keep_hash: str) -> None:
+    """Remove snapshots other than the one for keep_hash"""
+    if not os.path.isdir(snapshot_dir):
+        return
+    keep = os.path.basename(snapshot_path(snapshot_dir, keep_hash))
+    for name in os.listdir(snapshot_dir):
+        if name != keep and name.startswith("v"):
+            shutil.rmtree(os.path.join(snapshot_dir, name), ignore_errors=True)
@@ -0,0 +1,81 @@
+"""
+test_bm25.py - Sparse BM25 Index
+
+Checks BM25Index scores against rank_bm25's BM25Okapi and the edges of top_k.
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bm25 import BM25Index
+
+rank_bm25 = pytest.importorskip("rank_bm25")
+
+CORPUS = [
+    "linear algebra and abstract algebra for mathematics concentrators".split(),
+    "introduction to computer science and programming".split(),
+    "probability theory with applications to statistics and data science".split(),
+    "abstract algebra groups rings and fields".split(),
+    "machine learning and data science with python programming".split(),
+    "american history from the revolution to the civil war".split(),
+    "real analysis".split(),
+]
+
+QUERIES = [
+    ["algebra"],
+    ["abstract", "algebra"],
+    ["data", "science", "programming"],
+    ["and"],
+    ["algebra", "algebra", "rings"],
+    ["history", "unknownterm"],
+]
+
+
+@pytest.fixture(scope="module")
+def index():
+    return BM25Index.from_corpus(CORPUS)
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_scores_match_bm25okapi(index, query):
+    expected = rank_bm25.BM25Okapi(CORPUS).get_scores(query)
+    assert np.allclose(index.get_scores(query), expected)
+
+
+def test_restored_index_scores_match(index):
+    arrays, params = index.to_arrays()
+    restored = BM25Index.from_arrays(index.vocabulary, arrays, params)
+    for query in QUERIES:
+        assert np.allclose(restored.get_scores(query), index.get_scores(query))
+
+
+def test_top_k_orders_by_score_then_document(index):
+    scores = index.get_scores(["algebra"])
+    rows, top_scores = index.top_k(["algebra"], 3)
+    expected = sorted(range(len(CORPUS)), key=lambda row: (-scores[row], row))[:3]
+    assert rows.tolist() == expected
+    assert np.allclose(top_scores, scores[expected])
+
+
+def test_top_k_larger_than_corpus_returns_every_document(index):
+    rows, scores = index.top_k(["data", "science"], len(CORPUS) + 10)
+    assert sorted(rows.tolist()) == list(range(len(CORPUS)))
+    assert np.all(np.diff(scores) <= 0)
+
+
+@pytest.mark.parametrize("query", [[], ["unknownterm", "anotherone"]])
+def test_query_without_known_terms_scores_zero(index, query):
+    assert not index.get_scores(query).any()
+    rows, scores = index.top_k(query, 3)
+    assert rows.tolist() == [0, 1, 2]
+    assert not scores.any()
+
+
+def test_top_k_of_zero(index):
+    rows, scores = index.top_k(["algebra"], 0)
+    assert len(rows) == 0 and len(scores) == 0
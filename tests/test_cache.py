@@ -0,0 +1,126 @@
+"""
+test_cache.py - Shared Bounded Caches
+
+Checks LRU eviction, byte bounds, time-to-live expiry and invalidation of the
+shared caches when the database's data version changes.
+"""
+
+import os
+import sys
+import tempfile
+import uuid
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import cache
+from cache import BoundedCache, bind_data_version, shared_cache
+from database import HarvardDatabase
+from synthetic import generate_catalogue
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(cache.time, "monotonic", fake)
+    return fake
+
+
+def test_evicts_least_recently_used_first():
+    lru = BoundedCache("test_lru", max_entries=3)
+    for key in "abc":
+        lru[key] = key.upper()
+    assert lru.get("a") == "A"  # "b" is now the least recently used
+    lru["d"] = "D"
+    assert [key for key, _ in lru.items()] == ["c", "a", "d"]
+    lru["e"] = "E"
+    assert [key for key, _ in lru.items()] == ["a", "d", "e"]
+    assert lru.stats()["evictions"] == 2
+
+
+def test_overwriting_a_key_makes_it_most_recent():
+    lru = BoundedCache("test_overwrite", max_entries=2)
+    lru["a"] = 1
+    lru["b"] = 2
+    lru["a"] = 3
+    lru["c"] = 4
+    assert dict(lru.items()) == {"a": 3, "c": 4}
+
+
+def test_byte_bound_evicts_and_skips_oversized_values():
+    lru = BoundedCache("test_bytes", max_entries=100, max_bytes=2000)
+    lru["small"] = "x" * 100
+    lru["huge"] = "x" * 5000
+    assert "huge" not in lru and "small" in lru
+    for i in range(30):
+        lru[i] = "x" * 100
+    assert lru.stats()["bytes"] <= 2000
+    assert "small" not in lru
+
+
+def test_entries_expire_after_ttl(clock):
+    ttl_cache = BoundedCache("test_ttl", ttl=10)
+    ttl_cache["a"] = 1
+    clock.now += 9.9
+    assert ttl_cache.get("a") == 1
+    clock.now += 0.1
+    assert ttl_cache.get("a") is None
+    assert "a" not in ttl_cache
+    assert ttl_cache.stats()["expirations"] == 1
+    with pytest.raises(KeyError):
+        ttl_cache["a"]
+
+
+def test_expired_entries_are_left_out_of_items(clock):
+    ttl_cache = BoundedCache("test_ttl_items", ttl=5)
+    ttl_cache["old"] = 1
+    clock.now += 3
+    ttl_cache["new"] = 2
+    clock.now += 3
+    assert ttl_cache.items() == [("new", 2)]
+
+
+def test_hit_rate_counts_lookups():
+    counted = BoundedCache("test_stats")
+    counted["a"] = 1
+    counted.get("a")
+    counted.get("b")
+    assert counted.stats()["hit_rate"] == 0.5
+
+
+def test_binding_a_new_data_version_clears_versioned_caches_only():
+    versioned = shared_cache(f"test_versioned_{uuid.uuid4().hex}")
+    unversioned = shared_cache(f"test_unversioned_{uuid.uuid4().hex}", versioned=False)
+    bind_data_version("version-1")
+    versioned["a"] = 1
+    unversioned["a"] = 1
+
+    assert not bind_data_version("version-1")
+    assert "a" in versioned
+
+    assert bind_data_version("version-2")
+    assert "a" not in versioned
+    assert "a" in unversioned
+
+
+def test_build_indexes_invalidates_cached_searches():
+    db = HarvardDatabase(*generate_catalogue(50, seed=0))
+    db.cache_dir = tempfile.mkdtemp(prefix="chatharvard-test-")
+    db.process_courses()
+    db.process_q_reports()
+    db.build_indexes()
+    db.search_cache[("hybrid", "algebra", 5)] = ["stale"]
+
+    db.build_indexes()
+    assert ("hybrid", "algebra", 5) not in db.search_cache
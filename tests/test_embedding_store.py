@@ -0,0 +1,118 @@
+"""
+test_embedding_store.py - Course Embedding Cache
+
+Checks that a catalogue change re-embeds only the edited course, and that
+saving a new cache does not break a reader of the previous one.
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import embedding_store
+from embedding_store import MATRIX_PREFIX, load_embedding_cache, reuse_embeddings, save_embedding_cache, text_hash
+
+MODEL_ID = "test-model"
+TEXTS = {1: "Linear algebra", 2: "Introduction to computer science", 3: "American history"}
+
+
+def matrix_files(cache_dir):
+    return sorted(name for name in os.listdir(cache_dir) if name.startswith(MATRIX_PREFIX))
+
+
+def save(cache_dir, texts, seed=0):
+    embeddings = np.random.default_rng(seed).random((len(texts), 4), dtype=np.float32)
+    save_embedding_cache(cache_dir, MODEL_ID, 1, embeddings, list(texts), [text_hash(t) for t in texts.values()])
+    return embeddings
+
+
+def test_only_edited_course_needs_embedding(tmp_path):
+    embeddings = save(str(tmp_path), TEXTS)
+    edited = {**TEXTS, 2: "Introduction to computer science and programming"}
+
+    cache = load_embedding_cache(str(tmp_path), MODEL_ID, 1)
+    matrix, missing = reuse_embeddings(cache, list(edited), [text_hash(t) for t in edited.values()])
+    assert missing.tolist() == [1]
+    assert np.array_equal(matrix[[0, 2]], embeddings[[0, 2]])
+
+
+def test_unchanged_catalogue_reuses_mapped_matrix(tmp_path):
+    save(str(tmp_path), TEXTS)
+    cache = load_embedding_cache(str(tmp_path), MODEL_ID, 1)
+    matrix, missing = reuse_embeddings(cache, list(TEXTS), [text_hash(t) for t in TEXTS.values()])
+    assert len(missing) == 0 and matrix is cache.embeddings
+
+
+def test_other_model_or_text_version_is_ignored(tmp_path):
+    save(str(tmp_path), TEXTS)
+    assert load_embedding_cache(str(tmp_path), "other-model", 1) is None
+    assert load_embedding_cache(str(tmp_path), MODEL_ID, 2) is None
+
+
+def test_previous_matrix_is_kept_until_the_next_save(tmp_path):
+    cache_dir = str(tmp_path)
+    save(cache_dir, TEXTS, seed=0)
+    first = matrix_files(cache_dir)
+    save(cache_dir, TEXTS, seed=1)
+    second = matrix_files(cache_dir)
+    assert set(first) < set(second) and len(second) == 2
+    save(cache_dir, TEXTS, seed=2)
+    third = matrix_files(cache_dir)
+    assert not set(first) & set(third) and len(third) == 2
+
+
+def test_reader_of_a_replaced_manifest_reads_it_again(tmp_path, monkeypatch):
+    cache_dir = str(tmp_path)
+    save(cache_dir, TEXTS, seed=0)
+    stale = embedding_store._read_manifest(cache_dir)
+    save(cache_dir, TEXTS, seed=1)
+    latest = save(cache_dir, TEXTS, seed=2)
+
+    # The first read sees a manifest whose matrix a later save removed
+    manifests = [stale]
+    read_manifest = embedding_store._read_manifest
+    monkeypatch.setattr(embedding_store, "_read_manifest",
+                        lambda path: manifests.pop() if manifests else read_manifest(path))
+    cache = load_embedding_cache(cache_dir, MODEL_ID, 1)
+    assert cache is not None
+    assert np.array_equal(cache.embeddings, latest)
+
+
+class CountingModel:
+    """Deterministic encoder that records the texts it was asked to encode"""
+
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, texts, **kwargs):
+        self.encoded.extend(texts)
+        return np.array([[len(text), sum(map(ord, text)) % 97, 1.0, 2.0] for text in texts], dtype=np.float32)
+
+
+def test_database_rebuild_embeds_only_the_edited_course(tmp_path):
+    pytest.importorskip("faiss")
+    from database import HarvardDatabase
+    from synthetic import generate_catalogue
+
+    db = HarvardDatabase(*generate_catalogue(40, seed=0))
+    db.cache_dir = str(tmp_path)
+    db.process_courses()
+    db.model = CountingModel()
+    db.embedding_model_id = MODEL_ID
+    db._build_vector_search_index()
+    assert len(db.model.encoded) == len(db.course_ids_for_embeddings)
+
+    descriptions = np.asarray(db.course_table.column('description'), dtype=object).copy()
+    descriptions[5] = "A completely rewritten description"
+    db.course_table.set_column('description', descriptions)
+    db.model.encoded = []
+    db._build_vector_search_index()
+
+    edited = db.course_table.row(5)
+    assert db.model.encoded == [db._embedding_text(edited)]
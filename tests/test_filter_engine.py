@@ -0,0 +1,160 @@
+"""
+test_filter_engine.py - Bitmap Filters Against Row-by-Row Filtering
+
+Checks FilterEngine against the per-course checks filter_courses and
+_apply_all_filters used before the bitmaps, on a small catalogue with missing
+workload and scores, lowercase class tags and varied term strings.
+"""
+
+import os
+import re
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from course_store import CourseTable
+from filter_engine import FilterEngine
+
+COURSES = [
+    # course_id, class_tag, term, mean_hours, overall_score_course_mean
+    (1, "MATH 136", "Fall 2023", 8.0, 4.5),
+    (2, "MATH 131", "Spring 2024", np.nan, 4.1),
+    (3, "math 21a", "fall 2023", 5.5, np.nan),
+    (4, "APMTH 120", "Fall 2024", 12.0, 3.2),
+    (5, "COMPSCI 50", "Fall 2023 ", 15.0, 4.8),
+    (6, "COMPSCI124", "Spring 2025", 11.0, 3.9),
+    (7, "ECON 1010A", "", 6.0, 3.0),
+    (8, np.nan, "Fall 2023", 4.0, 4.0),
+    (9, "HIST 1330", np.nan, np.nan, np.nan),
+    (10, "STAT 110", "Fall 2023, Spring 2024", 9.0, 4.4),
+    (11, "Freshman Seminar", "Fall 2024", 3.0, 4.9),
+]
+
+COURSE_NUMBER = re.compile(r'([A-Za-z]+)\s*(\d+)')
+
+
+@pytest.fixture(scope="module")
+def table():
+    frame = pd.DataFrame(COURSES, columns=["course_id", "class_tag", "term", "mean_hours",
+                                           "overall_score_course_mean"])
+    return CourseTable.from_frame(frame)
+
+
+@pytest.fixture(scope="module")
+def engine(table):
+    return FilterEngine(table)
+
+
+# Row-by-row reference checks
+
+def matches_dept(course, dept):
+    return isinstance(course["class_tag"], str) and dept.upper() in course["class_tag"].upper()
+
+
+def course_number(course):
+    if not isinstance(course["class_tag"], str):
+        return None
+    match = COURSE_NUMBER.search(course["class_tag"])
+    return int(match.group(2)) if match else None
+
+
+def matches_term(course, term):
+    return isinstance(course["term"], str) and term.lower() in course["term"].lower()
+
+
+def above_min_score(course, min_score):
+    return not pd.isna(course["overall_score_course_mean"]) and course["overall_score_course_mean"] >= min_score
+
+
+def below_max_hours(course, max_hours, include_missing):
+    if pd.isna(course["mean_hours"]):
+        return include_missing
+    return course["mean_hours"] <= max_hours
+
+
+def reference_ids(table, predicate):
+    return [course_id for course_id in table if predicate(table[course_id])]
+
+
+def selected_ids(table, rows):
+    return table.course_ids[rows].tolist()
+
+
+@pytest.mark.parametrize("dept", ["MATH", "math", "CompSci", "APMTH", "ECON", "PHYS"])
+def test_department_substring_matches_class_tag(table, engine, dept):
+    assert selected_ids(table, engine.select(departments=[dept])) == \
+        reference_ids(table, lambda course: matches_dept(course, dept))
+
+
+@pytest.mark.parametrize("level", [20, 50, 120, 130, 1010])
+def test_level_decade(table, engine, level):
+    def matches(course):
+        number = course_number(course)
+        return number is not None and (number // 10) * 10 == level
+
+    assert selected_ids(table, engine.select(levels=[level])) == reference_ids(table, matches)
+
+
+@pytest.mark.parametrize("term", ["Fall", "fall 2023", "SPRING", "2024", "Winter"])
+def test_term_substring(table, engine, term):
+    assert selected_ids(table, engine.select(terms=[term])) == \
+        reference_ids(table, lambda course: matches_term(course, term))
+
+
+@pytest.mark.parametrize("include_missing", [True, False])
+def test_max_hours_missing_workload(table, engine, include_missing):
+    assert selected_ids(table, engine.select(max_hours=8.0, include_missing_hours=include_missing)) == \
+        reference_ids(table, lambda course: below_max_hours(course, 8.0, include_missing))
+
+
+def test_min_score_excludes_missing_scores(table, engine):
+    assert selected_ids(table, engine.select(min_score=4.0)) == \
+        reference_ids(table, lambda course: above_min_score(course, 4.0))
+
+
+def test_exact_department_and_number_range(table, engine):
+    def matches(course):
+        number = course_number(course)
+        tag = course["class_tag"]
+        return (number is not None and COURSE_NUMBER.search(tag).group(1).upper() == "MATH"
+                and 20 <= number <= 139)
+
+    rows = engine.select(departments=["math"], exact_dept=True, course_levels=[(20, 139)])
+    assert selected_ids(table, rows) == reference_ids(table, matches)
+
+
+def test_combined_criteria_like_filter_courses(table, engine):
+    def matches(course):
+        return (matches_dept(course, "MATH") and matches_term(course, "fall")
+                and above_min_score(course, 3.0) and below_max_hours(course, 10, True))
+
+    rows = engine.select(departments=["MATH"], terms=["fall"], min_score=3.0, max_hours=10)
+    assert selected_ids(table, rows) == reference_ids(table, matches)
+
+
+def test_match_query_like_apply_all_filters(table, engine):
+    query_info = {
+        "departments": ["math", "COMPSCI"],
+        "course_levels": [(20, 59), (130, 139)],
+        "terms": ["Fall 2023", "spring"],
+        "constraints": {"max_hours": 16, "min_score": 4.0}
+    }
+
+    def matches(course):
+        number = course_number(course)
+        return (any(matches_dept(course, dept) for dept in query_info["departments"])
+                and number is not None
+                and any(start <= number <= end for start, end in query_info["course_levels"])
+                and any(matches_term(course, term) for term in query_info["terms"])
+                and below_max_hours(course, 16, False)
+                and above_min_score(course, 4.0))
+
+    assert engine.match_query(query_info).tolist() == reference_ids(table, matches)
+
+
+def test_empty_criteria_select_every_course(table, engine):
+    assert selected_ids(table, engine.select()) == list(table)
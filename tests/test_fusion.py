@@ -0,0 +1,105 @@
+"""
+test_fusion.py - Hybrid Result Fusion
+
+Checks reciprocal rank and linear fusion for ties, courses returned by only
+one retriever and empty result lists.
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fusion import DEFAULT_RRF_K, fuse_results, normalize_scores
+
+
+def ranked(course_ids, scores):
+    return np.asarray(course_ids, dtype=np.int64), np.asarray(scores, dtype=np.float64)
+
+
+def test_rrf_sums_reciprocal_ranks():
+    fused = fuse_results({
+        "semantic": ranked([1, 2, 3], [0.9, 0.8, 0.7]),
+        "keyword": ranked([2, 1], [12.0, 3.0])
+    }, top_k=3, method='rrf')
+    scores = {entry['course_id']: entry['score'] for entry in fused}
+    assert scores[1] == pytest.approx(1 / (DEFAULT_RRF_K + 1) + 1 / (DEFAULT_RRF_K + 2))
+    assert scores[2] == pytest.approx(1 / (DEFAULT_RRF_K + 2) + 1 / (DEFAULT_RRF_K + 1))
+    assert scores[3] == pytest.approx(1 / (DEFAULT_RRF_K + 3))
+
+
+def test_rrf_ties_keep_first_returned_order():
+    # 1 and 2 swap ranks between retrievers, so their fused scores are equal
+    fused = fuse_results({
+        "semantic": ranked([1, 2], [0.9, 0.8]),
+        "keyword": ranked([2, 1], [5.0, 4.0])
+    }, top_k=2, method='rrf')
+    assert [entry['course_id'] for entry in fused] == [1, 2]
+    assert fused[0]['score'] == fused[1]['score']
+
+
+def test_linear_ties_keep_first_returned_order():
+    fused = fuse_results({
+        "semantic": ranked([7, 8, 9], [0.5, 0.5, 0.5])
+    }, top_k=3, method='linear')
+    assert [entry['course_id'] for entry in fused] == [7, 8, 9]
+    assert [entry['score'] for entry in fused] == [1.0, 1.0, 1.0]
+
+
+@pytest.mark.parametrize("method", ["rrf", "linear"])
+def test_course_in_one_list_has_only_that_component(method):
+    fused = fuse_results({
+        "semantic": ranked([1, 2], [0.9, 0.1]),
+        "keyword": ranked([1, 3], [8.0, 2.0])
+    }, top_k=3, method=method)
+    by_id = {entry['course_id']: entry for entry in fused}
+    assert set(by_id) == {1, 2, 3}
+    assert set(by_id[1]['components']) == {"semantic", "keyword"}
+    assert by_id[2]['components'] == {"semantic": {'rank': 2, 'score': 0.1, 'normalized': 0.0}}
+    assert set(by_id[3]['components']) == {"keyword"}
+    assert fused[0]['course_id'] == 1
+
+
+def test_linear_weights_scale_normalized_scores():
+    fused = fuse_results({
+        "semantic": ranked([1, 2], [0.9, 0.3]),
+        "keyword": ranked([2, 1], [10.0, 0.0])
+    }, top_k=2, method='linear', weights={"semantic": 0.3, "keyword": 0.7})
+    assert [entry['course_id'] for entry in fused] == [2, 1]
+    assert fused[0]['score'] == pytest.approx(0.7)
+    assert fused[1]['score'] == pytest.approx(0.3)
+
+
+@pytest.mark.parametrize("method", ["rrf", "linear"])
+def test_empty_list_is_ignored(method):
+    fused = fuse_results({
+        "semantic": ranked([], []),
+        "keyword": ranked([4, 5], [3.0, 1.0])
+    }, top_k=5, method=method)
+    assert [entry['course_id'] for entry in fused] == [4, 5]
+    assert all(set(entry['components']) == {"keyword"} for entry in fused)
+
+
+@pytest.mark.parametrize("method", ["rrf", "linear"])
+def test_all_lists_empty(method):
+    assert fuse_results({"semantic": ranked([], []), "keyword": ranked([], [])}, top_k=5, method=method) == []
+
+
+def test_top_k_bounds_results():
+    fused = fuse_results({"semantic": ranked([1, 2, 3, 4], [4.0, 3.0, 2.0, 1.0])}, top_k=2)
+    assert [entry['course_id'] for entry in fused] == [1, 2]
+
+
+@pytest.mark.parametrize("method", ["minmax", "zscore"])
+def test_normalize_equal_and_empty_scores(method):
+    assert len(normalize_scores(np.empty(0), method)) == 0
+    equal = normalize_scores(np.array([2.0, 2.0]), method)
+    assert equal.tolist() == ([1.0, 1.0] if method == 'minmax' else [0.0, 0.0])
+
+
+def test_unknown_method_raises():
+    with pytest.raises(ValueError):
+        fuse_results({"semantic": ranked([1], [1.0])}, top_k=1, method='borda')
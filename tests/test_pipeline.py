@@ -0,0 +1,82 @@
+"""
+test_pipeline.py - Concurrent Chat Pipeline Stages
+
+Runs the recommender's relaxed-criteria fallback alongside the course finder
+on one query, as /api/chat/message does, and checks that the finder still sees
+the student's original constraints.
+"""
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from course_finder import CourseFinder
+from course_recommender import CourseRecommender
+from database import HarvardDatabase
+from pipeline import PipelineExecutor
+from synthetic import generate_catalogue
+
+MAX_HOURS = 4.0
+MIN_SCORE = 4.0
+
+
+@pytest.fixture(scope="module")
+def harvard_db():
+    db = HarvardDatabase(*generate_catalogue(200, seed=0))
+    db.cache_dir = tempfile.mkdtemp(prefix="chatharvard-test-")
+    db.process_courses()
+    db.process_q_reports()
+    db.process_concentrations()
+    db.build_indexes()
+    return db
+
+
+def restrictive_query_info():
+    """A recommendation query with workload and score constraints for the recommender to relax"""
+    return {
+        "original_query": "Recommend a well-rated COMPSCI course with less than 4 hours of work per week",
+        "departments": ["COMPSCI"],
+        "course_levels": [],
+        "course_codes": [],
+        "terms": [],
+        "constraints": {"max_hours": MAX_HOURS, "min_score": MIN_SCORE},
+        "is_followup": False,
+        "referenced_courses": [],
+        "preferences": [],
+        "intent": "course_recommendation",
+        "confidence_scores": {},
+        "self_reflection": {"missing_information": [], "ambiguities": [], "verification_needed": []},
+        "semantic_aspects": {"difficulty": None, "interest_level": None, "relevance": None, "format": None}
+    }
+
+
+def test_relaxed_candidates_leave_constraints_unchanged(harvard_db):
+    query_info = restrictive_query_info()
+    CourseRecommender(harvard_db)._get_relaxed_candidates(query_info, {"concentration": None, "courses_taken": []})
+    assert query_info["constraints"] == {"max_hours": MAX_HOURS, "min_score": MIN_SCORE}
+
+
+def test_finder_keeps_original_constraints_alongside_relaxed_recommender(harvard_db):
+    finder, recommender = CourseFinder(harvard_db), CourseRecommender(harvard_db)
+    executor = PipelineExecutor(max_workers=4)
+    student_profile = {"concentration": None, "courses_taken": []}
+    query_info = restrictive_query_info()
+
+    # The structured filter step reads the constraints, so its results show which ones it saw
+    expected_rows = finder._apply_all_filters(restrictive_query_info(), student_profile)[0]
+    expected_ids = [course["course_id"] for course in expected_rows]
+
+    for _ in range(20):
+        results, _ = executor.run({
+            "relaxed_candidates": lambda: recommender._get_relaxed_candidates(query_info, student_profile),
+            "find_courses": lambda: finder.find_courses(query_info, student_profile)
+        })
+        filtered_ids = [course["course_id"] for course in results["find_courses"]["filtered_courses"]]
+        assert filtered_ids == expected_ids
+        assert query_info["constraints"] == {"max_hours": MAX_HOURS, "min_score": MIN_SCORE}
@@ -0,0 +1,101 @@
+"""
+tokenizer.py - Text Tokenizer for Keyword Search
+
+This module turns course text and search queries into BM25 terms. Index and
+query text go through the same steps so their token streams always agree:
+
+1. lowercase
+2. split into alphabetic words with one compiled regex
+3. drop English stopwords (a frozen copy of NLTK's list, so results do not
+   depend on which NLTK data is installed)
+4. optionally strip plural suffixes with a light S-stemmer
+
+Query tokenization is memoized with an LRU cache since the same queries are
+searched repeatedly (hybrid search, retries, follow-up messages).
+"""
+
+import os
+import re
+from functools import lru_cache
+from typing import Dict, List, Tuple, Any
+
+# Runs of letters (including accented letters); digits, underscores and punctuation separate words
+WORD_PATTERN = re.compile(r"[^\W\d_]+")
+
+# NLTK's English stopword list
+STOPWORDS = frozenset("""
+a about above after again against ain all am an and any are aren aren't as at be because been before being
+below between both but by can couldn couldn't d did didn didn't do does doesn doesn't doing don don't down
+during each few for from further had hadn hadn't has hasn hasn't have haven haven't having he her here hers
+herself him himself his how i if in into is isn isn't it it's its itself just ll m ma me mightn mightn't more
+most mustn mustn't my myself needn needn't no nor not now o of off on once only or other our ours ourselves
+out over own re s same shan shan't she she's should should've shouldn shouldn't so some such t than that
+that'll the their theirs them themselves then there these they this those through to too under until up ve
+very was wasn wasn't we were weren weren't what when where which while who whom why will with won won't
+wouldn wouldn't y you you'd you'll you're you've your yours yourself yourselves
+""".split())
+
+QUERY_CACHE_SIZE = 4096
+
+# Bump when the tokenization steps change so stored BM25 corpora are rebuilt
+TOKENIZER_VERSION = 1
+
+
+def stem(word: str) -> str:
+    """Light plural stemming (Harman's S-stemmer): courses -> course, theories -> theory"""
+    if len(word) <= 3 or not word.endswith('s'):
+        return word
+    if word.endswith('ies') and not word.endswith(('eies', 'aies')):
+        return word[:-3] + 'y'
+    if word.endswith('es') and not word.endswith(('aes', 'ees', 'oes')):
+        return word[:-1]
+    if not word.endswith(('us', 'ss')):
+        return word[:-1]
+    return word
+
+
+class Tokenizer:
+    """Shared tokenizer for BM25 documents and queries"""
+
+    def __init__(self, stemming: bool = False, query_cache_size: int = QUERY_CACHE_SIZE):
+        """
+        Args:
+            stemming: Strip plural suffixes from every token
+            query_cache_size: Number of distinct queries kept in the LRU cache
+        """
+        self.stemming = stemming
+        self._stems: Dict[str, str] = {}
+        self._tokenize_query = lru_cache(maxsize=query_cache_size)(self._tokenize_tuple)
+
+    @property
+    def config(self) -> Dict[str, Any]:
+        """Settings that change the token stream; indexes built with other settings must be rebuilt"""
+        return {'version': TOKENIZER_VERSION, 'stemming': self.stemming}
+
+    def tokenize(self, text: str) -> List[str]:
+        """Tokenize document text"""
+        if not isinstance(text, str):
+            return []
+        tokens = [word for word in WORD_PATTERN.findall(text.lower()) if word not in STOPWORDS]
+        if self.stemming:
+            stems = self._stems
+            tokens = [stems.get(word) or stems.setdefault(word, stem(word)) for word in tokens]
+        return tokens
+
+    def _tokenize_tuple(self, text: str) -> Tuple[str, ...]:
+        return tuple(self.tokenize(text))
+
+    def tokenize_query(self, query: str) -> Tuple[str, ...]:
+        """Tokenize a search query, cached; returns the same tokens tokenize would"""
+        if not isinstance(query, str):
+            return ()
+        return self._tokenize_query(query)
+
+    def cache_info(self):
+        """Hit/miss statistics of the query cache"""
+        return self._tokenize_query.cache_info()
+
+
+def default_tokenizer() -> Tokenizer:
+    """Tokenizer configured from the environment (BM25_STEMMING=1 enables stemming)"""
+    return Tokenizer(stemming=os.getenv('BM25_STEMMING', '0').lower() in ('1', 'true', 'yes'))
@@ -0,0 +1,241 @@
+"""
+vector_index.py - Vector Index Backends
+
+This module builds the FAISS index used for semantic course search. All backends
+use inner-product similarity over unit-length embeddings (cosine similarity):
+
+- flat:  exact search, cost grows linearly with the number of vectors
+- ivfpq: inverted lists with product-quantized codes, for millions of vectors
+- hnsw:  graph-based search with full vectors, fast and high recall
+- sq8:   exact scan over 8-bit scalar-quantized vectors (4x smaller than float32)
+- fp16:  exact scan over float16 vectors (2x smaller than float32)
+
+The quantized backends keep only their codes in memory. search_index rescores
+a few times more candidates than requested against the float32 embeddings
+(memory-mapped from the snapshot, so only candidate rows are read) and returns
+exact cosine similarities in exact order.
+
+Trained indexes can be serialized to a byte array so they are stored with
+snapshots or in the embedding cache instead of being retrained on every boot.
+"""
+
+import hashlib
+import logging
+import math
+import os
+from typing import Dict, Optional, Any
+
+import numpy as np
+
+try:
+    import faiss
+    FAISS_AVAILABLE = True
+except ImportError:
+    FAISS_AVAILABLE = False
+
+logger = logging.getLogger("VectorIndex")
+
+INDEX_BACKENDS = ('flat', 'ivfpq', 'hnsw', 'sq8', 'fp16')
+
+# Backends whose scores are approximate and get rescored with the float vectors
+QUANTIZED_BACKENDS = ('sq8', 'fp16')
+
+# Default build and search parameters per backend
+DEFAULT_INDEX_PARAMS = {
+    'flat': {},
+    'ivfpq': {'nlist': None, 'm': 32, 'nbits': 8, 'nprobe': 32, 'refine_factor': 4},
+    'hnsw': {'m': 32, 'ef_construction': 200, 'ef_search': 64},
+    'sq8': {'rescore_factor': 4},
+    'fp16': {'rescore_factor': 2}
+}
+
+# FAISS k-means wants roughly this many training points per centroid
+TRAINING_POINTS_PER_CENTROID = 39
+
+
+def index_params(backend: str, overrides: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Parameters for a backend, with overrides applied"""
+    if backend not in INDEX_BACKENDS:
+        raise ValueError(f"Unknown vector index backend '{backend}', expected one of {INDEX_BACKENDS}")
+    params = dict(DEFAULT_INDEX_PARAMS[backend])
+    params.update(overrides or {})
+    return params
+
+
+def index_fingerprint(embeddings: np.ndarray, backend: str, params: Optional[Dict[str, Any]] = None) -> str:
+    """Identify an index by its vectors and build parameters"""
+    digest = hashlib.sha256()
+    digest.update(f"{backend}:{sorted(index_params(backend, params).items())}".encode())
+    digest.update(str(embeddings.shape).encode())
+    digest.update(np.ascontiguousarray(embeddings, dtype=np.float32).tobytes())
+    return digest.hexdigest()
+
+
+def _pq_subquantizers(dimension: int, requested: int) -> int:
+    """Largest number of PQ subquantizers <= requested that divides the dimension"""
+    for m in range(min(requested, dimension), 0, -1):
+        if dimension % m == 0:
+            return m
+    return 1
+
+
+def build_vector_index(embeddings: np.ndarray, backend: str = 'flat', params: Optional[Dict[str, Any]] = None):
+    """Build and fill a FAISS inner-product index over unit-length embeddings
+
+    IVF-PQ falls back to a flat index when there are too few vectors to train it.
+    """
+    params = index_params(backend, params)
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    count, dimension = embeddings.shape
+
+    if backend == 'ivfpq':
+        nbits = params['nbits']
+        if count < TRAINING_POINTS_PER_CENTROID * (1 << nbits):
+            logger.warning(f"Only {count} vectors, too few to train IVF-PQ; using a flat index")
+            backend = 'flat'
+
+    if backend == 'flat':
+        index = faiss.IndexFlatIP(dimension)
+
+    elif backend == 'ivfpq':
+        nlist = params['nlist'] or int(4 * math.sqrt(count))
+        nlist = max(1, min(nlist, count // TRAINING_POINTS_PER_CENTROID))
+        m = _pq_subquantizers(dimension, params['m'])
+        quantizer = faiss.IndexFlatIP(dimension)
+        ivfpq = faiss.IndexIVFPQ(quantizer, dimension, nlist, m, params['nbits'], faiss.METRIC_INNER_PRODUCT)
+        ivfpq.train(embeddings)
+        ivfpq.nprobe = min(params['nprobe'], nlist)
+        index = ivfpq
+
+        # Re-rank refine_factor * k PQ candidates with exact vectors
+        if params['refine_factor'] > 1:
+            index = faiss.IndexRefineFlat(ivfpq)
+            index.k_factor = params['refine_factor']
+
+    elif backend in QUANTIZED_BACKENDS:
+        qtype = faiss.ScalarQuantizer.QT_8bit if backend == 'sq8' else faiss.ScalarQuantizer.QT_fp16
+        index = faiss.IndexScalarQuantizer(dimension, qtype, faiss.METRIC_INNER_PRODUCT)
+        index.train(embeddings)
+
+    else:
+        index = faiss.IndexHNSWFlat(dimension, params['m'], faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = params['ef_construction']
+        index.hnsw.efSearch = params['ef_search']
+
+    index.add(embeddings)
+    logger.info(f"Built {backend} vector index with {index.ntotal} vectors")
+    if backend in QUANTIZED_BACKENDS:
+        logger.info(f"Quantized vectors take {index.code_size * index.ntotal / 1e6:.1f} MB "
+                    f"instead of {embeddings.nbytes / 1e6:.1f} MB as float32")
+    return index
+
+
+def rescore(vectors: np.ndarray, queries: np.ndarray, candidates: np.ndarray, k: int):
+    """Exact inner products of each query with its candidate rows, best k first
+
+    Returns (scores, rows) shaped like index.search output; -1 candidates are
+    padding and stay at the end with score -inf.
+    """
+    valid = candidates >= 0
+    safe_rows = np.where(valid, candidates, 0)
+    gathered = np.asarray(vectors[safe_rows.ravel()], dtype=np.float32).reshape(candidates.shape + (-1,))
+    scores = np.einsum('ncd,nd->nc', gathered, queries)
+    scores[~valid] = -np.inf
+
+    order = np.argsort(-scores, axis=1, kind='stable')[:, :k]
+    rows = np.take_along_axis(np.where(valid, candidates, -1), order, axis=1)
+    return np.take_along_axis(scores, order, axis=1), rows
+
+
+def search_index(index, queries: np.ndarray, k: int, vectors: Optional[np.ndarray] = None,
+                 rescore_factor: Optional[int] = None):
+    """Search an index, rescoring quantized results exactly against vectors when given
+
+    rescore_factor * k candidates are taken from a quantized index (default from
+    the backend parameters, 0 to skip rescoring); other indexes are searched as
+    they are.
+    """
+    queries = np.ascontiguousarray(queries, dtype=np.float32)
+    backend = backend_name(index)
+    if rescore_factor is None:
+        rescore_factor = DEFAULT_INDEX_PARAMS[backend].get('rescore_factor', 1)
+    if backend not in QUANTIZED_BACKENDS or vectors is None or not rescore_factor:
+        return index.search(queries, k)
+
+    _, candidates = index.search(queries, k * rescore_factor)
+    return rescore(vectors, queries, candidates, k)
+
+
+def neighbor_table(index, embeddings: np.ndarray, k: int, batch_size: int = 1024):
+    """Top-k neighbours of every indexed vector, excluding the vector itself
+
+    Returns (rows, scores) arrays of shape (n, k); rows are positions in
+    embeddings, padded with -1 (score -inf) when fewer than k neighbours exist.
+    """
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    count = len(embeddings)
+    rows = np.full((count, k), -1, dtype=np.int64)
+    scores = np.full((count, k), -np.inf, dtype=np.float32)
+
+    for start in range(0, count, batch_size):
+        batch = embeddings[start:start + batch_size]
+        batch_scores, batch_rows = search_index(index, batch, k + 1, embeddings)
+
+        # Move the query vector itself (and padding) behind the real neighbours
+        own = np.arange(start, start + len(batch))[:, None]
+        keep = (batch_rows != own) & (batch_rows >= 0)
+        order = np.argsort(~keep, axis=1, kind='stable')[:, :k]
+        kept = np.take_along_axis(keep, order, axis=1)
+        rows[start:start + len(batch)] = np.where(kept, np.take_along_axis(batch_rows, order, axis=1), -1)
+        scores[start:start + len(batch)] = np.where(kept, np.take_along_axis(batch_scores, order, axis=1), -np.inf)
+
+    return rows, scores
+
+
+def backend_name(index) -> str:
+    """Name of the backend an index was built with"""
+    if isinstance(index, faiss.IndexRefine):
+        index = faiss.downcast_index(index.base_index)
+    if isinstance(index, faiss.IndexIVFPQ):
+        return 'ivfpq'
+    if isinstance(index, faiss.IndexHNSWFlat):
+        return 'hnsw'
+    if isinstance(index, faiss.IndexScalarQuantizer):
+        return 'fp16' if index.sq.qtype == faiss.ScalarQuantizer.QT_fp16 else 'sq8'
+    return 'flat'
+
+
+def serialize_index(index) -> np.ndarray:
+    """Serialize an index (including trained state and search parameters) to bytes"""
+    return faiss.serialize_index(index)
+
+
+def deserialize_index(data: np.ndarray):
+    """Restore an index written by serialize_index"""
+    return faiss.deserialize_index(np.ascontiguousarray(data, dtype=np.uint8))
+
+
+def save_vector_index(index, path: str) -> None:
+    """Write an index to disk atomically"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    staging = f"{path}.tmp"
+    faiss.write_index(index, staging)
+    os.replace(staging, path)
+
+
+def load_vector_index(path: str, mmap: bool = False):
+    """Read an index written by save_vector_index, or None when missing or unreadable
+
+    With mmap the index data is mapped read-only from the file instead of being
+    copied into process memory, so processes loading the same file share it.
+    The file must not change while the index is in use.
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        if mmap:
+            return faiss.read_index(path, faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY)
+        return faiss.read_index(path)
+    except Exception as e:
+        logger.error(f"Error reading vector index {path}: {e}")
+        return None